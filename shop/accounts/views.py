@@ -6,11 +6,12 @@ from django.views.decorators.csrf import csrf_protect
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.forms import AuthenticationForm
 from .forms import UserRegistrationForm
-from main.models import Category
+from cart.cart import merge_session_cart
+from main.categories import get_active_categories
 from django.core.exceptions import ValidationError
 
 def get_categories():
-    return Category.objects.filter(is_active=True)
+    return get_active_categories()
 
 @csrf_protect
 def login_view(request):
@@ -22,6 +23,7 @@ def login_view(request):
         if form.is_valid():
             user = form.get_user()
             login(request, user)
+            merge_session_cart(request)
             messages.success(request, _("Ви успішно увійшли до системи!"))
             next_url = request.GET.get('next')
             return redirect(next_url) if next_url else redirect('main:product_list')
@@ -54,6 +56,7 @@ def register_view(request):
                 user = form.save()
                 # Автоматична авторизація після реєстрації
                 login(request, user)
+                merge_session_cart(request)
                 messages.success(request, _("Реєстрація успішна! Ви увійшли до системи."))
                 return redirect('main:product_list')
             except ValidationError as e:
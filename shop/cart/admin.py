@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import StoredCart, StoredCartLine
+
+
+class StoredCartLineInline(admin.TabularInline):
+    model = StoredCartLine
+    raw_id_fields = ('product',)
+    extra = 0
+
+
+@admin.register(StoredCart)
+class StoredCartAdmin(admin.ModelAdmin):
+    list_display = ('user', 'quantity', 'cents', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('quantity', 'cents', 'updated_at')
+    raw_id_fields = ('user',)
+    inlines = [StoredCartLineInline]
@@ -1,93 +1,228 @@
 from django.conf import settings
-from main.models import Product
+from django.db import transaction
+from django.db.models import Sum
 from discounts.models import PromoCode
 
+from . import pricing
+from .models import StoredCart, StoredCartLine
+
+
+def _empty():
+    return {'items': {}, 'quantity': 0, 'cents': 0}
+
+
+class SessionCartStorage:
+    """
+    Кошик анонімного відвідувача в сесії. Дані компактні:
+        {'items': {'<product_id>': [кількість, сума рядка в копійках]},
+         'quantity': загальна кількість, 'cents': загальна сума в копійках}
+    Сесія змінюється лише при зміні кошика; порожній кошик у сесії
+    не зберігається, тож перегляд каталогу не створює запису сесії.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        data = session.get(settings.CART_SESSION_ID) or {}
+        if data and 'items' not in data:
+            # Старий формат: {'<product_id>': {'quantity': n, ...}}
+            lines = pricing.price_lines({
+                int(product_id): item['quantity'] for product_id, item in data.items()
+            })
+            self.data = _empty()
+            for line in lines:
+                self.set_item(str(line.product.id), line.quantity, line.total_cents)
+            return
+        self.data = data or _empty()
+
+    def get_items(self):
+        return self.data['items']
+
+    def get_totals(self):
+        return self.data['quantity'], self.data['cents']
+
+    def set_item(self, product_id, quantity, cents):
+        """Кількість і сума рядка (quantity = 0 — видалити рядок)"""
+        items = self.data['items']
+        old_quantity, old_cents = items.pop(product_id, (0, 0))
+        if quantity > 0:
+            items[product_id] = [quantity, cents]
+        else:
+            quantity = cents = 0
+        self.data['quantity'] += quantity - old_quantity
+        self.data['cents'] += cents - old_cents
+        self._write()
+
+    def clear(self):
+        self.data = _empty()
+        self._write()
+
+    def _write(self):
+        if self.data['items']:
+            self.session[settings.CART_SESSION_ID] = self.data
+        else:
+            self.session.pop(settings.CART_SESSION_ID, None)
+
+
+class DatabaseCartStorage:
+    """
+    Кошик користувача в БД (StoredCart/StoredCartLine). Зміна кількості
+    оновлює лише свій рядок, а загальні суми перераховуються з рядків
+    (Sum) у тій самій транзакції під блокуванням кошика, тож паралельні
+    запити того ж користувача не розходяться із сумою рядків. Рядки
+    завантажуються лише коли потрібні (значку досить загальних сум).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._cart = None
+        self._items = None
+
+    def _get_cart(self):
+        if self._cart is None:
+            self._cart = StoredCart.objects.filter(user=self.user).first() or StoredCart(user=self.user)
+        return self._cart
+
+    def _lock_cart(self):
+        """Кошик, заблокований до кінця транзакції; створюється за потреби"""
+        self._cart, _ = StoredCart.objects.select_for_update().get_or_create(user=self.user)
+        return self._cart
+
+    def get_items(self):
+        if self._items is None:
+            cart = self._get_cart()
+            self._items = {} if cart._state.adding else {
+                str(product_id): [quantity, cents]
+                for product_id, quantity, cents in cart.lines.values_list('product_id', 'quantity', 'cents')
+            }
+        return self._items
+
+    def get_totals(self):
+        cart = self._get_cart()
+        return cart.quantity, cart.cents
+
+    def set_item(self, product_id, quantity, cents):
+        """Кількість і сума рядка (quantity = 0 — видалити рядок)"""
+        items = self.get_items()
+        with transaction.atomic():
+            cart = self._lock_cart()
+            lines = StoredCartLine.objects.filter(cart=cart, product_id=int(product_id))
+            if quantity > 0:
+                if not lines.update(quantity=quantity, cents=cents):
+                    StoredCartLine.objects.create(
+                        cart=cart, product_id=int(product_id), quantity=quantity, cents=cents,
+                    )
+            else:
+                lines.delete()
+            totals = cart.lines.aggregate(quantity=Sum('quantity'), cents=Sum('cents'))
+            cart.quantity = totals['quantity'] or 0
+            cart.cents = totals['cents'] or 0
+            cart.save(update_fields=['quantity', 'cents', 'updated_at'])
+        if quantity > 0:
+            items[product_id] = [quantity, cents]
+        else:
+            items.pop(product_id, None)
+
+    def clear(self):
+        if self._get_cart()._state.adding:
+            return
+        with transaction.atomic():
+            cart = self._lock_cart()
+            cart.lines.all().delete()
+            cart.quantity = cart.cents = 0
+            cart.save(update_fields=['quantity', 'cents', 'updated_at'])
+        self._items = {}
+
 
 class Cart:
+    """
+    Кошик з однаковим інтерфейсом для двох сховищ: сесії (анонімний
+    відвідувач, SessionCartStorage) і БД (користувач, DatabaseCartStorage).
+    Кошик сесії при вході переноситься в БД (merge_session_cart).
+
+    Сховище зберігає кількість і суму рядка в копійках та загальні
+    кількість і суму, які оновлюються при кожній зміні, тож __len__
+    і get_total_price() не перебирають рядки. Записи робляться лише коли
+    кошик справді змінився. get_lines() перераховує ціни за поточними
+    знижками (cart/pricing.py) один раз на екземпляр кошика і, якщо вони
+    змінились, оновлює збережені суми. Ітерація, суми і промокод
+    використовують той самий список рядків.
+    """
+
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self._lines = None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            self.storage = DatabaseCartStorage(user)
+            session_storage = SessionCartStorage(request.session)
+            if session_storage.get_items():
+                self._merge(session_storage)
+        else:
+            self.storage = SessionCartStorage(request.session)
+
+    def _set_item(self, product_id, quantity, cents):
+        self.storage.set_item(product_id, quantity, cents)
+        self._lines = None
+
+    @transaction.atomic
+    def _merge(self, session_storage):
+        """Додає рядки кошика сесії до кошика користувача і очищує кошик сесії"""
+        stored = self.storage.get_items()
+        quantities = {
+            int(product_id): stored.get(product_id, (0, 0))[0] + quantity
+            for product_id, (quantity, _) in session_storage.get_items().items()
+        }
+        for line in pricing.price_lines(quantities):
+            self._set_item(str(line.product.id), line.quantity, line.total_cents)
+        session_storage.clear()
 
-    
     def add(self, product, quantity=1, update_quantity=False):
         product_id = str(product.id)
-        
-    
-        current_qty = self.cart.get(product_id, {}).get('quantity', 0)
+        items = self.storage.get_items()
+        current_qty = items.get(product_id, (0, 0))[0]
         new_qty = quantity if update_quantity else current_qty + quantity
-        effective_price = product.get_discounted_price(quantity=new_qty)
-        
+        cents = pricing.price_product(product, new_qty).total_cents if new_qty > 0 else 0
+        if items.get(product_id, [0, 0]) != [max(new_qty, 0), cents]:
+            self._set_item(product_id, new_qty, cents)
 
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.price)  
-            }
-        
-   
-        if update_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-        
-
-        self.cart[product_id]['price'] = str(effective_price)
-        self.save()
-
-    def save(self):
-        self.session.modified = True
-
-    
     def remove(self, product):
         product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save
+        if product_id in self.storage.get_items():
+            self._set_item(product_id, 0, 0)
+
+    def get_lines(self):
+        """Рядки кошика з актуальними цінами (pricing.PricedLine)"""
+        if self._lines is None:
+            items = self.storage.get_items()
+            lines = pricing.price_lines({
+                int(product_id): quantity for product_id, (quantity, _) in items.items()
+            })
+            # Знижки змінились або товари видалено — оновлюємо збережені суми
+            current = {str(line.product.id): [line.quantity, line.total_cents] for line in lines}
+            for product_id in items.keys() - current.keys():
+                self.storage.set_item(product_id, 0, 0)
+            for product_id, (quantity, cents) in current.items():
+                if items.get(product_id) != [quantity, cents]:
+                    self.storage.set_item(product_id, quantity, cents)
+            self._lines = lines
+        return self._lines
 
-    
     def __iter__(self):
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        # Створюємо мапу ID → Product
-        products_dict = {str(p.id): p for p in products}
-
-        for product_id, item in self.cart.items():
-            product = products_dict.get(product_id)
-            if product:
-                # Копіюємо дані з кошика
-                cart_item = {
-                    'product': {
-                        'id': product.id,
-                        'name': product.name,
-                        'slug': product.slug,
-                        'price': float(product.price),
-                        'get_absolute_url': product.get_absolute_url(),
-                        'category': {'name': product.category.name},
-                        'image_url': product.image.url if product.image else None,
-                    },
-                    'quantity': item['quantity'],
-                    'price': float(item['price']),  # з рядка назад у float
-                }
-                cart_item['total_price'] = cart_item['price'] * cart_item['quantity']
-                yield cart_item
+        return iter(self.get_lines())
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
+        return self.storage.get_totals()[0]
 
     def get_total_price(self):
-        return sum(float(item['price']) * item['quantity'] for item in self.cart.values())
+        return pricing.from_cents(self.storage.get_totals()[1])
 
     def clear(self):
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
-    
+        self.storage.clear()
+        self._lines = None
+
     def get_total_quantity(self):
-        return sum(item['quantity'] for item in self.cart.values())
-    
-    
+        return self.storage.get_totals()[0]
+
     def get_promo_info(self):
         """Повертає словник: {'promo': PromoCode, 'discount': Decimal, 'new_total': Decimal} або None"""
         promo_id = self.session.get('applied_promo')
@@ -110,4 +245,9 @@ class Cart:
             }
         except PromoCode.DoesNotExist:
             self.session.pop('applied_promo', None)
-            return None
\ No newline at end of file
+            return None
+
+
+def merge_session_cart(request):
+    """Викликається після login(): кошик сесії переноситься в кошик користувача в БД"""
+    Cart(request)
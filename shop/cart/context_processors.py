@@ -0,0 +1,9 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import Cart
+
+
+def cart(request):
+    # Кількість для значка кошика — із загальних сум кошика, без запитів до товарів;
+    # лінива, тож сторінки без значка не читають кошик (і StoredCart) зовсім
+    return {'cart_item_count': SimpleLazyObject(lambda: len(Cart(request)))}
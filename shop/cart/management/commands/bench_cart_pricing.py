@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cart import pricing
+from discounts.models import Discount
+from main.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Порівнює перерахунок цін кошика по рядку (Product.get_discounted_price) '
+        'і одним проходом (cart/pricing.py) для кошиків з 1/10/100 рядків. '
+        'Дані створюються в транзакції і відкочуються.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,100', help='Кількості рядків через кому')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        rng = random.Random(42)
+        with transaction.atomic():
+            ids = self._populate(max(sizes), rng)
+            for size in sizes:
+                quantities = {product_id: rng.randint(1, 6) for product_id in rng.sample(ids, size)}
+                legacy, legacy_queries = self._measure(self._legacy, quantities, options['repeat'])
+                batch, batch_queries = self._measure(pricing.price_lines, quantities, options['repeat'])
+                self.stdout.write(
+                    f'{size:>4} рядків: по рядку {legacy * 1000:.2f} мс ({legacy_queries} запитів), '
+                    f'одним проходом {batch * 1000:.2f} мс ({batch_queries} запитів)'
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, count, rng):
+        category = Category.objects.create(name='Бенчмарк', slug='bench-cart-pricing-tmp')
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Товар {i}', slug=f'bench-cart-{i}', description='',
+                price=Decimal(rng.randint(100, 100_000)) / 100, category=category,
+                image='products/bench.png',
+            )
+            for i in range(count)
+        )
+        now = timezone.now()
+        discounts = []
+        for product in products:
+            # Половина товарів зі знижкою, частина — з додатковою знижкою від 3 шт.
+            if rng.random() < 0.5:
+                discounts.append(Discount(
+                    product=product, discount_type='percentage', value=10,
+                    start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+                ))
+                if rng.random() < 0.5:
+                    discounts.append(Discount(
+                        product=product, discount_type='fixed', value=Decimal('0.50'), min_quantity=3,
+                        start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+                    ))
+        Discount.objects.bulk_create(discounts)
+        return [product.id for product in products]
+
+    def _legacy(self, quantities):
+        # Як раніше: ціна кожного рядка — окремий запит знижок,
+        # категорія кожного рядка — окремий запит
+        lines = []
+        for product in Product.objects.filter(id__in=quantities):
+            lines.append((product.category.name, product.get_discounted_price(quantity=quantities[product.id])))
+        return lines
+
+    def _measure(self, func, quantities, repeat):
+        with CaptureQueriesContext(connection) as queries:
+            func(quantities)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(quantities)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), len(queries)
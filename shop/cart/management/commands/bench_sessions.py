@@ -0,0 +1,92 @@
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from main import view_counter
+from main.models import Product
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Навантажувальний тест сесій: симулює відвідувачів каталогу і рахує '
+        'записи в django_session на запит — з SESSION_SAVE_EVERY_REQUEST '
+        '(як раніше) і з записом лише при змінах. Зміни відкочуються.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=200)
+        parser.add_argument('--pages', type=int, default=10,
+                            help='Переглядів сторінок каталогу на відвідувача')
+        parser.add_argument('--buyers', type=float, default=0.2,
+                            help='Частка відвідувачів, що додають товар у кошик')
+
+    def handle(self, *args, **options):
+        products = list(
+            Product.objects.filter(is_available=True).order_by('?').values_list('id', 'slug')[:50]
+        )
+        if not products:
+            raise CommandError('Немає доступних товарів — спершу наповніть каталог.')
+        middleware = [m for m in settings.MIDDLEWARE if m != 'cart.middleware.SessionRefreshMiddleware']
+        modes = [
+            ('кожен запит', override_settings(SESSION_SAVE_EVERY_REQUEST=True, MIDDLEWARE=middleware)),
+            ('лише зміни', override_settings(SESSION_SAVE_EVERY_REQUEST=False)),
+        ]
+        for label, overrides in modes:
+            # Перегляди товарів не потрапляють у буфер процесу і не записуються
+            with overrides, view_counter.isolated(), transaction.atomic():
+                stats, elapsed = self._run(products, options)
+                transaction.set_rollback(True)
+            requests = stats['requests']
+            self.stdout.write(
+                f'{label}: {requests} запитів за {elapsed:.1f} с; записів django_session '
+                f'{stats["session"]} ({stats["session"] / requests:.2f} на запит), '
+                f'з них при перегляді каталогу без кошика {stats["browse_session"]}; '
+                f'нових сесій {stats["created"]}'
+            )
+
+    def _run(self, products, options):
+        rng = random.Random(42)
+        stats = Counter()
+        state = {'phase': None}
+
+        def count_writes(execute, sql, params, many, context):
+            statement = sql.lstrip().split(None, 1)[0].upper()
+            if statement in WRITE_STATEMENTS and 'django_session' in sql:
+                stats['session'] += 1
+                stats['created'] += statement == 'INSERT'
+                stats['browse_session'] += state['phase'] == 'browse'
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_writes):
+            for _ in range(options['visitors']):
+                client = Client(SERVER_NAME='localhost')
+                buyer = rng.random() < options['buyers']
+                state['phase'] = 'browse'
+                for _ in range(options['pages']):
+                    self._browse(client, products, rng)
+                    stats['requests'] += 1
+                if buyer:
+                    state['phase'] = 'cart'
+                    product_id, _ = rng.choice(products)
+                    client.post(reverse('cart:cart_add', args=[product_id]), {'quantity': 1})
+                    stats['requests'] += 1
+                    for _ in range(options['pages']):
+                        self._browse(client, products, rng)
+                        stats['requests'] += 1
+        return stats, time.perf_counter() - started
+
+    def _browse(self, client, products, rng):
+        if rng.random() < 0.5:
+            client.get(reverse('main:product_list'), {'page': rng.randint(1, 3)})
+        else:
+            product_id, slug = rng.choice(products)
+            client.get(reverse('main:product_detail', args=[product_id, slug]))
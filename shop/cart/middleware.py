@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+
+# Час (unix) останнього продовження строку дії сесії
+REFRESHED_AT_SESSION_KEY = '_refreshed_at'
+
+
+class SessionRefreshMiddleware:
+    """
+    Ковзний строк дії сесії без SESSION_SAVE_EVERY_REQUEST: наявна непорожня
+    сесія зберігається (і продовжується на SESSION_COOKIE_AGE) не частіше ніж
+    раз на SESSION_REFRESH_INTERVAL секунд. Запити без cookie сесії сесію
+    не завантажують і не створюють.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is None:
+            return response
+        now = int(time.time())
+        if session.modified:
+            # Сесія й так записується — позначка оновлюється без окремого запису
+            if _has_data(session):
+                session[REFRESHED_AT_SESSION_KEY] = now
+        elif session.session_key is not None:
+            refreshed_at = session.get(REFRESHED_AT_SESSION_KEY, 0)
+            interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', 3600)
+            # session_key скидається, якщо сесії з cookie вже немає в БД
+            if (session.session_key is not None and now - refreshed_at >= interval
+                    and _has_data(session)):
+                session[REFRESHED_AT_SESSION_KEY] = now
+        return response
+
+
+def _has_data(session):
+    return any(key != REFRESHED_AT_SESSION_KEY for key in session.keys())
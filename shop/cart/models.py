@@ -1,3 +1,42 @@
+from django.conf import settings
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class StoredCart(models.Model):
+    """
+    Кошик користувача в БД (див. cart/cart.py). Загальні кількість і сума
+    (у копійках) оновлюються разом із рядками, тож значок кошика — один
+    запит за первинним ключем.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, related_name='stored_cart', on_delete=models.CASCADE,
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    cents = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Кошик')
+        verbose_name_plural = _('Кошики')
+
+    def __str__(self):
+        return f'{self.user_id}: {self.quantity} шт.'
+
+
+class StoredCartLine(models.Model):
+    """Рядок кошика: кількість і сума рядка в копійках на момент останнього перерахунку"""
+    cart = models.ForeignKey(StoredCart, related_name='lines', on_delete=models.CASCADE)
+    product = models.ForeignKey('main.Product', related_name='+', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    cents = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = _('Рядок кошика')
+        verbose_name_plural = _('Рядки кошика')
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='stored_cart_line_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} × {self.quantity}'
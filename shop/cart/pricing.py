@@ -0,0 +1,105 @@
+"""
+Перерахунок цін кошика одним проходом.
+
+Кошик зберігає для кожного рядка кількість і суму рядка в копійках, а також
+загальні кількість і суму (у сесії — {'items': {id: [кількість, копійки]},
+'quantity': ..., 'cents': ...}, у БД — StoredCart/StoredCartLine). Збережені
+суми дають значок і підсумок без запитів до товарів, але застарівають, коли
+знижки починаються чи закінчуються, тож при показі кошика рядки
+переоцінюються за поточними знижками (Cart.get_lines) і змінені суми
+записуються назад:
+- товари — один запит із select_related('category');
+- чинні знижки всіх товарів кошика — один запит;
+- вибір найвигіднішої знижки з урахуванням min_quantity — у пам'яті,
+  за тим самим правилом, що й Product.get_active_discount().
+
+Суми — цілі копійки (to_cents/from_cents): додавання і віднімання точні,
+а в сесії зберігаються компактні цілі числа.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.utils import timezone
+
+from discounts.models import Discount
+from main.models import Product
+
+CENT = Decimal('0.01')
+
+
+def to_cents(amount):
+    return int(Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class PricedLine:
+    """Рядок кошика з актуальною ціною; update_quantity_form додає cart_detail"""
+
+    __slots__ = ('product', 'quantity', 'discount', 'unit_cents', 'total_cents', 'update_quantity_form')
+
+    def __init__(self, product, quantity, discount):
+        self.product = product
+        self.quantity = quantity
+        self.discount = discount
+        if discount is not None:
+            self.total_cents = to_cents(discount.get_discounted_price(product.price, quantity))
+        else:
+            self.total_cents = to_cents(product.price) * quantity
+        # Ціна одиниці для показу: сума рядка / кількість, з округленням половини вгору
+        self.unit_cents = (2 * self.total_cents + quantity) // (2 * quantity)
+        self.update_quantity_form = None
+
+    @property
+    def unit_price(self):
+        return from_cents(self.unit_cents)
+
+    @property
+    def total_price(self):
+        return from_cents(self.total_cents)
+
+
+def best_discount(discounts, price, quantity):
+    """Найвигідніша знижка для кількості quantity або None"""
+    applicable = [d for d in discounts if quantity >= d.min_quantity]
+    if not applicable:
+        return None
+    return max(applicable, key=lambda d: d.calculate_discount(price, quantity))
+
+
+def load_discounts(product_ids, now=None):
+    """{product_id: [чинні знижки]} одним запитом"""
+    now = now or timezone.now()
+    discounts = defaultdict(list)
+    for discount in Discount.objects.filter(
+        product_id__in=product_ids, is_active=True, start_date__lte=now, end_date__gte=now,
+    ):
+        discounts[discount.product_id].append(discount)
+    return discounts
+
+
+def price_product(product, quantity):
+    """PricedLine для вже завантаженого товару (один запит знижок)"""
+    discounts = load_discounts([product.id]).get(product.id, ())
+    return PricedLine(product, quantity, best_discount(discounts, product.price, quantity))
+
+
+def price_lines(quantities):
+    """
+    {product_id: кількість} → [PricedLine] у порядку quantities.
+    Товари, яких уже немає в БД, пропускаються.
+    """
+    if not quantities:
+        return []
+    products = Product.objects.select_related('category').in_bulk(quantities.keys())
+    discounts = load_discounts(list(products))
+    lines = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or quantity < 1:
+            continue
+        discount = best_discount(discounts.get(product_id, ()), product.price, quantity)
+        lines.append(PricedLine(product, quantity, discount))
+    return lines
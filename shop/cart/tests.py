@@ -1,3 +1,231 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from discounts.models import Discount
+from main.models import Category, Product
+from main.recommendations import RECENT_VIEWS_COOKIE
+
+from . import context_processors, pricing
+from .cart import DatabaseCartStorage
+from .middleware import REFRESHED_AT_SESSION_KEY
+from .models import StoredCart, StoredCartLine
+
+
+class SessionWriteTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='K', slug='k')
+        self.product = Product.objects.create(
+            name='A', slug='a', description='d', price=10, category=category, image='x.png',
+        )
+
+    def session(self):
+        return Session.objects.get()
+
+    def test_browsing_without_cart_writes_no_session(self):
+        self.client.get('/')
+        self.client.get(self.product.get_absolute_url())
+        self.client.get('/cart/')
+        self.assertEqual(Session.objects.count(), 0)
+        # Нещодавні перегляди живуть у підписаній cookie, а не в сесії
+        self.assertIn(RECENT_VIEWS_COOKIE, self.client.cookies)
+
+    def test_session_is_saved_on_change_and_refreshed_by_interval(self):
+        self.client.post(f'/cart/add/{self.product.id}/', {'quantity': 2})
+        data = self.session().get_decoded()
+        self.assertEqual(data['cart']['items'][str(self.product.id)][0], 2)
+        self.assertIn(REFRESHED_AT_SESSION_KEY, data)
+
+        expire_date = self.session().expire_date
+        self.client.get('/')
+        self.assertEqual(self.session().expire_date, expire_date)
+        with override_settings(SESSION_REFRESH_INTERVAL=0):
+            self.client.get('/')
+        self.assertGreater(self.session().expire_date, expire_date)
+
+        self.client.post(f'/cart/remove/{self.product.id}/')
+        self.assertNotIn('cart', self.session().get_decoded())
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='K', slug='k')
+        self.a = Product.objects.create(
+            name='A', slug='a', description='d', price=Decimal('100'), category=category, image='x.png',
+        )
+        self.b = Product.objects.create(
+            name='B', slug='b', description='d', price=Decimal('10'), category=category, image='x.png',
+        )
+        now = timezone.now()
+        for kind, value, min_quantity in [('percentage', 10, 1), ('fixed', 30, 3)]:
+            Discount.objects.create(
+                product=self.a, discount_type=kind, value=value, min_quantity=min_quantity,
+                start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+            )
+
+    def test_price_lines_in_two_queries(self):
+        with self.assertNumQueries(2):
+            lines = pricing.price_lines({self.a.id: 2, self.b.id: 1, 999: 1})
+            [line.product.category.name for line in lines]
+        self.assertEqual(
+            [(line.unit_price, line.total_price) for line in lines],
+            [(Decimal('90.00'), Decimal('180.00')), (Decimal('10.00'), Decimal('10.00'))],
+        )
+
+    def test_quantity_tiers_match_model(self):
+        self.assertEqual(pricing.price_lines({self.a.id: 3})[0].total_price, Decimal('210.00'))
+        for quantity in (1, 2, 3, 5):
+            self.a.reset_discount_cache()
+            self.assertEqual(
+                pricing.price_lines({self.a.id: quantity})[0].total_price,
+                self.a.get_discounted_price(quantity),
+            )
+
+        self.client.post(f'/cart/add/{self.a.id}/', {'quantity': 2})
+        self.assertContains(self.client.get('/cart/'), '₴180.00')
+
+
+class CartDetailTests(TestCase):
+    def test_query_count_does_not_grow_with_lines(self):
+        category = Category.objects.create(name='K', slug='k')
+        products = [
+            Product.objects.create(
+                name=f'A{i}', slug=f'a{i}', description='d', price=10, category=category, image='',
+            )
+            for i in range(10)
+        ]
+        self.client.post(f'/cart/add/{products[0].id}/', {'quantity': 2})
+        with CaptureQueriesContext(connection) as one_line:
+            response = self.client.get('/cart/')
+        self.assertContains(response, 'name="update" value="True"')
+
+        for product in products[1:]:
+            self.client.post(f'/cart/add/{product.id}/', {'quantity': 1})
+        with CaptureQueriesContext(connection) as ten_lines:
+            self.client.get('/cart/')
+        self.assertEqual(len(one_line), len(ten_lines))
+
+        self.client.post(f'/cart/add/{products[0].id}/', {'quantity': 5, 'update': True})
+        self.assertEqual(self.client.session['cart']['items'][str(products[0].id)][0], 5)
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='K', slug='k')
+        self.a = Product.objects.create(
+            name='A', slug='a', description='d', price=Decimal('0.10'), category=category, image='',
+        )
+        self.b = Product.objects.create(
+            name='B', slug='b', description='d', price=Decimal('0.20'), category=category, image='',
+        )
+
+    def test_running_totals_in_cents(self):
+        self.client.post(f'/cart/add/{self.a.id}/', {'quantity': 3})
+        self.client.post(f'/cart/add/{self.b.id}/', {'quantity': 1})
+        self.assertEqual(self.client.session['cart'], {
+            'items': {str(self.a.id): [3, 30], str(self.b.id): [1, 20]}, 'quantity': 4, 'cents': 50,
+        })
+        self.assertEqual(self.client.get('/').context['cart_item_count'], 4)
+
+        # Показ кошика переоцінює рядки за чинними знижками
+        now = timezone.now()
+        Discount.objects.create(
+            product=self.a, discount_type='percentage', value=50,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['cart'].get_total_price(), Decimal('0.35'))
+        self.assertEqual(self.client.session['cart']['cents'], 35)
+
+        self.client.post(f'/cart/remove/{self.b.id}/')
+        self.assertEqual(self.client.session['cart'], {
+            'items': {str(self.a.id): [3, 15]}, 'quantity': 3, 'cents': 15,
+        })
+
+    def test_legacy_session_format_is_converted(self):
+        session = self.client.session
+        session['cart'] = {str(self.b.id): {'quantity': 2, 'price': '9.99'}}
+        session.save()
+        self.assertEqual(self.client.get('/').context['cart_item_count'], 2)
+        self.assertEqual(self.client.session['cart']['cents'], 40)
+
+    def test_badge_count_is_lazy(self):
+        request = RequestFactory().get('/')
+        with mock.patch('cart.context_processors.Cart') as cart_class:
+            cart_class.return_value.__len__.return_value = 2
+            context = context_processors.cart(request)
+            cart_class.assert_not_called()
+            self.assertTrue(context['cart_item_count'] > 0)
+            self.assertEqual(str(context['cart_item_count']), '2')
+        cart_class.assert_called_once_with(request)
+
+
+class StoredCartTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='K', slug='k')
+        self.a = Product.objects.create(
+            name='A', slug='a', description='d', price=Decimal('1.50'), category=category, image='',
+        )
+        self.b = Product.objects.create(
+            name='B', slug='b', description='d', price=Decimal('2'), category=category, image='',
+        )
+        self.user = User.objects.create_user('bob', password='pw12345!x')
+
+    def totals(self):
+        cart = StoredCart.objects.get(user=self.user)
+        return cart.quantity, cart.cents
+
+    def test_session_cart_merges_on_login(self):
+        stored = StoredCart.objects.create(user=self.user, quantity=2, cents=350)
+        StoredCartLine.objects.create(cart=stored, product=self.a, quantity=1, cents=150)
+        StoredCartLine.objects.create(cart=stored, product=self.b, quantity=1, cents=200)
+        self.client.post(f'/cart/add/{self.a.id}/', {'quantity': 2})
+        response = self.client.post(reverse('accounts:login'), {'username': 'bob', 'password': 'pw12345!x'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('cart', self.client.session)
+        self.assertEqual(self.totals(), (4, 650))
+        self.assertEqual(dict(stored.lines.values_list('product_id', 'quantity')), {self.a.id: 3, self.b.id: 1})
+
+        self.client.post(f'/cart/add/{self.b.id}/', {'quantity': 5, 'update': True})
+        self.assertEqual(self.totals(), (8, 1450))
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['cart_item_count'], 8)
+        self.assertContains(response, '₴14.50')
+
+        self.client.post(f'/cart/remove/{self.a.id}/')
+        self.assertEqual(self.totals(), (5, 1000))
+        self.client.post('/cart/clear/')
+        self.assertEqual(self.totals(), (0, 0))
+        self.assertFalse(stored.lines.exists())
+
+    def test_concurrent_first_saves_share_one_cart(self):
+        # Обидва запити прочитали кошик до того, як його створив будь-який з них
+        first, second = DatabaseCartStorage(self.user), DatabaseCartStorage(self.user)
+        self.assertEqual((first.get_totals(), second.get_totals()), ((0, 0), (0, 0)))
+        first.set_item(str(self.a.id), 1, 150)
+        second.set_item(str(self.b.id), 2, 400)
+        self.assertEqual(StoredCart.objects.count(), 1)
+        self.assertEqual(self.totals(), (3, 550))
+        self.assertEqual(second.get_totals(), (3, 550))
+
+    def test_stale_line_cache_does_not_skew_totals(self):
+        first, second = DatabaseCartStorage(self.user), DatabaseCartStorage(self.user)
+        first.set_item(str(self.a.id), 1, 150)
+        second.get_items()
+        third = DatabaseCartStorage(self.user)
+        third.get_items()
+        # second і third бачать 1 шт.; обидва змінюють той самий рядок
+        second.set_item(str(self.a.id), 2, 300)
+        third.set_item(str(self.a.id), 4, 600)
+        self.assertEqual(self.totals(), (4, 600))
+        second.set_item(str(self.a.id), 0, 0)
+        self.assertEqual(self.totals(), (0, 0))
+        self.assertFalse(StoredCartLine.objects.exists())
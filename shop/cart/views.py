@@ -33,10 +33,10 @@ def cart_clear(request):
 
 def cart_detail(request):
     cart = Cart(request)
-    # Додаємо форму оновлення кількості для кожного товару
-    for item in cart:
-        item['update_quantity_form'] = CartAddProductForm(
-            initial={'quantity': item['quantity'], 'override': True}
+    # Рядки з цінами обчислюються один раз; шаблон ітерує ті самі об'єкти
+    for line in cart.get_lines():
+        line.update_quantity_form = CartAddProductForm(
+            initial={'quantity': line.quantity, 'update': True}
         )
     # Отримуємо інфо про промокод (для шаблону)
     promo_info = cart.get_promo_info()
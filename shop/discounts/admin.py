@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Discount, PromoCode, PromoCodeUsage
+from .scheduler import reprice_products, scheduler
+from main import page_cache
 from django.utils.html import format_html
 from django.urls import reverse
 
@@ -19,13 +21,21 @@ class DiscountAdmin(admin.ModelAdmin):
     is_valid_now.short_description = 'Дійсна зараз'
 
     def activate_discounts(self, request, queryset):
-        queryset.update(is_active=True)
+        self._set_active(queryset, True)
     activate_discounts.short_description = "Активувати вибрані знижки"
 
     def deactivate_discounts(self, request, queryset):
-        queryset.update(is_active=False)
+        self._set_active(queryset, False)
     deactivate_discounts.short_description = "Деактивувати вибрані знижки"
 
+    def _set_active(self, queryset, is_active):
+        # update() не викликає сигналів, тому ціни перераховуємо явно
+        product_ids = list(queryset.values_list('product_id', flat=True).distinct())
+        queryset.update(is_active=is_active)
+        reprice_products(product_ids)
+        scheduler.invalidate()
+        page_cache.invalidate_products(product_ids)
+
 
 @admin.register(PromoCode)
 class PromoCodeAdmin(admin.ModelAdmin):
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from discounts.scheduler import reprice_products, scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Оновлює Product.effective_price: повністю (--all) або лише для товарів, '
+        'чиї знижки почались чи закінчились. З --loop працює як фоновий процес.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перерахувати ціни всього каталогу')
+        parser.add_argument('--loop', action='store_true',
+                            help='Працювати безперервно, прокидаючись на найближчій межі знижки')
+        parser.add_argument('--max-sleep', type=float, default=30,
+                            help='Максимальна пауза між перевірками в режимі --loop (с)')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            changed = reprice_products()
+            self.stdout.write(self.style.SUCCESS(f'Оновлено цін: {changed}'))
+
+        changed = scheduler.run_due()
+        if changed:
+            self.stdout.write(f'Межі знижок: оновлено {changed} цін')
+
+        while options['loop']:
+            next_boundary = scheduler.next_boundary()
+            sleep = options['max_sleep']
+            if next_boundary is not None:
+                sleep = min(sleep, max((next_boundary - timezone.now()).total_seconds(), 0))
+            time.sleep(sleep)
+            changed = scheduler.run_due()
+            if changed:
+                self.stdout.write(f'Межі знижок: оновлено {changed} цін')
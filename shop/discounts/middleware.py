@@ -0,0 +1,12 @@
+from .scheduler import scheduler
+
+
+class DiscountBoundaryMiddleware:
+    """Застосовує зміни цін, коли настає start_date/end_date знижки"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        scheduler.run_due()
+        return self.get_response(request)
@@ -0,0 +1,145 @@
+"""
+Підтримка матеріалізованої колонки Product.effective_price.
+
+Ціна зі знижкою змінюється у двох випадках:
+1. змінилась сама знижка або ціна товару — це обробляють сигнали
+   (discounts/signals.py, main/signals.py);
+2. настав момент start_date або end_date знижки — без жодного запису в БД.
+
+Для другого випадку BoundaryScheduler тримає впорядковану (heap) часову
+шкалу найближчих меж знижок. run_due() дешево порівнює поточний час
+з вершиною купи і перераховує лише ті товари, чиї межі вже настали.
+Планувальник викликається на кожному запиті (DiscountBoundaryMiddleware)
+та командою `manage.py reprice_products --loop` для фонового процесу.
+"""
+import heapq
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Prefetch, Q
+from django.utils import timezone
+
+from .models import Discount
+
+WATERMARK_KEY = 'discounts:boundary_watermark'
+
+# Знижка дійсна включно з end_date, тому подія «кінець» настає одразу після неї
+END_EPSILON = timedelta(microseconds=1)
+
+
+def reprice_products(product_ids=None, batch_size=500):
+    """
+    Перераховує effective_price для товарів (або всього каталогу, якщо
+    product_ids=None). Знижки завантажуються одним prefetch-запитом на пачку,
+    змінені ціни записуються через bulk_update. Повертає кількість змін.
+    """
+    from main import facets, page_cache
+    from main.models import Product
+    from main.pagination import iter_batches
+
+    queryset = Product.objects.prefetch_related(
+        Prefetch('discounts', queryset=Discount.objects.filter(is_active=True))
+    ).only('id', 'price', 'effective_price', 'category_id')
+
+    changed = 0
+    for products in iter_batches(queryset, batch_size, ids=product_ids):
+        to_update = []
+        for product in products:
+            price = product.calculate_effective_price()
+            if price != product.effective_price:
+                product.effective_price = price
+                to_update.append(product)
+        if to_update:
+            Product.objects.bulk_update(to_update, ['effective_price'])
+            facets.update_products([p.id for p in to_update], facet_names=('price', 'discount'))
+            page_cache.invalidate_products(
+                [p.id for p in to_update], [p.category_id for p in to_update],
+            )
+            changed += len(to_update)
+    return changed
+
+
+class BoundaryScheduler:
+    """
+    Часова шкала меж знижок у вигляді купи (момент, id товару).
+    Завантажується вікнами по `window` секунд з моменту останнього
+    обробленого часу (watermark), тож межа не пропускається навіть
+    якщо між запитами пройшло багато часу.
+    """
+
+    def __init__(self, window=60):
+        self.window = timedelta(seconds=window)
+        self._heap = []
+        self._horizon = None
+        self._loaded_until = None
+        self._watermark = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(window=getattr(settings, 'DISCOUNT_SCHEDULER_WINDOW', 60))
+
+    def invalidate(self):
+        """Змусити перечитати шкалу (знижки змінились)"""
+        with self._lock:
+            self._loaded_until = None
+
+    def _load(self, now):
+        if self._watermark is None:
+            self._watermark = cache.get(WATERMARK_KEY) or now
+        start, until = self._watermark, now + self.window
+        discounts = Discount.objects.filter(is_active=True).filter(
+            Q(start_date__gt=start, start_date__lte=until) |
+            Q(end_date__gte=start - END_EPSILON, end_date__lt=until)
+        ).values_list('product_id', 'start_date', 'end_date')
+        heap = []
+        for product_id, start_date, end_date in discounts:
+            if start < start_date <= until:
+                heap.append((start_date, product_id))
+            end = end_date + END_EPSILON
+            if start < end <= until:
+                heap.append((end, product_id))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._loaded_until = until
+        # Найближча межа за вікном — щоб next_boundary() був точним і без подій у вікні
+        later = Discount.objects.filter(is_active=True).aggregate(
+            start=Min('start_date', filter=Q(start_date__gt=until)),
+            end=Min('end_date', filter=Q(end_date__gte=until)),
+        )
+        candidates = [later['start'], later['end'] and later['end'] + END_EPSILON]
+        self._horizon = min((c for c in candidates if c is not None), default=None)
+
+    def next_boundary(self, now=None):
+        """Найближчий момент зміни цін (або None, якщо активних меж попереду немає)"""
+        now = now or timezone.now()
+        with self._lock:
+            if self._loaded_until is None or now >= self._loaded_until:
+                self._load(now)
+            return self._heap[0][0] if self._heap else self._horizon
+
+    def run_due(self, now=None):
+        """Перераховує товари, чиї межі знижок уже настали. Повертає кількість змін."""
+        now = now or timezone.now()
+        with self._lock:
+            if self._loaded_until is None or now >= self._loaded_until:
+                self._load(now)
+            if not self._heap or self._heap[0][0] > now:
+                self._watermark = now
+                return 0
+            due = {product_id for moment, product_id in self._heap if moment <= now}
+        # Події знімаються з купи й watermark посувається лише після успішного
+        # перерахунку: якщо reprice_products впаде, наступний виклик повторить їх
+        changed = reprice_products(due)
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+            if self._watermark is None or self._watermark < now:
+                self._watermark = now
+        cache.set(WATERMARK_KEY, now, None)
+        return changed
+
+
+scheduler = BoundaryScheduler.from_settings()
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Discount
+from .scheduler import reprice_products, scheduler
+from main import page_cache
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def reprice_on_discount_change(sender, instance, raw=False, **kwargs):
+    """Перерахунок effective_price товару та часової шкали при зміні знижки"""
+    if raw:
+        return
+    reprice_products([instance.product_id])
+    scheduler.invalidate()
+    page_cache.invalidate_products([instance.product_id])
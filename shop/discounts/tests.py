@@ -1,3 +1,108 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from main.models import Category, Product
+from main.pagination import iter_batches
+
+from .models import Discount
+from .scheduler import BoundaryScheduler, WATERMARK_KEY, reprice_products
+
+
+class EffectivePriceTests(TestCase):
+    def setUp(self):
+        cache.delete(WATERMARK_KEY)
+        self.now = timezone.now()
+        category = Category.objects.create(name='C', slug='c')
+        self.a = Product.objects.create(
+            name='A', slug='a', description='d', price=Decimal('100'), category=category, image='x.png',
+        )
+        self.b = Product.objects.create(
+            name='B', slug='b', description='d', price=Decimal('50'), category=category, image='x.png',
+        )
+
+    def at(self, seconds):
+        return self.now + timedelta(seconds=seconds)
+
+    def test_discount_save_updates_price_and_listing(self):
+        Discount.objects.create(
+            product=self.a, discount_type='percentage', value=60,
+            start_date=self.at(-3600), end_date=self.at(3600),
+        )
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.effective_price, Decimal('40.00'))
+
+        response = self.client.get('/?sort=price_low')
+        self.assertEqual([p.slug for p in response.context['products']], ['a', 'b'])
+        response = self.client.get('/?max_price=45')
+        self.assertEqual([p.slug for p in response.context['products']], ['a'])
+
+        self.a.price = 80
+        self.a.save()
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.effective_price, Decimal('32.00'))
+
+    def test_scheduler_reprices_at_boundaries(self):
+        Discount.objects.create(
+            product=self.a, discount_type='percentage', value=60,
+            start_date=self.at(-3600), end_date=self.at(30),
+        )
+        Discount.objects.create(
+            product=self.b, discount_type='fixed', value=10,
+            start_date=self.at(10), end_date=self.at(3 * 86400),
+        )
+        scheduler = BoundaryScheduler(window=60)
+        self.assertEqual(scheduler.run_due(self.now), 0)
+        self.assertEqual(scheduler.next_boundary(self.now), self.at(10))
+
+        for seconds, product, price in [
+            (15, self.b, Decimal('40.00')),
+            (31, self.a, Decimal('100')),
+            # За межами вікна: шкала перечитується з watermark
+            (4 * 86400, self.b, Decimal('50')),
+        ]:
+            with mock.patch('django.utils.timezone.now', return_value=self.at(seconds)):
+                self.assertEqual(scheduler.run_due(self.at(seconds)), 1)
+                product.refresh_from_db()
+                self.assertEqual(product.effective_price, price)
+                self.assertEqual(reprice_products(), 0)
+
+    def test_failed_reprice_is_retried(self):
+        Discount.objects.create(
+            product=self.b, discount_type='fixed', value=10,
+            start_date=self.at(10), end_date=self.at(3600),
+        )
+        scheduler = BoundaryScheduler(window=60)
+        scheduler.run_due(self.now)
+        with mock.patch('django.utils.timezone.now', return_value=self.at(15)):
+            with mock.patch('discounts.scheduler.reprice_products', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    scheduler.run_due(self.at(15))
+            self.assertNotEqual(cache.get(WATERMARK_KEY), self.at(15))
+            self.assertEqual(scheduler.next_boundary(self.at(15)), self.at(10))
+            self.assertEqual(scheduler.run_due(self.at(15)), 1)
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.effective_price, Decimal('40.00'))
+        self.assertEqual(cache.get(WATERMARK_KEY), self.at(15))
+
+
+class IterBatchesTests(TestCase):
+    def test_batches_cover_queryset_or_given_ids(self):
+        category = Category.objects.create(name='C', slug='c')
+        ids = [
+            Product.objects.create(
+                name=f'P{i}', slug=f'p{i}', description='d', price=1, category=category, image='x.png',
+            ).id
+            for i in range(5)
+        ]
+        batches = list(iter_batches(Product.objects.all(), 2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual([p.id for batch in batches for p in batch], ids)
 
-# Create your tests here.
+        batches = list(iter_batches(Product.objects.all(), 2, ids=[ids[4], ids[0], ids[4]]))
+        self.assertEqual([[p.id for p in batch] for batch in batches], [[ids[0], ids[4]]])
+        self.assertEqual(list(iter_batches(Product.objects.all(), 2, ids=[])), [])
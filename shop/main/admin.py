@@ -1,6 +1,6 @@
 from django.contrib import admin
-from django.utils.html import format_html
 from markdownx.admin import MarkdownxModelAdmin 
+from . import thumbnails
 from .models import Category, Product
 
 
@@ -14,7 +14,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
     def image_tag(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', obj.image.url)
+            return thumbnails.responsive_image(obj, 'admin', width=50, height=50, style='object-fit: cover;')
         return "—"
     image_tag.short_description = 'Зображення'
 
@@ -49,6 +49,6 @@ class ProductAdmin(MarkdownxModelAdmin):
 
     def image_tag(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', obj.image.url)
+            return thumbnails.responsive_image(obj, 'admin', width=50, height=50, style='object-fit: cover;')
         return "—"
     image_tag.short_description = 'Зображення'
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+JSON API каталогу лише для читання (мобільний клієнт).
+
+    GET /api/products/        — список: ті самі фільтри (category, q,
+                                min_price, max_price, фасети), сортування
+                                (sort, див. views.SORT_MAPPING) і пагінація
+                                (page або cursor), що й у каталогу; limit ≤ MAX_LIMIT
+    GET /api/products/<id>/   — товар
+
+?fields=id,name,price — лише вибрані поля (sparse fieldsets); невідоме
+поле — 400.
+
+Умовні запити (django.views.decorators.http.condition): ETag і
+Last-Modified обчислюються до виконання view з версій кешу сторінок
+(main/page_cache.py) — їх збільшують зміни товарів, знижок (перерахунок
+effective_price) і відгуків (рейтинг), а також категорій. Для товару
+Last-Modified враховує ще Product.updated_at. Повторне опитування без змін
+отримує 304 без вибірки і серіалізації товарів.
+
+Лічильника переглядів у відповідях немає: він змінюється без збільшення
+версій і зробив би сильний ETag неправдивим; з тієї ж причини ETag
+списку з sort=popular змінюється ще й раз на PAGE_CACHE_TIMEOUT.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from . import cards, facets, page_cache
+from .cache import get_versions, version_time
+from .categories import CATEGORIES_VERSION, get_active_categories
+from .models import Product
+from .pagination import paginate
+from .views import filter_catalog, product_list_scope, sort_catalog
+
+# Змінюється разом з форматом відповідей — старі ETag стають недійсними
+API_VERSION = 1
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+LIST_PARAMS = (
+    'category', 'q', 'sort', 'page', 'cursor', 'min_price', 'max_price',
+    'price', 'rating', 'discount', 'featured', 'limit', 'fields',
+)
+
+
+class ApiError(Exception):
+    pass
+
+
+def _discount(discount):
+    if discount is None:
+        return None
+    return {
+        'type': discount.discount_type,
+        'value': discount.value,
+        'ends_at': discount.end_date,
+    }
+
+
+# Поля картки товару (для списку і товару): ім'я → функція від ProductCard
+CARD_FIELDS = {
+    'id': lambda card: card.id,
+    'slug': lambda card: card.slug,
+    'name': lambda card: card.name,
+    'url': lambda card: card.url,
+    'category': lambda card: card.category_name,
+    'description': lambda card: card.description,
+    'price': lambda card: card.price,
+    'effective_price': lambda card: card.effective_price,
+    'discount': lambda card: _discount(card.discount),
+    'featured': lambda card: card.featured,
+    'rating_avg': lambda card: round(card.rating_avg, 2),
+    'rating_count': lambda card: card.rating_count,
+    'image': lambda card: card.image.url if card.image else None,
+}
+# Додаткові поля товару: ім'я → функція від Product
+DETAIL_FIELDS = {
+    'detailed_description_html': lambda product: str(product.get_detailed_description_html()),
+    'rating_distribution': lambda product: product.get_rating_distribution(),
+    'created_at': lambda product: product.created_at,
+    'updated_at': lambda product: product.updated_at,
+}
+LIST_DEFAULT_FIELDS = (
+    'id', 'slug', 'name', 'url', 'category', 'price', 'effective_price', 'discount',
+    'rating_avg', 'rating_count', 'image',
+)
+
+
+def parse_fields(request, available, default):
+    value = request.GET.get('fields', '').strip()
+    if not value:
+        return default
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f'Невідомі поля: {", ".join(unknown)}')
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit має бути цілим числом')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def serialize(card, fields, product=None):
+    return {
+        name: DETAIL_FIELDS[name](product) if name in DETAIL_FIELDS else CARD_FIELDS[name](card)
+        for name in fields
+    }
+
+
+def error_response(message, status=400):
+    return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def api_response(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def _etag(*parts):
+    raw = '|'.join(str(part) for part in (API_VERSION, *parts))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _versions_key(versions):
+    return ','.join(f'{name}={versions[name]}' for name in sorted(versions))
+
+
+# --- Список ---
+
+def _list_versions(request):
+    """Версії області списку (кешуються на запиті) або None для невідомої категорії"""
+    if not hasattr(request, '_api_versions'):
+        names = product_list_scope(request, request.GET.get('category') or None)
+        request._api_versions = get_versions(names) if names is not None else None
+    return request._api_versions
+
+
+def product_list_etag(request):
+    versions = _list_versions(request)
+    if versions is None:
+        return None
+    parts = [request.path, page_cache.normalized_query(request, LIST_PARAMS), _versions_key(versions)]
+    if request.GET.get('sort') == 'popular':
+        # Перегляди змінюються без версій: порядок оновлюється не рідше
+        # ніж раз на PAGE_CACHE_TIMEOUT, як і в кеші сторінок
+        parts.append(int(time.time() // getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)))
+    return _etag(*parts)
+
+
+def product_list_last_modified(request):
+    versions = _list_versions(request)
+    if versions is None:
+        return None
+    return version_time(max(versions.values()))
+
+
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=product_list_etag, last_modified_func=product_list_last_modified)
+def product_list(request):
+    try:
+        fields = parse_fields(request, CARD_FIELDS, LIST_DEFAULT_FIELDS)
+        limit = parse_limit(request)
+    except ApiError as e:
+        return error_response(str(e))
+
+    products = cards.card_queryset(Product.objects.filter(is_available=True))
+    category_slug = request.GET.get('category')
+    if category_slug:
+        category = next((c for c in get_active_categories() if c.slug == category_slug), None)
+        if category is None:
+            return error_response('Категорію не знайдено', status=404)
+        products = products.filter(category=category)
+    products, _, _, _ = filter_catalog(request, products)
+    products = facets.filter_queryset(products, facets.parse_selected(request.GET))
+    products, sort, ordering = sort_catalog(request, products)
+    page = paginate(request, products, limit, ordering)
+
+    return api_response({
+        'results': [serialize(card, fields) for card in cards.load_cards(page.object_list)],
+        'sort': sort,
+        'next': _page_link(request, page, forward=True),
+        'previous': _page_link(request, page, forward=False),
+    })
+
+
+def _page_link(request, page, forward):
+    """Шлях з параметрами сусідньої сторінки або None"""
+    if not (page.has_next() if forward else page.has_previous()):
+        return None
+    query = request.GET.copy()
+    if page.mode == 'cursor':
+        query.pop('page', None)
+        query['cursor'] = page.next_cursor if forward else page.previous_cursor
+    else:
+        query.pop('cursor', None)
+        query['page'] = page.next_page_number() if forward else page.previous_page_number()
+    return f'{request.path}?{query.urlencode()}'
+
+
+# --- Товар ---
+
+def _detail_versions(request, id):
+    if not hasattr(request, '_api_versions'):
+        request._api_versions = get_versions([CATEGORIES_VERSION, page_cache.product_version(id)])
+    return request._api_versions
+
+
+def _detail_updated_at(request, id):
+    """updated_at доступного товару або None (кешується на запиті: один запит на ETag і Last-Modified)"""
+    if not hasattr(request, '_api_updated_at'):
+        request._api_updated_at = (
+            Product.objects.filter(id=id, is_available=True).values_list('updated_at', flat=True).first()
+        )
+    return request._api_updated_at
+
+
+def product_detail_etag(request, id):
+    # Для відсутнього товару умовний запит не дає 304 — view поверне 404
+    if _detail_updated_at(request, id) is None:
+        return None
+    return _etag(
+        request.path, page_cache.normalized_query(request, ('fields',)),
+        _versions_key(_detail_versions(request, id)),
+    )
+
+
+def product_detail_last_modified(request, id):
+    updated_at = _detail_updated_at(request, id)
+    if updated_at is None:
+        return None
+    return max(updated_at, version_time(max(_detail_versions(request, id).values())))
+
+
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=product_detail_etag, last_modified_func=product_detail_last_modified)
+def product_detail(request, id):
+    try:
+        fields = parse_fields(request, CARD_FIELDS.keys() | DETAIL_FIELDS.keys(), None)
+    except ApiError as e:
+        return error_response(str(e))
+    product = Product.objects.filter(id=id, is_available=True).first()
+    if product is None:
+        return error_response('Товар не знайдено', status=404)
+    card = cards.load_cards([product])[0]
+    if fields is None:
+        fields = [*CARD_FIELDS, *DETAIL_FIELDS]
+    return api_response(serialize(card, fields, product))
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Імпорт для реєстрації сигналів і перевірок
+        import main.checks  # noqa: F401
+        import main.signals  # noqa: F401
@@ -0,0 +1,264 @@
+"""
+Автодоповнення пошуку за назвами товарів і категорій.
+
+Індекс тримається в пам'яті процесу: відсортований масив ключів
+(нормалізована назва і її «хвости» від початку кожного слова, тож
+«len» знаходить «Ноутбук Lenovo») з бінарним пошуком діапазону префікса.
+Нормалізація: casefold, транслітерація кирилиці латиницею (українська
+система з доповненнями), прибирання діакритики і розділових знаків —
+тож «ноут», «nout» і «НОУТ» дають однаковий результат, а «леново»
+знаходить «Lenovo» (g і h не розрізняються: «самсунг» → Samsung).
+
+Результати впорядковані за вагою: спочатку категорії, далі товари за
+популярністю. Для префіксів, що охоплюють більше HEAVY_RANGE ключів,
+найкращі записи обчислюються під час побудови (знизу вгору по дереву
+префіксів, один прохід по масиву), для решти — вибираються з діапазону,
+тож запит коштує бінарний пошук і не більше HEAVY_RANGE порівнянь.
+
+Індекс має власну версію AUTOCOMPLETE_VERSION, яку збільшують лише зміни
+назви, slug, доступності чи категорії товару (main/signals.py, імпорт
+каталогу), а також версія категорій; зміни цін, відгуків чи переглядів
+індекс не чіпають. Порядок за популярністю оновлюється не рідше ніж раз
+на AUTOCOMPLETE_MAX_AGE секунд.
+
+Перебудова виконується у фоновому потоці, не частіше ніж раз на
+AUTOCOMPLETE_REBUILD_INTERVAL секунд; до її завершення запити отримують
+старий індекс (одразу після старту процесу — порожній), тож жоден запит
+не чекає на побудову. Після невдалої побудови повтор теж чекає інтервал,
+навіть якщо індексу ще немає. AUTOCOMPLETE_ASYNC = False — будувати в запиті.
+
+Мікробенчмарк на синтетичному корпусі: `manage.py bench_autocomplete`.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+
+from .cache import bump_version, get_versions
+from .cards import product_url_builder
+from .categories import CATEGORIES_VERSION
+from .models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_VERSION = 'autocomplete'
+
+# Префікси з більшою кількістю ключів мають готовий список найкращих записів
+HEAVY_RANGE = 128
+# Вага категорій: завжди вище за товари
+CATEGORY_SCORE = 1e9
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'ie',
+    'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i', 'к': 'k', 'л': 'l',
+    'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ь': '',
+    'ю': 'iu', 'я': 'ia', 'ы': 'y', 'э': 'e', 'ё': 'io', 'ъ': '',
+}
+TRANSLIT = str.maketrans(CYRILLIC_TO_LATIN)
+# Великі літери — з великої першої латинської («Щ» → «Shch»)
+TRANSLIT_UPPER = str.maketrans({
+    cyr.upper(): lat.capitalize() for cyr, lat in CYRILLIC_TO_LATIN.items()
+})
+APOSTROPHE_RE = re.compile("['’ʼ`]")
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def transliterate(text):
+    """Кирилиця → латиниця, без діакритики (регістр зберігається для латиниці)"""
+    text = APOSTROPHE_RE.sub('', text).translate(TRANSLIT_UPPER).translate(TRANSLIT)
+    if not text.isascii():
+        text = ''.join(
+            c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c)
+        )
+    return text
+
+
+@lru_cache(maxsize=100_000)
+def normalize_word(word):
+    # «г» транслітерується як h, але в запозиченнях відповідає g («самсунг»)
+    return transliterate(word).replace('g', 'h')
+
+
+def normalize(text):
+    """Ключ для порівняння: латиниця в нижньому регістрі, слова через пробіл"""
+    text = APOSTROPHE_RE.sub('', (text or '').casefold())
+    # Назви складаються з тих самих слів, тож слова транслітеруються з кешу
+    return ' '.join(filter(None, map(normalize_word, NON_WORD_RE.split(text))))
+
+
+def word_suffixes(key):
+    """Ключ і його хвости від початку кожного наступного слова"""
+    yield key
+    start = key.find(' ')
+    while start != -1:
+        yield key[start + 1:]
+        start = key.find(' ', start + 1)
+
+
+class PrefixIndex:
+    """
+    entries — список (kind, name, url, score). Пошук повертає до limit
+    записів, ключ яких (або хвіст ключа від початку слова) починається з запиту.
+
+    Префікси, яким відповідає більше heavy ключів, мають заздалегідь
+    обчислений список найкращих записів; решта — не більше heavy ключів,
+    з яких найкращі вибираються під час запиту.
+    """
+
+    def __init__(self, entries, limit=10, heavy=HEAVY_RANGE):
+        self.entries = entries
+        self.limit = limit
+        self.heavy = heavy
+        self.scores = [entry[3] for entry in entries]
+
+        pairs = []
+        for i, entry in enumerate(entries):
+            key = normalize(entry[1])
+            if key:
+                pairs.extend((suffix, i) for suffix in word_suffixes(key))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.refs = array('I', (i for _, i in pairs))
+        self.top = {}
+        if len(self.keys) > heavy:
+            self._collect('', 0, len(self.keys))
+
+    def _best(self, refs, limit):
+        return heapq.nlargest(limit, set(refs), key=self.scores.__getitem__)
+
+    def _collect(self, prefix, lo, hi):
+        """
+        Найкращі записи «важкого» префікса [lo, hi) знизу вгору: з легких
+        дочірніх діапазонів беруться всі ключі, з важких — їх готові списки.
+        Кожен ключ переглядається один раз, тож побудова лінійна.
+        """
+        keys, refs = self.keys, self.refs
+        size = len(prefix)
+        candidates = []
+        i = lo
+        while i < hi and len(keys[i]) == size:
+            candidates.append(refs[i])
+            i += 1
+        while i < hi:
+            child = keys[i][:size + 1]
+            j = bisect_left(keys, child + '\uffff', i, hi)
+            if j - i > self.heavy:
+                candidates.extend(self._collect(child, i, j))
+            else:
+                candidates.extend(refs[i:j])
+            i = j
+        best = self._best(candidates, self.limit)
+        if prefix:
+            self.top[prefix] = best
+        return best
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query, limit=None):
+        limit = self.limit if not limit or limit < 1 else min(limit, self.limit)
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        found = self.top.get(prefix)
+        if found is None:
+            keys = self.keys
+            lo = bisect_left(keys, prefix)
+            hi = min(bisect_left(keys, prefix + '\uffff', lo), lo + self.heavy)
+            found = self._best(self.refs[lo:hi], limit)
+        return [self.entries[i] for i in found[:limit]]
+
+
+def load_entries():
+    """Активні категорії і доступні товари як записи індексу"""
+    entries = [
+        ('category', name, Category(slug=slug).get_absolute_url(), CATEGORY_SCORE)
+        for name, slug in Category.objects.filter(is_active=True).values_list('name', 'slug')
+    ]
+    build_url = product_url_builder()
+    products = (
+        Product.objects.filter(is_available=True, category__is_active=True)
+        .values_list('id', 'slug', 'name', 'popularity')
+        .iterator(chunk_size=5000)
+    )
+    entries.extend(
+        ('product', name, build_url(product_id, slug), popularity)
+        for product_id, slug, name, popularity in products
+    )
+    return entries
+
+
+def invalidate():
+    """Нова версія індексу (змінились назви, slug, доступність чи категорії товарів)"""
+    bump_version(AUTOCOMPLETE_VERSION)
+
+
+EMPTY_INDEX = PrefixIndex([])
+
+_state = {'index': None, 'versions': None, 'built_at': 0.0, 'attempted_at': 0.0, 'building': False}
+_lock = threading.Lock()
+
+
+def _is_fresh(versions):
+    now = time.monotonic()
+    age = now - _state['built_at']
+    if versions == _state['versions'] and age < getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 3600):
+        return True
+    # Спроби побудови (зокрема невдалі) — не частіше ніж раз на інтервал,
+    # навіть якщо версія змінилась або індексу ще немає
+    return now - _state['attempted_at'] < getattr(settings, 'AUTOCOMPLETE_REBUILD_INTERVAL', 60)
+
+
+def build_index(versions=None):
+    """Будує індекс і робить його поточним"""
+    versions = versions or get_versions([AUTOCOMPLETE_VERSION, CATEGORIES_VERSION])
+    limit = getattr(settings, 'AUTOCOMPLETE_LIMIT', 10)
+    index = PrefixIndex(load_entries(), limit=limit)
+    _state.update(index=index, versions=versions, built_at=time.monotonic())
+    return index
+
+
+def _build_in_background(versions):
+    try:
+        build_index(versions)
+    except Exception:
+        # Повторна спроба — не раніше ніж через AUTOCOMPLETE_REBUILD_INTERVAL від attempted_at
+        logger.warning('Не вдалося перебудувати індекс автодоповнення', exc_info=True)
+    finally:
+        _state['building'] = False
+        connection.close()
+
+
+def get_index():
+    """Індекс поточної версії (або попередній, поки новий будується у фоні)"""
+    # Версії читаються до завантаження записів: зміна під час побудови дасть ще одну
+    versions = get_versions([AUTOCOMPLETE_VERSION, CATEGORIES_VERSION])
+    index = _state['index']
+    if _is_fresh(versions):
+        return index or EMPTY_INDEX
+    with _lock:
+        if _state['building'] or _is_fresh(versions):
+            return _state['index'] or EMPTY_INDEX
+        _state['attempted_at'] = time.monotonic()
+        if not getattr(settings, 'AUTOCOMPLETE_ASYNC', True):
+            return build_index(versions)
+        _state['building'] = True
+    threading.Thread(target=_build_in_background, args=(versions,), daemon=True).start()
+    return index or EMPTY_INDEX
+
+
+def suggest(query, limit=None):
+    """[{'type', 'name', 'url'}] для рядка пошуку"""
+    return [
+        {'type': kind, 'name': name, 'url': url}
+        for kind, name, url, _ in get_index().search(query, limit)
+    ]
@@ -0,0 +1,63 @@
+"""
+Версіоновані ключі кешу.
+
+Замість пошуку і видалення всіх залежних ключів при зміні даних
+збільшується лише лічильник версії; ключі зі старою версією більше
+ніколи не читаються і витісняються з кешу самі.
+Початкове значення версії — поточний час у нс, тож після втрати ключа
+версії (рестарт, витіснення) не відродяться старі записи.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:%s'
+
+
+def get_version(name):
+    key = VERSION_KEY % name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = VERSION_KEY % name
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
+
+
+def get_versions(names):
+    """Версії кількох імен одним зверненням до кешу: {name: version}"""
+    keys = {VERSION_KEY % name: name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, version in missing.items():
+        cache.add(key, version, None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def version_time(version):
+    """
+    Час версії для Last-Modified: bump_versions() і перше звернення
+    записують поточний час у нс (bump_version() лише додає 1)
+    """
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def bump_versions(names):
+    """
+    Нові версії для кількох імен одним зверненням до кешу. Нове значення —
+    поточний час у нс, тож воно не збігається з жодною попередньою версією.
+    """
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY % name: version for name in names}, None)
@@ -0,0 +1,139 @@
+"""
+Картки товарів для списків (каталог, популярні, схожі товари).
+
+load_cards() перетворює сторінку товарів на легкі об'єкти ProductCard
+за фіксовану кількість запитів, незалежно від розміру сторінки:
+- категорії — з кешованого списку активних категорій (main/categories.py),
+  відсутні в ньому догружаються одним запитом;
+- найкраща знижка — один запит на всі товари сторінки;
+- рейтинг і ціна зі знижкою — з денормалізованих полів товару;
+- URL — один reverse() на виклик, далі підстановка id/slug у шаблон.
+Версії показаних товарів реєструються як залежності кешу сторінок.
+
+card_queryset() обмежує вибірку полями, потрібними картці.
+"""
+from django.urls import reverse
+from django.utils import timezone
+
+from discounts.models import Discount
+
+from . import page_cache
+from .categories import get_active_categories
+from .models import Category
+
+CARD_FIELDS = (
+    'id', 'name', 'slug', 'description', 'price', 'effective_price', 'image', 'image_hash',
+    'views', 'featured', 'rating_avg', 'rating_count',
+    'category_id', 'created_at', 'is_available',
+)
+
+# Значення-замінники для побудови шаблону URL одним reverse()
+_URL_ID = 987654321
+_URL_SLUG = 'card-url-slug'
+
+
+class ProductCard:
+    __slots__ = (
+        'id', 'name', 'slug', 'url', 'description', 'image', 'image_hash', 'price', 'effective_price',
+        'views', 'featured', 'rating_avg', 'rating_count', 'category_name', 'discount',
+    )
+
+    def __init__(self, product, url, category, discount):
+        self.id = product.id
+        self.name = product.name
+        self.slug = product.slug
+        self.url = url
+        self.description = product.description
+        self.image = product.image
+        self.image_hash = product.image_hash
+        self.price = product.price
+        self.effective_price = product.effective_price
+        self.views = product.views
+        self.featured = product.featured
+        self.rating_avg = product.rating_avg
+        self.rating_count = product.rating_count
+        self.category_name = category.name if category else ''
+        self.discount = discount
+
+    def get_absolute_url(self):
+        return self.url
+
+    def get_average_rating(self):
+        return round(self.rating_avg, 1)
+
+    def has_discount(self):
+        return self.effective_price < self.price
+
+    def get_discount_label(self):
+        """Текст бейджа знижки, як на сторінці товару: '-10%' або '-50 грн'"""
+        discount = self.discount
+        if discount is None:
+            return ''
+        if discount.discount_type == 'percentage':
+            return f'-{discount.value.normalize():f}%'
+        return f'-{discount.value.normalize():f} грн'
+
+
+def card_queryset(queryset):
+    """Queryset товарів лише з полями картки"""
+    return queryset.only(*CARD_FIELDS)
+
+
+def product_url_builder():
+    """Функція (id, slug) → URL сторінки товару без reverse() на кожну картку"""
+    template = reverse('main:product_detail', args=[_URL_ID, _URL_SLUG])
+    prefix, _, rest = template.partition(str(_URL_ID))
+    middle, _, suffix = rest.partition(_URL_SLUG)
+    return lambda product_id, slug: f'{prefix}{product_id}{middle}{slug}{suffix}'
+
+
+def load_categories(category_ids):
+    categories = {c.id: c for c in get_active_categories()}
+    missing = set(category_ids) - categories.keys()
+    if missing:
+        categories.update(Category.objects.in_bulk(missing))
+    return categories
+
+
+def load_best_discounts(products):
+    """{product_id: найкраща чинна знижка на 1 шт.} одним запитом"""
+    return best_discounts({p.id: p.price for p in products})
+
+
+def best_discounts(prices):
+    """Те саме для {product_id: ціна} (коли товари прочитані без моделей)"""
+    if not prices:
+        return {}
+    now = timezone.now()
+    discounts = Discount.objects.filter(
+        product_id__in=prices, is_active=True, min_quantity__lte=1,
+        start_date__lte=now, end_date__gte=now,
+    )
+    best = {}
+    for discount in discounts:
+        price = prices[discount.product_id]
+        current = best.get(discount.product_id)
+        if current is None or discount.calculate_discount(price) > current.calculate_discount(price):
+            best[discount.product_id] = discount
+    return best
+
+
+def load_cards(products):
+    """Перетворює товари (сторінку, список) на картки за фіксовану кількість запитів"""
+    products = list(products)
+    if not products:
+        return []
+    # Сторінка в кеші залежить від версій показаних товарів
+    page_cache.depend_on([page_cache.product_version(p.id) for p in products])
+    build_url = product_url_builder()
+    categories = load_categories({p.category_id for p in products})
+    discounts = load_best_discounts(products)
+    return [
+        ProductCard(
+            product,
+            build_url(product.id, product.slug),
+            categories.get(product.category_id),
+            discounts.get(product.id),
+        )
+        for product in products
+    ]
@@ -0,0 +1,159 @@
+"""
+Потоковий експорт каталогу в CSV або JSONL (з необов'язковим gzip).
+
+Товари читаються QuerySet.values_list().iterator(chunk_size) разом
+з категорією, чинні знижки — одним запитом на порцію; рядки серіалізуються
+генераторами і віддаються шматками по EXPORT_BUFFER_SIZE байт — у пам'яті
+лише поточна порція, незалежно від розміру каталогу. Стиснення теж
+потокове (zlib з заголовком gzip).
+
+Колонки сумісні з `manage.py import_catalog`: файл експорту можна
+імпортувати назад (службові колонки імпорт ігнорує).
+
+Текстові комірки CSV, що починаються з = + - @ (а також табуляції чи
+повернення каретки), екрануються апострофом, щоб табличний редактор
+не виконав їх як формулу; імпорт CSV цей апостроф прибирає.
+
+Використовується переглядом main:export_catalog (лише персонал) і
+командою `manage.py export_catalog`.
+"""
+import csv
+import json
+import zlib
+from itertools import islice
+
+from django.utils import timezone
+
+from .cards import best_discounts, product_url_builder
+from .models import Product
+
+COLUMNS = (
+    'id', 'slug', 'name', 'category', 'category_slug', 'price', 'effective_price',
+    'discount_type', 'discount_value', 'discount_min_quantity', 'discount_ends',
+    'rating_avg', 'rating_count', 'is_available', 'featured', 'views', 'url', 'image',
+    'description', 'detailed_description',
+)
+FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'jsonl': ('jsonl', 'application/x-ndjson; charset=utf-8'),
+}
+# Перші символи, з яких табличні редактори починають формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+EXPORT_BUFFER_SIZE = 64 * 1024
+CHUNK_SIZE = 2000
+# Поля запиту: (id, slug, name, …) у порядку розпакування в iter_rows
+FIELDS = (
+    'id', 'slug', 'name', 'category__name', 'category__slug', 'price', 'effective_price',
+    'rating_avg', 'rating_count', 'is_available', 'featured', 'views', 'image',
+    'description', 'detailed_description',
+)
+
+
+def export_queryset(category=None, available_only=False):
+    queryset = Product.objects.order_by('id')
+    if category is not None:
+        queryset = queryset.filter(category=category)
+    if available_only:
+        queryset = queryset.filter(is_available=True)
+    return queryset
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Словники з колонками COLUMNS. Рядки читаються кортежами (без
+    створення моделей), знижки — одним запитом на порцію з chunk_size товарів.
+    """
+    build_url = product_url_builder()
+    rows = queryset.values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        discounts = best_discounts({row[0]: row[5] for row in chunk})
+        for (product_id, slug, name, category, category_slug, price, effective_price, rating_avg,
+             rating_count, is_available, featured, views, image, description, detailed) in chunk:
+            discount = discounts.get(product_id)
+            yield {
+                'id': product_id,
+                'slug': slug,
+                'name': name,
+                'category': category,
+                'category_slug': category_slug,
+                'price': price,
+                'effective_price': effective_price,
+                'discount_type': discount.discount_type if discount else '',
+                'discount_value': discount.value if discount else '',
+                'discount_min_quantity': discount.min_quantity if discount else '',
+                'discount_ends': discount.end_date.isoformat() if discount else '',
+                'rating_avg': round(rating_avg, 2),
+                'rating_count': rating_count,
+                'is_available': is_available,
+                'featured': featured,
+                'views': views,
+                'url': build_url(product_id, slug),
+                'image': image,
+                'description': description,
+                'detailed_description': detailed,
+            }
+
+
+class _Echo:
+    """Файлоподібний об'єкт для csv.writer: повертає рядок замість запису"""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    # BOM — щоб Excel розпізнав UTF-8
+    yield '\ufeff' + writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in map(row.__getitem__, COLUMNS)])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=str) + '\n'
+
+
+def buffered(lines, size=EXPORT_BUFFER_SIZE):
+    """Рядки → шматки байтів не менше size (крім останнього)"""
+    parts, length = [], 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(fmt, queryset, compress=False, chunk_size=CHUNK_SIZE):
+    """Потік байтів експорту у форматі fmt ('csv' або 'jsonl')"""
+    lines = csv_lines if fmt == 'csv' else jsonl_lines
+    chunks = buffered(lines(iter_rows(queryset, chunk_size)))
+    return gzipped(chunks) if compress else chunks
+
+
+def export_filename(fmt, compress=False, category=None):
+    ext = FORMATS[fmt][0]
+    stem = f'catalog-{category.slug}' if category is not None else 'catalog'
+    name = f'{stem}-{timezone.localdate():%Y%m%d}.{ext}'
+    return f'{name}.gz' if compress else name
@@ -0,0 +1,504 @@
+"""
+Потоковий імпорт каталогу з CSV або JSONL (`manage.py import_catalog`).
+
+Файл читається конвеєром генераторів (read_rows → parse_rows → batched):
+у пам'яті лише поточна пачка, тож розмір файлу не обмежений. Кожна
+пачка записується в окремій транзакції (bulk_create і executemany UPDATE) —
+товари зіставляються за slug. Якщо його немає в рядку, він виводиться
+з назви транслітерацією і не збігається ні з наявними товарами, ні з іншими
+записами пачки; лише з match_by_name (--match-by-name) такий рядок оновлює
+товар з тією ж назвою. Категорії шукаються за slug або назвою, відсутні
+створюються.
+
+Поля рядка: slug, name, category, category_slug, description,
+detailed_description, price, is_available, featured, image. Відсутні
+поля не змінюються; нові товари вимагають name, category і price.
+image — URL (завантажується в пулі потоків на пачку наперед), шлях
+у MEDIA або шлях до локального файлу (копіюється в MEDIA).
+
+Масовий запис обходить сигнали, тож похідні дані підтримуються тут:
+HTML опису, effective_price і пошуковий індекс — у транзакції пачки,
+кеш сторінок — після неї; лічильники категорій, фасетні множини
+і мініатюри — один раз наприкінці.
+
+Після кожної пачки позиція записується у файл контрольної точки:
+перерваний імпорт продовжується з --resume.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.validators import validate_slug
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .autocomplete import transliterate
+from .catalog_export import FORMULA_PREFIXES
+from .models import Category, Product
+
+IMPORT_DIR = 'products/import'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'так', '+'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'ні', '-', ''}
+TEXT_FIELDS = ('name', 'description', 'detailed_description')
+BOOL_FIELDS = ('is_available', 'featured')
+# Скільки помилок зберігати з номерами рядків (решта лише рахуються)
+MAX_ERRORS = 50
+
+
+class RowError(ValueError):
+    pass
+
+
+# --- Читання ---
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(path, fmt=None, skip=0):
+    """
+    (номер рядка, dict) з файлу; перші skip записів пропускаються.
+    Для JSONL некоректний рядок дає (номер, RowError).
+    """
+    fmt = detect_format(path, fmt)
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in islice(reader, skip, None):
+                yield reader.line_num, {key: _unescape_cell(value) for key, value in record.items()}
+            return
+        lines = ((number, line) for number, line in enumerate(f, 1) if line.strip())
+        for number, line in islice(lines, skip, None):
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('очікується об\'єкт')
+            except ValueError as e:
+                record = RowError(f'некоректний JSON: {e}')
+            yield number, record
+
+
+def _unescape_cell(value):
+    """Прибирає апостроф, яким експорт екранує комірки-формули (catalog_export.csv_cell)"""
+    if isinstance(value, str) and value.startswith("'") and value[1:2] in FORMULA_PREFIXES:
+        return value[1:]
+    return value
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = _text(value).lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'некоректне логічне значення {value!r}')
+
+
+def _price(value):
+    try:
+        price = Decimal(_text(value).replace(',', '.').replace(' ', ''))
+    except InvalidOperation:
+        raise RowError(f'некоректна ціна {value!r}')
+    if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+        raise RowError(f'некоректна ціна {value!r}')
+    return price.quantize(Decimal('0.01'))
+
+
+def parse_record(record):
+    """
+    Нормалізований запис: {'slug', 'fields', 'category', 'category_slug', 'image'}.
+    Порожні комірки CSV вважаються відсутніми полями.
+    """
+    if isinstance(record, RowError):
+        raise record
+    get = lambda name: record.get(name) if record.get(name) not in (None, '') else None
+    fields = {}
+    for name in TEXT_FIELDS:
+        if get(name) is not None:
+            fields[name] = _text(record[name])
+    if 'name' in fields:
+        fields['name'] = fields['name'][:200]
+    if get('price') is not None:
+        fields['price'] = _price(record['price'])
+    for name in BOOL_FIELDS:
+        if get(name) is not None:
+            fields[name] = _bool(record[name])
+
+    slug = _text(get('slug'))
+    if slug:
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            raise RowError(f'некоректний slug {slug!r}')
+    elif not fields.get('name'):
+        raise RowError('потрібен slug або name')
+    return {
+        'slug': slug[:200],
+        'fields': fields,
+        'category': _text(get('category'))[:100],
+        'category_slug': _text(get('category_slug'))[:100],
+        'image': _text(get('image')),
+    }
+
+
+def parse_rows(rows, on_error):
+    """(номер, запис) → (номер, нормалізований запис); помилки передаються в on_error"""
+    for number, record in rows:
+        try:
+            yield number, parse_record(record)
+        except RowError as e:
+            on_error(number, str(e))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def slug_from_name(name, max_length=200):
+    return slugify(transliterate(name))[:max_length].strip('-') or 'item'
+
+
+# --- Зображення ---
+
+def import_name(key, ext):
+    """Детерміноване ім'я файлу в MEDIA: повторний імпорт не дублює файли"""
+    digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return f'{IMPORT_DIR}/{digest}{ext}'
+
+
+def _image_ext(path):
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else '.jpg'
+
+
+def _check_image(data):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise RowError(f'файл не є зображенням: {e}')
+
+
+def fetch_image(url, timeout=10, max_size=10 * 2**20):
+    """Завантажує зображення за URL у MEDIA (якщо його там ще немає). Повертає ім'я."""
+    name = import_name(url, _image_ext(urlsplit(url).path))
+    if default_storage.exists(name):
+        return name
+    request = Request(url, headers={'User-Agent': 'shop-import/1.0'})
+    with urlopen(request, timeout=timeout) as response:
+        data = response.read(max_size + 1)
+    if len(data) > max_size:
+        raise RowError(f'зображення більше {max_size} байт')
+    _check_image(data)
+    return default_storage.save(name, ContentFile(data))
+
+
+def copy_image(path):
+    """Копіює локальний файл у MEDIA (ім'я залежить від шляху, розміру і часу зміни)"""
+    stat = os.stat(path)
+    name = import_name(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}', _image_ext(path))
+    if default_storage.exists(name):
+        return name
+    with open(path, 'rb') as f:
+        data = f.read()
+    _check_image(data)
+    return default_storage.save(name, ContentFile(data))
+
+
+def update_rows(objects, field_names):
+    """
+    Масове оновлення полів одним executemany — bulk_update будує
+    CASE WHEN для кожного поля і на тисячах рядків повільніший у рази.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    model = objects[0]._meta.model
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(model._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(model._meta.pk.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] + [obj.pk]
+            for obj in objects
+        ])
+
+
+# --- Контрольна точка ---
+
+class Checkpoint:
+    """JSON-файл з кількістю оброблених записів і статистикою"""
+
+    def __init__(self, path, source):
+        self.path = path
+        stat = os.stat(source)
+        self.source = {'path': os.path.abspath(source), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def load(self):
+        """Збережений стан або None; для іншого (зміненого) файлу — RowError"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get('source') != self.source:
+            raise RowError(f'контрольна точка {self.path} належить іншій версії файлу')
+        return state
+
+    def save(self, rows, stats):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'source': self.source, 'rows': rows, 'stats': stats}, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# --- Запис ---
+
+class CatalogImporter:
+    def __init__(self, base_dir='.', workers=8, timeout=10, max_image_size=10 * 2**20, match_by_name=False):
+        self.base_dir = base_dir
+        self.match_by_name = match_by_name
+        self.timeout = timeout
+        self.max_image_size = max_image_size
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'errors': 0, 'images': 0}
+        self.errors = []
+        self.categories_by_slug = {}
+        self.categories_by_name = {}
+        for category in Category.objects.only('id', 'name', 'slug'):
+            self._remember(category)
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def error(self, number, message):
+        self.stats['errors'] += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((number, message))
+
+    def run(self, rows, batch_size=1000, on_batch=None):
+        """
+        Імпортує записи rows (з read_rows). Після коміту кожної пачки
+        викликає on_batch(кількість записів). Зображення наступної пачки
+        завантажуються, поки записується поточна.
+        """
+        pending = deque()
+        for batch in batched(rows, batch_size):
+            records = list(parse_rows(batch, self.error))
+            pending.append((len(batch), records, self._start_images(records)))
+            if len(pending) > 1:
+                self._write(*pending.popleft(), on_batch)
+        while pending:
+            self._write(*pending.popleft(), on_batch)
+
+    def finish(self, thumbnails=True):
+        """Перебудова похідних даних, що не оновлюються по пачках"""
+        from . import counts, facets
+        from .thumbnails import backfill
+
+        counts.rebuild_counts()
+        facets.rebuild()
+        if thumbnails:
+            return backfill()
+        return 0, 0
+
+    def _start_images(self, records):
+        """{номер рядка: future з іменем файлу в MEDIA}"""
+        futures = {}
+        for number, record in records:
+            source = record['image']
+            if not source:
+                continue
+            if urlsplit(source).scheme in ('http', 'https'):
+                futures[number] = self.pool.submit(fetch_image, source, self.timeout, self.max_image_size)
+            elif not os.path.isabs(source) and default_storage.exists(source):
+                record['image_name'] = source
+            else:
+                path = os.path.join(self.base_dir, source)
+                futures[number] = self.pool.submit(copy_image, path)
+        return futures
+
+    def _write(self, size, records, futures, on_batch):
+        for number, record in records:
+            future = futures.get(number)
+            if future is None:
+                continue
+            try:
+                record['image_name'] = future.result()
+                self.stats['images'] += 1
+            except Exception as e:
+                # Будь-яка помилка завантаження стосується лише рядка:
+                # товар імпортується без зміни зображення
+                self.error(number, f'зображення {record["image"]}: {e}')
+        with transaction.atomic():
+            ids, category_ids = self._write_batch(records)
+        from . import autocomplete, page_cache
+        page_cache.invalidate_products(ids, category_ids)
+        autocomplete.invalidate()
+        self.stats['rows'] += size
+        if on_batch:
+            on_batch(size)
+
+    def _write_batch(self, records):
+        from discounts.scheduler import reprice_products
+        from . import markdown_cache, search
+
+        records = self._resolve_slugs(records)
+        existing = {
+            product.slug: product
+            for product in Product.objects.filter(slug__in={record['slug'] for _, record in records})
+        }
+        now = timezone.now()
+        to_create, to_update = {}, {}
+        repriced = []
+        update_fields = {'updated_at'}
+        category_ids = set()
+        for number, record in records:
+            slug = record['slug']
+            product = existing.get(slug) or to_create.get(slug)
+            fields = dict(record['fields'])
+            try:
+                category = self._category(record)
+            except RowError as e:
+                self.error(number, str(e))
+                continue
+            if category is not None:
+                fields['category_id'] = category.pk
+            if record.get('image_name'):
+                fields['image'] = record['image_name']
+            if product is None:
+                missing = [name for name in ('name', 'price', 'category_id') if name not in fields]
+                if missing:
+                    self.error(number, f'для нового товару потрібні поля: {", ".join(missing)}')
+                    continue
+                product = Product(slug=slug, description='')
+                to_create[slug] = product
+            elif product.pk is not None:
+                category_ids.add(product.category_id)
+                to_update[slug] = product
+                update_fields.update('category' if name == 'category_id' else name for name in fields)
+            if 'image' in fields and fields['image'] != product.get_image_name():
+                product.image_hash = ''
+                update_fields.add('image_hash')
+            for name, value in fields.items():
+                setattr(product, name, value)
+            if 'price' in fields:
+                # Знижки застосовуються після запису (reprice_products)
+                product.effective_price = product.price
+                update_fields.add('effective_price')
+                repriced.append(product)
+            if markdown_cache.refresh(product):
+                update_fields.update(('detailed_description_html', 'detailed_description_hash'))
+            product.updated_at = now
+
+        Product.objects.bulk_create(to_create.values())
+        if to_update:
+            update_rows(to_update.values(), sorted(update_fields))
+        products = [*to_create.values(), *to_update.values()]
+        ids = [product.pk for product in products]
+        category_ids.update(product.category_id for product in products)
+        reprice_products([product.pk for product in repriced])
+        search.index_products(ids)
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+        return ids, category_ids
+
+    def _resolve_slugs(self, records):
+        """
+        Записам без slug — slug з назви: перший з base, base-2, base-3…, не
+        зайнятий ні товаром у БД, ні іншим записом пачки (зокрема явним slug).
+        З match_by_name slug товару з тією ж назвою використовується повторно,
+        тож записи з однаковою назвою оновлюють один товар.
+        """
+        derived = defaultdict(list)
+        explicit = set()
+        for _, record in records:
+            if record['slug']:
+                explicit.add(record['slug'])
+            else:
+                derived[slug_from_name(record['fields']['name'], 190)].append(record)
+        if not derived:
+            return records
+        taken = dict(Product.objects.filter(slug__in=derived).values_list('slug', 'name'))
+        assigned = set(explicit)
+        for base, group in derived.items():
+            if len(group) > 1 or base in taken or base in assigned:
+                taken.update(Product.objects.filter(slug__startswith=f'{base}-').values_list('slug', 'name'))
+            by_name = {}
+            for record in group:
+                name = record['fields']['name']
+                if self.match_by_name and name in by_name:
+                    record['slug'] = by_name[name]
+                    continue
+                slug, n = base, 1
+                while slug in assigned or (
+                    slug in taken and not (self.match_by_name and taken[slug] == name)
+                ):
+                    n += 1
+                    slug = f'{base}-{n}'
+                assigned.add(slug)
+                by_name[name] = record['slug'] = slug
+        return records
+
+    def _remember(self, category):
+        self.categories_by_slug[category.slug] = category
+        self.categories_by_name.setdefault(category.name.casefold(), category)
+
+    def _category(self, record):
+        """Категорія запису (створюється, якщо немає) або None, якщо не вказана"""
+        slug, name = record['category_slug'], record['category']
+        if slug:
+            category = self.categories_by_slug.get(slug)
+            if category is not None:
+                return category
+            if not name:
+                raise RowError(f'немає категорії зі slug {slug!r}')
+        elif not name:
+            return None
+        else:
+            category = self.categories_by_name.get(name.casefold())
+            if category is not None:
+                return category
+            slug = base = slug_from_name(name, 90)
+            n = 1
+            while slug in self.categories_by_slug or Category.objects.filter(slug=slug).exists():
+                n += 1
+                slug = f'{base}-{n}'
+        category = Category.objects.create(name=name, slug=slug)
+        self._remember(category)
+        return category
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_version
+from .models import Category
+
+CATEGORIES_VERSION = 'categories'
+
+
+def get_categories_version():
+    return get_version(CATEGORIES_VERSION)
+
+
+def get_active_categories():
+    """Активні категорії з кешу; кеш інвалідовується зміною версії"""
+    key = f'categories:active:{get_categories_version()}'
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.filter(is_active=True))
+        cache.set(key, categories, getattr(settings, 'CATEGORY_CACHE_TIMEOUT', 86400))
+    return categories
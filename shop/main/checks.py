@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from . import page_cache
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Версіоновані ключі (категорії, лічильники, сторінки, ETag API) потребують спільного кешу"""
+    if not page_cache.uses_local_cache():
+        return []
+    message = 'Кеш за замовчуванням — LocMemCache, окремий у кожному процесі'
+    if getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        message += '; PAGE_CACHE_ENABLED ігнорується'
+    return [Warning(
+        message,
+        hint='Налаштуйте в CACHES спільний бекенд (FileBasedCache, RedisCache), '
+             'інакше воркери не бачать змін версій одне одного.',
+        id='main.W001',
+    )]
@@ -1,6 +1,12 @@
-from .models import Category
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .categories import get_active_categories, get_categories_version
 
 def categories(request):
+    # Список категорій вантажиться лише якщо шаблон його справді використає
+    # (навігація і футер зазвичай беруться з кешу фрагментів)
     return {
-        'categories': Category.objects.filter(is_active=True)
-    }
\ No newline at end of file
+        'categories': SimpleLazyObject(get_active_categories),
+        'categories_version': get_categories_version(),
+        'categories_cache_timeout': getattr(settings, 'CATEGORY_CACHE_TIMEOUT', 86400),
+    }
@@ -0,0 +1,135 @@
+"""
+Матеріалізовані лічильники доступних товарів (модель ProductCount):
+по кожній категорії та загальний (category_id = ProductCount.TOTAL).
+
+Лічильники оновлюються інкрементально з сигналів Product (main/signals.py):
+зміна is_available, category або видалення товару дає ±1 для загального
+лічильника і відповідних категорій одним UPDATE з F()-виразом.
+Якщо рядка лічильника ще немає або стан товару невідомий (поля не були
+завантажені), лічильник перераховується точним COUNT.
+
+Читання: усі лічильники зберігаються в кеші одним словником під версією
+COUNTS_VERSION, тож сторінка з кількома лічильниками не робить жодного
+запиту (або один — після зміни лічильників).
+
+Повна перебудова: `manage.py rebuild_product_counts`.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import page_cache
+from .cache import get_version
+from .models import Product, ProductCount, UNKNOWN
+
+TOTAL = ProductCount.TOTAL
+
+COUNTS_KEY = 'product_counts:%s'
+
+
+def get_counts():
+    """Усі лічильники {category_id: count}: з кешу або одним запитом"""
+    key = COUNTS_KEY % get_version(page_cache.COUNTS_VERSION)
+    counts = cache.get(key)
+    if counts is None:
+        counts = dict(ProductCount.objects.values_list('category_id', 'count'))
+        cache.set(key, counts, getattr(settings, 'CATEGORY_CACHE_TIMEOUT', 86400))
+    return counts
+
+
+def get_count(category=None):
+    """Кількість доступних товарів у категорії (або в усьому каталозі)"""
+    key = TOTAL if category is None else _category_id(category)
+    count = get_counts().get(key)
+    if count is None:
+        count = refresh_counts([key])[key]
+    return count
+
+
+def product_changed(previous, current):
+    """
+    previous/current — категорія, в якій товар враховувався до і після
+    зміни (None — не враховувався, UNKNOWN — стан невідомий).
+    """
+    if previous is UNKNOWN or current is UNKNOWN:
+        keys = {TOTAL} | {c for c in (previous, current) if c not in (None, UNKNOWN)}
+        refresh_counts(keys)
+        return
+    if previous == current:
+        return
+    deltas = Counter()
+    if previous is not None:
+        deltas[TOTAL] -= 1
+        deltas[previous] -= 1
+    if current is not None:
+        deltas[TOTAL] += 1
+        deltas[current] += 1
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """Застосовує зміни {category_id: delta} до лічильників"""
+    missing = []
+    with transaction.atomic():
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+            updated = ProductCount.objects.filter(pk=key).update(count=F('count') + delta)
+            if not updated:
+                missing.append(key)
+        if missing:
+            # Лічильника ще немає — рахуємо точно (зміна вже в БД)
+            refresh_counts(missing)
+    page_cache.invalidate_counts()
+
+
+def refresh_counts(keys):
+    """Перераховує вказані лічильники точним COUNT. Повертає {key: count}."""
+    keys = set(keys)
+    counts = {}
+    available = Product.objects.filter(is_available=True)
+    if TOTAL in keys:
+        counts[TOTAL] = available.count()
+    category_ids = keys - {TOTAL}
+    if category_ids:
+        counts.update({category_id: 0 for category_id in category_ids})
+        counts.update(
+            available.filter(category_id__in=category_ids)
+            .values_list('category_id').annotate(n=Count('id')).order_by()
+        )
+    with transaction.atomic():
+        for key, count in counts.items():
+            ProductCount.objects.update_or_create(pk=key, defaults={'count': count})
+    page_cache.invalidate_counts()
+    return counts
+
+
+def remove_category(category_id):
+    """Прибирає лічильник видаленої категорії"""
+    ProductCount.objects.filter(pk=category_id).delete()
+
+
+def rebuild_counts():
+    """Повністю перебудовує таблицю лічильників. Повертає кількість рядків."""
+    from .models import Category
+
+    available = Product.objects.filter(is_available=True)
+    counts = {category_id: 0 for category_id in Category.objects.values_list('id', flat=True)}
+    counts.update(
+        available.values_list('category_id').annotate(n=Count('id')).order_by()
+    )
+    counts[TOTAL] = sum(counts.values())
+    with transaction.atomic():
+        ProductCount.objects.all().delete()
+        ProductCount.objects.bulk_create(
+            ProductCount(category_id=key, count=count) for key, count in counts.items()
+        )
+    page_cache.invalidate_counts()
+    return len(counts)
+
+
+def _category_id(category):
+    return category.pk if hasattr(category, 'pk') else int(category)
@@ -0,0 +1,369 @@
+"""
+Фасетні фільтри каталогу: діапазон ціни, рейтинг, знижка, рекомендовані.
+
+Для кожного значення фасета, кожної категорії і всього каталогу
+зберігається бітова множина доступних товарів (біт = id товару) —
+модель FacetBitmap, рядок на ключ ('price:500-1000', 'category:3', 'all').
+Кількості для фільтрів рахуються перетином множин (& і bit_count())
+без GROUP BY: для кожного фасета — з урахуванням вибраних значень інших
+фасетів, тож поруч з кожним значенням видно, скільки товарів лишиться.
+
+Множини оновлюються інкрементально:
+- збереження/видалення товару (сигнали main/signals.py) змінює біт лише
+  в рядках, де членство товару змінилось;
+- масові зміни в обхід сигналів (перерахунок цін знижками, рейтингів
+  відгуками) — update_products(), що перераховує членство з БД лише
+  в рядках фасетів, які могла змінити операція.
+Лише якщо якась множина справді змінилась, збільшується версія
+FACETS_VERSION; кожен процес тримає розпаковані множини в пам'яті
+і перечитує таблицю лише при зміні версії.
+
+Повна перебудова: `manage.py rebuild_facets`.
+"""
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from .cache import bump_version, get_version
+from .models import FacetBitmap, Product, UNKNOWN
+
+FACETS_VERSION = 'facets'
+ALL = 'all'
+
+# Поля товару, від яких залежить членство в множинах
+FIELDS = ('id', 'is_available', 'category_id', 'price', 'effective_price', 'rating_avg', 'featured')
+
+
+class FacetValue:
+    def __init__(self, key, label, q, test):
+        self.key = key
+        self.label = label
+        self.q = q
+        # test(price, effective_price, rating_avg, featured) → bool
+        self.test = test
+
+
+class Facet:
+    def __init__(self, name, label, values):
+        self.name = name
+        self.label = label
+        self.values = values
+
+    def get(self, key):
+        return next((value for value in self.values if value.key == key), None)
+
+
+def _price_values(bands):
+    bounds = [None] + [Decimal(str(b)) for b in bands] + [None]
+    values = []
+    for low, high in zip(bounds, bounds[1:]):
+        if low is None:
+            key, label = f'lt{high}', f'до {high} грн'
+        elif high is None:
+            key, label = f'gte{low}', f'від {low} грн'
+        else:
+            key, label = f'{low}-{high}', f'{low}–{high} грн'
+        q = Q()
+        if low is not None:
+            q &= Q(effective_price__gte=low)
+        if high is not None:
+            q &= Q(effective_price__lt=high)
+        values.append(FacetValue(
+            key, label, q,
+            lambda price, effective, rating, featured, low=low, high=high:
+                (low is None or effective >= low) and (high is None or effective < high),
+        ))
+    return values
+
+
+@lru_cache(maxsize=4)
+def _build_facets(price_bands, rating_thresholds):
+    return (
+        Facet('price', 'Ціна', _price_values(price_bands)),
+        Facet('rating', 'Рейтинг', [
+            FacetValue(
+                str(threshold), f'{threshold}★ і вище', Q(rating_avg__gte=threshold),
+                lambda price, effective, rating, featured, threshold=threshold: rating >= threshold,
+            )
+            for threshold in rating_thresholds
+        ]),
+        Facet('discount', 'Знижка', [
+            FacetValue(
+                '1', 'Зі знижкою', Q(effective_price__lt=F('price')),
+                lambda price, effective, rating, featured: effective < price,
+            ),
+        ]),
+        Facet('featured', 'Рекомендовані', [
+            FacetValue(
+                '1', 'Рекомендовані', Q(featured=True),
+                lambda price, effective, rating, featured: featured,
+            ),
+        ]),
+    )
+
+
+def get_facets():
+    return _build_facets(
+        tuple(getattr(settings, 'FACET_PRICE_BANDS', (500, 1000, 5000, 20000))),
+        tuple(getattr(settings, 'FACET_RATING_THRESHOLDS', (4, 3))),
+    )
+
+
+def value_key(facet_name, key):
+    return f'{facet_name}:{key}'
+
+
+def category_key(category_id):
+    return f'category:{category_id}'
+
+
+# --- Членство товару ---
+
+def keys_for(is_available, category_id, price, effective_price, rating_avg, featured):
+    """Ключі множин, до яких належить товар з такими полями"""
+    if not is_available:
+        return frozenset()
+    keys = {ALL, category_key(category_id)}
+    for facet in get_facets():
+        for value in facet.values:
+            if value.test(price, effective_price, rating_avg, featured):
+                keys.add(value_key(facet.name, value.key))
+    return frozenset(keys)
+
+
+def product_keys(product):
+    """Ключі множин товару або UNKNOWN, якщо потрібні поля не завантажені"""
+    data = product.__dict__
+    if any(name not in data for name in FIELDS):
+        return UNKNOWN
+    return keys_for(*(data[name] for name in FIELDS[1:]))
+
+
+# --- Бітові множини ---
+
+def to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def from_bytes(data):
+    return int.from_bytes(data, 'little')
+
+
+def bits_from_ids(ids):
+    """Бітова множина з ітерабельної послідовності id"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return from_bytes(buffer)
+
+
+def build_bitmaps(rows):
+    """{ключ: множина} з рядків (id, *FIELDS[1:])"""
+    members = defaultdict(list)
+    for product_id, *fields in rows:
+        for key in keys_for(*fields):
+            members[key].append(product_id)
+    return {key: bits_from_ids(ids) for key, ids in members.items()}
+
+
+def _save(changed, created):
+    """Записує змінені рядки, порожні видаляє"""
+    empty = [row.key for row in changed if not row.bits]
+    FacetBitmap.objects.bulk_update([row for row in changed if row.bits], ['bits'])
+    FacetBitmap.objects.bulk_create([row for row in created if row.bits])
+    if empty:
+        FacetBitmap.objects.filter(key__in=empty).delete()
+    _bump()
+
+
+def _bump():
+    # Одразу — щоб цей процес перечитав свої зміни; після коміту — щоб інші
+    # процеси не лишились з множинами, прочитаними до коміту
+    bump_version(FACETS_VERSION)
+    transaction.on_commit(lambda: bump_version(FACETS_VERSION))
+
+
+def apply_changes(changes):
+    """changes — {product_id: (ключі, з яких вийшов, ключі, до яких увійшов)}"""
+    set_masks = defaultdict(int)
+    clear_masks = defaultdict(int)
+    for product_id, (removed, added) in changes.items():
+        bit = 1 << product_id
+        for key in removed:
+            clear_masks[key] |= bit
+        for key in added:
+            set_masks[key] |= bit
+    keys = set_masks.keys() | clear_masks.keys()
+    if not keys:
+        return
+    with transaction.atomic():
+        rows = FacetBitmap.objects.select_for_update().filter(key__in=keys)
+        _update_rows(rows, keys, lambda key, old: (old & ~clear_masks[key]) | set_masks[key])
+
+
+def product_changed(product_id, previous, current):
+    """previous/current — ключі множин товару до і після зміни (або UNKNOWN)"""
+    if previous is UNKNOWN or current is UNKNOWN:
+        update_products([product_id])
+        return
+    if previous == current:
+        return
+    apply_changes({product_id: (previous - current, current - previous)})
+
+
+def update_products(product_ids, facet_names=None):
+    """
+    Перераховує членство товарів за станом у БД — для змін в обхід
+    сигналів (bulk_update, queryset.update) і видалених товарів.
+    facet_names — фасети, які могла змінити операція (наприклад, ('rating',)
+    для відгуків): тоді перевіряються лише їх ключі та ключі, до яких товари
+    належать зараз; без них стан до зміни невідомий і перевіряються всі рядки.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    added = build_bitmaps(Product.objects.filter(id__in=product_ids).values_list(*FIELDS))
+    mask = bits_from_ids(product_ids)
+    rows = FacetBitmap.objects.select_for_update()
+    keys = set(added)
+    if facet_names is not None:
+        keys |= {
+            value_key(facet.name, value.key)
+            for facet in get_facets() if facet.name in facet_names
+            for value in facet.values
+        }
+        rows = rows.filter(key__in=keys)
+    with transaction.atomic():
+        _update_rows(rows, keys, lambda key, old: (old & ~mask) | added.get(key, 0))
+
+
+def _update_rows(rows, keys, compute):
+    """
+    Нові множини compute(ключ, стара множина) для рядків rows і відсутніх
+    ключів keys; записує й збільшує версію, лише якщо щось змінилось.
+    """
+    rows = {row.key: row for row in rows}
+    changed, created = [], []
+    for key in rows.keys() | keys:
+        row = rows.get(key)
+        old = from_bytes(row.bits) if row is not None else 0
+        new = compute(key, old)
+        if new == old:
+            continue
+        if row is None:
+            row = FacetBitmap(key=key)
+            created.append(row)
+        else:
+            changed.append(row)
+        row.bits = to_bytes(new)
+    if changed or created:
+        _save(changed, created)
+
+
+def rebuild():
+    """Повністю перебудовує множини. Повертає кількість рядків."""
+    bitmaps = build_bitmaps(
+        Product.objects.filter(is_available=True).values_list(*FIELDS).iterator(chunk_size=5000)
+    )
+    with transaction.atomic():
+        FacetBitmap.objects.all().delete()
+        FacetBitmap.objects.bulk_create(
+            FacetBitmap(key=key, bits=to_bytes(bits)) for key, bits in bitmaps.items()
+        )
+    _bump()
+    return len(bitmaps)
+
+
+# --- Читання ---
+
+class FacetIndex:
+    def __init__(self, bitmaps):
+        self.bitmaps = bitmaps
+
+    def get(self, key):
+        return self.bitmaps.get(key, 0)
+
+    def base(self, category=None):
+        return self.get(ALL if category is None else category_key(category.pk))
+
+    def counts(self, base, selected):
+        """
+        {фасет: {значення: кількість}} у межах base; для кожного фасета
+        враховуються вибрані значення (selected = {фасет: значення}) інших фасетів.
+        """
+        result = {}
+        for facet in get_facets():
+            scope = base
+            for name, key in selected.items():
+                if name != facet.name:
+                    scope &= self.get(value_key(name, key))
+            result[facet.name] = {
+                value.key: (scope & self.get(value_key(facet.name, value.key))).bit_count()
+                for value in facet.values
+            }
+        return result
+
+
+_loaded = {'version': None, 'index': None}
+_lock = threading.Lock()
+
+
+def get_index():
+    """Множини поточної версії (перечитуються з БД лише після змін)"""
+    version = get_version(FACETS_VERSION)
+    with _lock:
+        if _loaded['version'] != version:
+            rows = FacetBitmap.objects.values_list('key', 'bits')
+            _loaded['index'] = FacetIndex({key: from_bytes(bits) for key, bits in rows})
+            _loaded['version'] = version
+        return _loaded['index']
+
+
+def parse_selected(params):
+    """{фасет: значення} з параметрів запиту (невідомі значення ігноруються)"""
+    selected = {}
+    for facet in get_facets():
+        key = params.get(facet.name)
+        if key and facet.get(key) is not None:
+            selected[facet.name] = key
+    return selected
+
+
+def filter_queryset(queryset, selected):
+    facets = {facet.name: facet for facet in get_facets()}
+    for name, key in selected.items():
+        queryset = queryset.filter(facets[name].get(key).q)
+    return queryset
+
+
+def facet_choices(params, counts, selected):
+    """Фасети для шаблону: значення з кількостями і посиланнями (вибране значення — скасувати)"""
+    choices = []
+    for facet in get_facets():
+        values = []
+        for value in facet.values:
+            query = params.copy()
+            query.pop('page', None)
+            query.pop('cursor', None)
+            is_selected = selected.get(facet.name) == value.key
+            if is_selected:
+                query.pop(facet.name, None)
+            else:
+                query[facet.name] = value.key
+            values.append({
+                'key': value.key,
+                'label': value.label,
+                'count': counts[facet.name][value.key],
+                'selected': is_selected,
+                'url': '?' + query.urlencode(),
+            })
+        choices.append({'name': facet.name, 'label': facet.label, 'values': values})
+    return choices
@@ -0,0 +1,86 @@
+"""
+Генерація зменшених копій зображень (лише Pillow, без Django).
+
+Функції цього модуля виконуються в окремих процесах пулу
+(main/thumbnails.py), тому не звертаються ні до налаштувань, ні до БД:
+усе потрібне передається аргументами.
+"""
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+from PIL import Image, ImageOps
+
+FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+    'png': 'PNG',
+}
+
+
+# Хеш: 8 символів — вміст разом з налаштуваннями, 4 — лише налаштування
+TAG_LENGTH = 4
+
+
+@lru_cache(maxsize=8)
+def signature_tag(signature):
+    """Відбиток налаштувань генерації — останні символи хешу"""
+    return hashlib.sha256(signature.encode()).hexdigest()[:TAG_LENGTH]
+
+
+def content_hash(data, signature):
+    digest = hashlib.sha256(signature.encode())
+    digest.update(data)
+    return digest.hexdigest()[:12 - TAG_LENGTH] + signature_tag(signature)
+
+
+def _prepare(image, ext):
+    if ext == 'jpg' and image.mode != 'RGB':
+        # JPEG без прозорості — накладаємо на білий фон
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def _save(image, path, ext, quality):
+    options = {'optimize': True}
+    if ext == 'webp':
+        options = {'quality': quality, 'method': 4}
+    elif ext == 'jpg':
+        options.update(quality=quality, progressive=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    image.save(tmp, FORMATS[ext], **options)
+    os.replace(tmp, path)
+
+
+def generate_variants(source_path, dest_template, sizes, formats, signature, quality=82):
+    """
+    Зменшує зображення до квадратів sizes (зі збереженням пропорцій, без
+    збільшення) у форматах formats. Файли пишуться за шаблоном dest_template
+    з полями {hash}, {size}, {ext}; вже наявні не перезаписуються.
+    Повертає хеш вмісту (з урахуванням signature).
+    """
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    digest = content_hash(data, signature)
+    targets = [
+        (size, ext, dest_template.format(hash=digest, size=size, ext=ext))
+        for size in sizes for ext in formats
+    ]
+    targets = [target for target in targets if not os.path.exists(target[2])]
+    if not targets:
+        return digest
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+    for size, ext, path in targets:
+        image = _prepare(source, ext).copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        _save(image, path, ext, quality)
+    return digest
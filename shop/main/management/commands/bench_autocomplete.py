@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from main.autocomplete import PrefixIndex, normalize
+
+BRANDS = [
+    'Lenovo', 'Samsung', 'Xiaomi', 'Apple', 'Bosch', 'Philips', 'Tefal', 'Asus',
+    'Acer', 'Sony', 'LG', 'Gorenje', 'Zelmer', 'Rozetka', 'Ергономік', 'Еко-Дім',
+]
+NOUNS = [
+    'ноутбук', 'смартфон', 'чайник', 'пилосос', 'навушники', 'монітор', 'клавіатура',
+    'мишка', 'холодильник', 'мікрохвильовка', 'блендер', 'праска', 'телевізор',
+    'планшет', 'годинник', 'фен', 'кавоварка', 'мультиварка', 'рюкзак', 'щітка',
+]
+ADJECTIVES = [
+    'чорний', 'білий', 'сріблястий', 'бездротовий', 'компактний', 'потужний',
+    'ігровий', 'бамбуковий', 'еко', 'преміум', 'складаний', 'жовтий',
+]
+# Запити: кирилиця, латиниця, транслітерація, різна довжина
+QUERIES = [
+    'н', 'но', 'ноу', 'ноут', 'ноутбук len', 'nout', 'noutbuk', 'len', 'lenovo',
+    'леново', 'самсунг', 'sam', 'щіт', 'shchit', 'чай', 'chai', 'холод', 'kholod',
+    'бездрот', 'bezdrot', 'ЧОРН', 'Еко', 'eko-dim', 'мікро', 'x', 'qzq',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Мікробенчмарк індексу автодоповнення на синтетичному корпусі назв '
+        '(без БД): час побудови, пам\'ять і затримка запитів.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000, help='Кількість назв')
+        parser.add_argument('--repeat', type=int, default=2000, help='Запитів на кожен рядок')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--memory', action='store_true',
+                            help='Виміряти пік пам\'яті (tracemalloc, повільніше)')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        entries = [
+            ('product', self._name(rnd, n), f'/product/{n}/p-{n}/', rnd.random())
+            for n in range(options['size'])
+        ]
+        self.stdout.write(f'Корпус: {len(entries)} назв, напр. «{entries[0][1]}»')
+
+        if options['memory']:
+            # tracemalloc у рази сповільнює побудову — лише за запитом
+            tracemalloc.start()
+        started = time.perf_counter()
+        index = PrefixIndex(entries)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Побудова: {elapsed:.2f} с, {len(index.keys)} ключів, '
+            f'{len(index.top)} префіксів з готовими списками'
+        )
+        if options['memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f'Пік пам\'яті під час побудови: {peak / 2**20:.0f} МБ')
+
+        repeat = options['repeat']
+        worst = 0.0
+        for query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                results = index.search(query)
+                timings.append((time.perf_counter() - started) * 1e6)
+            timings.sort()
+            p99 = timings[int(len(timings) * 0.99) - 1]
+            worst = max(worst, p99)
+            first = results[0][1] if results else '—'
+            self.stdout.write(
+                f'{query!r:16} → {normalize(query)!r:16} {len(results):2} рез.  '
+                f'медіана {statistics.median(timings):7.1f} мкс  p99 {p99:7.1f} мкс  «{first}»'
+            )
+        style = self.style.SUCCESS if worst < 1000 else self.style.WARNING
+        self.stdout.write(style(f'Найгірший p99: {worst:.1f} мкс'))
+
+    @staticmethod
+    def _name(rnd, n):
+        words = [rnd.choice(NOUNS), rnd.choice(BRANDS)]
+        if rnd.random() < 0.7:
+            words.insert(1, rnd.choice(ADJECTIVES))
+        words.append(f'{rnd.choice("ABCDEFGHKMXZ")}{n % 9973}')
+        return ' '.join(words)
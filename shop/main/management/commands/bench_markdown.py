@@ -0,0 +1,95 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from markdownx.utils import markdownify
+
+from main import markdown_cache, view_counter
+from main.models import Category, Product
+
+SECTION = """
+## Характеристики {n}
+
+Товар **{n}** має *зручний* дизайн і [детальну інструкцію](https://example.com/{n}).
+
+- Матеріал: сталь
+- Вага: {n}00 г
+- Гарантія: 12 місяців
+
+1. Розпакуйте товар
+2. Підключіть живлення
+3. Насолоджуйтесь
+
+> Порада: зберігайте в сухому місці.
+
+```
+модель: X-{n}
+```
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Порівнює час рендерингу сторінки товару з парсингом Markdown на кожен '
+        'запит і зі збереженим HTML. Дані створюються в транзакції і відкочуються.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=20,
+                            help='Розмір детального опису (кількість розділів)')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        text = '\n'.join(SECTION.format(n=n) for n in range(options['sections']))
+        # Перегляди з бенчмарку не повинні потрапити в буфер процесу
+        with view_counter.isolated():
+            with transaction.atomic():
+                category = Category.objects.create(name='Бенчмарк', slug='bench-markdown-tmp')
+                product = Product.objects.create(
+                    name='Бенчмарк', slug='bench-markdown-tmp', description='опис',
+                    detailed_description=text, price=100, category=category,
+                    image='products/bench.png',
+                )
+                self.stdout.write(f'Опис: {len(text)} символів')
+                self._compare(
+                    'Markdown → HTML',
+                    lambda: markdownify(text),
+                    lambda: Product.objects.get(pk=product.pk).get_detailed_description_html(),
+                    options['repeat'],
+                )
+
+                client = Client(SERVER_NAME='localhost')
+                url = product.get_absolute_url()
+                stale_key = markdown_cache.CACHE_PREFIX + markdown_cache.content_hash(text)
+
+                def before():
+                    # Застарілий хеш і порожній кеш — парсинг на кожен запит, як раніше
+                    Product.objects.filter(pk=product.pk).update(detailed_description_hash='')
+                    cache.delete(stale_key)
+                    client.get(url)
+
+                def after():
+                    client.get(url)
+
+                client.get(url)
+                self._compare('Сторінка товару', before, after, options['repeat'])
+                transaction.set_rollback(True)
+
+    def _compare(self, label, before, after, repeat):
+        old = self._measure(before, repeat)
+        new = self._measure(after, repeat)
+        self.stdout.write(
+            f'{label:20} до: {old * 1000:8.2f} мс   після: {new * 1000:8.2f} мс   '
+            f'x{old / new if new else 0:.1f}'
+        )
+
+    def _measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main import recommendations
+from main.models import Category, Product
+
+SYLLABLES = ['ко', 'ла', 'ні', 'ру', 'те', 'ма', 'зо', 'ві', 'ск', 'ор', 'ен', 'ди', 'па', 'лю', 'ха']
+
+
+class Command(BaseCommand):
+    help = (
+        'Вимірює побудову рекомендацій на синтетичному каталозі зі спільними '
+        'переглядами. Усі дані створюються в транзакції і відкочуються.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100_000)
+        parser.add_argument('--topics', type=int, default=500,
+                            help='Кількість тематичних груп товарів')
+        parser.add_argument('--sessions', type=int, default=50_000,
+                            help='Кількість синтетичних сесій переглядів')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Кількість вимірів вибірки схожих товарів')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            category = Category.objects.create(name='Бенчмарк', slug='bench-recommendations-tmp')
+            topics = self._topics(options['topics'], rng)
+            ids, topic_of = self._populate(category, options['size'], topics, rng)
+            self._sessions(ids, topic_of, options['sessions'], rng)
+
+            started = time.perf_counter()
+            text_index = recommendations.build_text_index()
+            index_time = time.perf_counter() - started
+            started = time.perf_counter()
+            count = recommendations.build_recommendations(text_index=text_index)
+            build_time = time.perf_counter() - started
+            self.stdout.write(
+                f'{count} товарів: TF-IDF індекс {index_time:.1f} с, '
+                f'сусіди + запис {build_time:.1f} с'
+            )
+
+            sample = rng.sample(ids, min(options['repeat'], len(ids)))
+            products = list(Product.objects.select_related('recommendation').filter(id__in=sample))
+            hits = sum(
+                topic_of[related.id] == topic_of[product.id]
+                for product in products
+                for related in recommendations.related_products(product)
+            )
+            self.stdout.write(f'Схожі товари з тієї самої теми: {hits / (len(products) * 4):.0%}')
+
+            legacy = self._measure(lambda p: list(
+                Product.objects.filter(category=p.category, is_available=True).exclude(id=p.id)[:4]
+            ), products)
+            precomputed = self._measure(lambda p: recommendations.related_products(p), products)
+            self.stdout.write(
+                f'Вибірка на сторінці товару: категорія {legacy * 1000:.2f} мс, '
+                f'за первинним ключем {precomputed * 1000:.2f} мс'
+            )
+            transaction.set_rollback(True)
+
+    def _topics(self, count, rng):
+        # Кожна тема — власний словник із 8 синтетичних слів
+        words = set()
+        while len(words) < count * 8:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        words = sorted(words)
+        rng.shuffle(words)
+        return [words[i * 8:(i + 1) * 8] for i in range(count)]
+
+    def _populate(self, category, count, topics, rng, batch_size=5000):
+        for start in range(0, count, batch_size):
+            products = []
+            for i in range(start, min(start + batch_size, count)):
+                topic = rng.randrange(len(topics))
+                words = topics[topic]
+                products.append(Product(
+                    name=' '.join(rng.sample(words, 3)),
+                    slug=f'bench-rec-{i}',
+                    description=' '.join(rng.choices(words, k=8)),
+                    price=rng.randint(10, 10000),
+                    category=category,
+                    image='products/bench.png',
+                ))
+            Product.objects.bulk_create(products)
+            self.stdout.write(f'  створено {start + len(products)}', ending='\r')
+        # Тема товару однозначно визначається будь-яким словом назви
+        topic_by_word = {word: topic for topic, words in enumerate(topics) for word in words}
+        topic_of = {
+            product_id: topic_by_word[name.split()[0]]
+            for product_id, name in Product.objects.filter(category=category).values_list('id', 'name')
+        }
+        return sorted(topic_of), topic_of
+
+    def _sessions(self, ids, topic_of, count, rng):
+        by_topic = {}
+        for product_id in ids:
+            by_topic.setdefault(topic_of[product_id], []).append(product_id)
+        pairs = Counter()
+        for _ in range(count):
+            pool = by_topic[topic_of[rng.choice(ids)]]
+            viewed = rng.sample(pool, min(5, len(pool)))
+            for i, a in enumerate(viewed):
+                for b in viewed[i + 1:]:
+                    pairs[recommendations.co_view_pair(a, b)] += 1
+        started = time.perf_counter()
+        recommendations.record_co_views(pairs)
+        self.stdout.write(
+            f'Записано {len(pairs)} пар спільних переглядів за {time.perf_counter() - started:.1f} с'
+        )
+
+    def _measure(self, func, products):
+        timings = []
+        for product in products:
+            started = time.perf_counter()
+            func(product)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
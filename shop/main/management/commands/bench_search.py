@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main import search
+from main.models import Category, Product
+
+WORDS = [
+    'ноутбук', 'телефон', 'навушники', 'чайник', 'кавоварка', 'лампа', 'рюкзак',
+    'крісло', 'монітор', 'клавіатура', 'миша', 'колонка', 'годинник', 'пилосос',
+    'еко', 'бамбук', 'сталь', 'шкіра', 'дерево', 'бавовна', 'чорний', 'білий',
+    'зелений', 'компактний', 'бездротовий', 'портативний', 'професійний', 'дитячий',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Порівнює швидкість пошуку FTS5 зі старим фільтром icontains '
+        'на синтетичному каталозі. Усі дані створюються в транзакції і відкочуються.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--queries', nargs='+', default=['ноутбук', 'бездротовий чорний', 'бамб'])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            raise CommandError('Бенчмарк потребує SQLite з FTS5.')
+        rng = random.Random(42)
+        with transaction.atomic():
+            category = Category.objects.create(name='Бенчмарк', slug='bench-search-tmp')
+            created = 0
+            for size in sorted(options['sizes']):
+                created += self._populate(category, size - created, created, rng)
+                self.stdout.write(f'\n== {size} товарів ==')
+                for query in options['queries']:
+                    legacy = self._measure(
+                        lambda: self._page(search.legacy_filter(self._base(), query).order_by('-created_at')),
+                        options['repeat'],
+                    )
+                    fts = self._measure(
+                        lambda: self._page(search.search(self._base(), query).order_by('search_rank')),
+                        options['repeat'],
+                    )
+                    self.stdout.write(
+                        f'{query!r:28} icontains: {legacy * 1000:9.1f} мс   '
+                        f'fts5: {fts * 1000:9.1f} мс   x{legacy / fts if fts else 0:.1f}'
+                    )
+            transaction.set_rollback(True)
+
+    def _base(self):
+        return Product.objects.filter(is_available=True)
+
+    def _page(self, queryset):
+        # Те саме, що робить product_list: COUNT + перша сторінка
+        queryset.count()
+        return list(queryset[:6])
+
+    def _measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def _populate(self, category, count, offset, rng, batch_size=5000):
+        for start in range(0, count, batch_size):
+            products = []
+            for i in range(offset + start, offset + min(start + batch_size, count)):
+                name = ' '.join(rng.sample(WORDS, 3))
+                products.append(Product(
+                    name=name,
+                    slug=f'bench-{i}',
+                    description=' '.join(rng.choices(WORDS, k=12)),
+                    detailed_description=' '.join(rng.choices(WORDS, k=30)),
+                    price=rng.randint(10, 10000),
+                    category=category,
+                    image='products/bench.png',
+                ))
+            Product.objects.bulk_create(products)
+            self.stdout.write(f'  створено {offset + start + len(products)}', ending='\r')
+        search.index_products(
+            Product.objects.filter(category=category).order_by('id')
+            .values_list('id', flat=True)[offset:]
+        )
+        return count
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Обчислює списки схожих товарів (спільні перегляди + TF-IDF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true',
+                            help='Лише товари без рекомендацій, змінені або з новими спільними переглядами')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        product_ids = None
+        if options['stale']:
+            product_ids = recommendations.stale_product_ids()
+            if not product_ids:
+                self.stdout.write('Рекомендації актуальні')
+                return
+        count = recommendations.build_recommendations(product_ids, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Оновлено рекомендації для {count} товарів за {elapsed:.2f} с'
+        ))
@@ -0,0 +1,62 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import catalog_export
+from main.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Потоково вивантажує каталог товарів у CSV або JSONL (за потреби — gzip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default=None,
+                            help='Файл (за замовчуванням catalog-<дата>.<формат>; «-» — stdout)')
+        parser.add_argument('--format', choices=sorted(catalog_export.FORMATS), default=None,
+                            help='Формат (за замовчуванням — за розширенням файлу або csv)')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Стиснути gzip (увімкнено для файлів .gz)')
+        parser.add_argument('--category', default=None, help='Лише товари категорії (slug)')
+        parser.add_argument('--available', action='store_true', help='Лише доступні товари')
+        parser.add_argument('--chunk-size', type=int, default=catalog_export.CHUNK_SIZE,
+                            help='Кількість товарів в одній порції читання з БД')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or bool(output and output.endswith('.gz'))
+        fmt = options['format']
+        if fmt is None:
+            stem = output[:-3] if output and output.endswith('.gz') else output or ''
+            fmt = 'jsonl' if stem.endswith(('.jsonl', '.ndjson')) else 'csv'
+        category = None
+        if options['category']:
+            try:
+                category = Category.objects.get(slug=options['category'])
+            except Category.DoesNotExist:
+                raise CommandError(f'Категорію {options["category"]!r} не знайдено.')
+        if output is None:
+            output = catalog_export.export_filename(fmt, compress, category)
+
+        queryset = catalog_export.export_queryset(category, options['available'])
+        chunks = catalog_export.export_chunks(fmt, queryset, compress, options['chunk_size'])
+        started = time.perf_counter()
+        size = 0
+        if output == '-':
+            target = sys.stdout.buffer
+            for chunk in chunks:
+                target.write(chunk)
+                size += len(chunk)
+            target.flush()
+            # Звіт — у stderr, щоб не змішуватись з даними
+            report = self.stderr
+        else:
+            with open(output, 'wb') as target:
+                for chunk in chunks:
+                    target.write(chunk)
+                    size += len(chunk)
+            report = self.stdout
+        elapsed = time.perf_counter() - started
+        report.write(self.style.SUCCESS(
+            f'Вивантажено {output} ({size / 2**20:.1f} МБ) за {elapsed:.1f} с'
+        ))
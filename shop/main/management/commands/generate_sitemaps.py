@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import sitemap
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерує sitemap.xml і файли товарів (до 50 000 URL у файлі); '
+        'переписує лише файли, товари яких змінились.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Переписати всі файли')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = sitemap.generate(force=options['force'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано {len(result["written"])} файлів, без змін {result["unchanged"]}, '
+            f'видалено {len(result["removed"])} за {elapsed:.2f} с ({sitemap.get_root()})'
+        ))
+        for name in result['written']:
+            self.stdout.write(f'  {name}')
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Генерує мініатюри і WebP-копії для наявних зображень товарів і категорій'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Перевірити всі зображення, не лише без актуальних мініатюр')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Кількість процесів (за замовчуванням THUMBNAIL_WORKERS)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated, failed = thumbnails.backfill(force=options['force'], workers=options['workers'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Оновлено {updated} зображень за {elapsed:.2f} с'
+        ))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Не вдалося обробити {failed} зображень'))
@@ -0,0 +1,105 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import catalog_import
+from main.catalog_import import CatalogImporter, Checkpoint, RowError
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковий імпорт товарів і категорій з CSV/JSONL пачками '
+        '(bulk_create/bulk_update) з контрольними точками для продовження.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV (з заголовком) або JSONL')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Формат файлу (за замовчуванням — за розширенням)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Кількість записів в одній транзакції')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Потоків для завантаження зображень')
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Тайм-аут завантаження зображення, с')
+        parser.add_argument('--checkpoint', default=None,
+                            help='Файл контрольної точки (за замовчуванням <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продовжити з контрольної точки')
+        parser.add_argument('--match-by-name', action='store_true',
+                            help='Рядки без slug оновлюють товар з тією ж назвою замість створення нового')
+        parser.add_argument('--no-thumbnails', action='store_true',
+                            help='Не генерувати мініатюри після імпорту')
+        parser.add_argument('--report-every', type=float, default=5,
+                            help='Інтервал звіту про швидкість, с')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не знайдено.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size має бути додатним.')
+        checkpoint = Checkpoint(options['checkpoint'] or f'{path}.checkpoint', path)
+        importer = CatalogImporter(
+            base_dir=os.path.dirname(os.path.abspath(path)),
+            workers=options['workers'],
+            timeout=options['timeout'],
+            match_by_name=options['match_by_name'],
+        )
+
+        skip = 0
+        if options['resume']:
+            try:
+                state = checkpoint.load()
+            except RowError as e:
+                raise CommandError(str(e))
+            if state:
+                skip = state['rows']
+                importer.stats.update(state['stats'])
+                self.stdout.write(f'Продовження з запису {skip + 1}')
+
+        started = last_report = time.perf_counter()
+        done = 0
+
+        def on_batch(size):
+            nonlocal done, last_report
+            done += size
+            checkpoint.save(importer.stats['rows'], importer.stats)
+            now = time.perf_counter()
+            if now - last_report >= options['report_every']:
+                last_report = now
+                self.stdout.write(self._progress(importer.stats, done / (now - started)))
+
+        rows = catalog_import.read_rows(path, options['format'], skip=skip)
+        try:
+            importer.run(rows, batch_size=options['batch_size'], on_batch=on_batch)
+        finally:
+            importer.close()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{self._progress(importer.stats, done / elapsed if elapsed else 0)}; '
+            f'за {elapsed:.1f} с'
+        ))
+
+        for number, message in importer.errors:
+            self.stdout.write(self.style.WARNING(f'  рядок {number}: {message}'))
+        if importer.stats['errors'] > len(importer.errors):
+            self.stdout.write(self.style.WARNING(
+                f'  … і ще {importer.stats["errors"] - len(importer.errors)} помилок'
+            ))
+
+        started = time.perf_counter()
+        updated, failed = importer.finish(thumbnails=not options['no_thumbnails'])
+        self.stdout.write(
+            f'Лічильники і фасети перебудовано, мініатюр: {updated} '
+            f'(помилок {failed}) за {time.perf_counter() - started:.1f} с'
+        )
+        checkpoint.remove()
+
+    @staticmethod
+    def _progress(stats, rate):
+        return (
+            f'Записів: {stats["rows"]} (створено {stats["created"]}, оновлено {stats["updated"]}, '
+            f'помилок {stats["errors"]}, зображень {stats["images"]}), {rate:.0f} записів/с'
+        )
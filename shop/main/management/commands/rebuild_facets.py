@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import facets
+
+
+class Command(BaseCommand):
+    help = 'Перебудовує бітові множини фасетних фільтрів каталогу'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = facets.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Перебудовано {count} множин за {elapsed:.2f} с'
+        ))
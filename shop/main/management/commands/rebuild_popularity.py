@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main import popularity
+
+
+class Command(BaseCommand):
+    help = 'Перебудовує рейтинг популярних товарів у кеші'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Спочатку перерахувати popularity з накопичених переглядів '
+                                 '(після зміни POPULARITY_HALF_LIFE)')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            count = popularity.reset_scores()
+            self.stdout.write(f'Перераховано популярність {count} товарів')
+        top = popularity.leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'У рейтингу {len(top)} товарів'))
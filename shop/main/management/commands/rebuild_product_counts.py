@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import counts
+
+
+class Command(BaseCommand):
+    help = 'Повністю перебудовує лічильники доступних товарів по категоріях'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = counts.rebuild_counts()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Перебудовано {rows} лічильників за {elapsed:.2f} с'
+        ))
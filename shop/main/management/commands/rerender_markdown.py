@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import markdown_cache
+
+
+class Command(BaseCommand):
+    help = 'Перерендерює збережений HTML детальних описів товарів (після зміни розширень Markdown)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Перерендерити всі описи, навіть актуальні')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = markdown_cache.rerender_all(force=options['force'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Перерендерено {count} описів за {elapsed:.2f} с'
+        ))
@@ -0,0 +1,92 @@
+"""
+Попередньо відрендерений Markdown для Product.detailed_description.
+
+HTML зберігається поруч із джерелом (detailed_description_html) разом
+з хешем вмісту (detailed_description_hash). Хеш враховує не лише текст,
+а й налаштування рендерера (функцію markdownify, розширення та їх
+конфігурацію), тож після зміни розширень збережений HTML вважається
+застарілим, а `manage.py rerender_markdown` перерендерить його пачками.
+
+HTML генерується при збереженні товару (сигнал pre_save, зокрема з
+адмінки markdownx). Якщо збережений хеш не збігся з поточним (наприклад,
+опис змінено через queryset.update()), сторінка рендерить текст через
+кеш за тим самим хешем, тож повторний парсинг не відбувається.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from markdownx.utils import markdownify
+
+CACHE_PREFIX = 'markdown:'
+
+
+def renderer_signature():
+    """Рядок, що змінюється разом з налаштуваннями рендерингу Markdown"""
+    return repr((
+        getattr(settings, 'MARKDOWNX_MARKDOWNIFY_FUNCTION', 'markdownx.utils.markdownify'),
+        getattr(settings, 'MARKDOWNX_MARKDOWN_EXTENSIONS', []),
+        getattr(settings, 'MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS', {}),
+    ))
+
+
+def content_hash(text):
+    digest = hashlib.sha256(renderer_signature().encode())
+    digest.update((text or '').encode())
+    return digest.hexdigest()
+
+
+def render(text):
+    return markdownify(text) if text else ''
+
+
+def render_cached(text):
+    """HTML для довільного тексту, закешований за хешем вмісту"""
+    if not text:
+        return ''
+    key = CACHE_PREFIX + content_hash(text)
+    html = cache.get(key)
+    if html is None:
+        html = render(text)
+        cache.set(key, html, None)
+    return html
+
+
+def is_current(product):
+    return product.detailed_description_hash == content_hash(product.detailed_description)
+
+
+def refresh(product):
+    """Оновлює збережений HTML товару, якщо він застарів. Повертає True, якщо оновлено."""
+    digest = content_hash(product.detailed_description)
+    if product.detailed_description_hash == digest:
+        return False
+    product.detailed_description_html = render(product.detailed_description)
+    product.detailed_description_hash = digest
+    return True
+
+
+def rerender_all(force=False, batch_size=500):
+    """
+    Перерендерює збережений HTML усіх товарів (лише застарілий, якщо не force).
+    Повертає кількість оновлених товарів.
+    """
+    from . import page_cache
+    from .models import Product
+    from .pagination import iter_batches
+
+    fields = ['detailed_description_html', 'detailed_description_hash']
+    products = Product.objects.only('id', 'detailed_description', *fields)
+    changed = 0
+    for batch in iter_batches(products, batch_size):
+        to_update = []
+        for product in batch:
+            if force:
+                product.detailed_description_hash = ''
+            if refresh(product):
+                to_update.append(product)
+        if to_update:
+            Product.objects.bulk_update(to_update, fields)
+            page_cache.invalidate_products([p.id for p in to_update])
+            changed += len(to_update)
+    return changed
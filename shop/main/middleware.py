@@ -0,0 +1,13 @@
+from . import recommendations
+
+
+class RecentViewsCookieMiddleware:
+    """Записує cookie останніх переглядів, якщо view (або кеш сторінок) його змінив"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        recommendations.save_recent_views(request, response)
+        return response
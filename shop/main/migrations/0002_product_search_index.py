@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# DDL зафіксовано тут, а не взято з main.search: міграція не повинна
+# залежати від поточної версії модуля
+FTS_TABLE = 'main_product_fts'
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, detailed_description, category_name, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('main', 'Product')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        rows = [
+            (p.pk, p.name, p.description, p.detailed_description, p.category.name)
+            for p in Product.objects.select_related('category')
+        ]
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, name, description, detailed_description, category_name) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:47
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_effective_price(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    Discount = apps.get_model('discounts', 'Discount')
+    Product.objects.update(effective_price=models.F('price'))
+
+    now = timezone.now()
+    best = {}
+    discounts = Discount.objects.filter(
+        is_active=True, start_date__lte=now, end_date__gte=now, min_quantity__lte=1,
+    ).select_related('product')
+    for d in discounts:
+        price = d.product.price
+        if d.discount_type == 'percentage':
+            amount = price * d.value / Decimal('100')
+        else:
+            amount = d.value
+        amount = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        best[d.product_id] = max(best.get(d.product_id, Decimal('0.00')), amount)
+    for product in Product.objects.filter(id__in=best):
+        product.effective_price = max(product.price - best[product.id], Decimal('0.00'))
+        product.save(update_fields=['effective_price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_product_keyset_indexes'),
+        ('discounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_price_id_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_eff_price_id_idx'),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+    ]
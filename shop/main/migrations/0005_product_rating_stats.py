@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:50
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_rating_stats(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    histograms = defaultdict(dict)
+    rows = (
+        Review.objects.filter(is_active=True)
+        .values_list('product_id', 'rating')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for product_id, rating, n in rows:
+        histograms[product_id][rating] = n
+    for product in Product.objects.filter(id__in=histograms):
+        histogram = histograms[product.id]
+        product.rating_count = sum(histogram.values())
+        product.rating_sum = sum(star * n for star, n in histogram.items())
+        for star in range(1, 6):
+            setattr(product, f'rating_{star}', histogram.get(star, 0))
+        product.rating_avg = product.rating_sum / product.rating_count
+        product.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_product_effective_price'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_product_counts(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    Category = apps.get_model('main', 'Category')
+    ProductCount = apps.get_model('main', 'ProductCount')
+    counts = {category_id: 0 for category_id in Category.objects.values_list('id', flat=True)}
+    counts.update(
+        Product.objects.filter(is_available=True)
+        .values_list('category_id').annotate(n=Count('id')).order_by()
+    )
+    counts[0] = sum(counts.values())
+    ProductCount.objects.bulk_create(
+        ProductCount(category_id=key, count=count) for key, count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_product_rating_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCount',
+            fields=[
+                ('category_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Лічильник товарів',
+                'verbose_name_plural': 'Лічильники товарів',
+            },
+        ),
+        migrations.RunPython(fill_product_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Ln
+from django.utils import timezone
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def seed_popularity(apps, schema_editor):
+    """Накопичені перегляди вважаються зробленими в момент міграції"""
+    Product = apps.get_model('main', 'Product')
+    rate = math.log(2) / (getattr(settings, 'POPULARITY_HALF_LIFE', 168) * 3600)
+    age = Value(rate * (timezone.now() - EPOCH).total_seconds())
+    Product.objects.filter(views__gt=0).update(popularity=Ln(F('views')) + age)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_product_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popularity',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(seed_popularity, migrations.RunPython.noop),
+    ]
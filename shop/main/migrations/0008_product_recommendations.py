@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_product_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation', serialize=False, to='main.product')),
+                ('related_ids', models.JSONField(default=list)),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Рекомендації товару',
+                'verbose_name_plural': 'Рекомендації товарів',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCoView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+            ],
+            options={
+                'verbose_name': 'Спільний перегляд',
+                'verbose_name_plural': 'Спільні перегляди',
+                'indexes': [models.Index(fields=['updated_at'], name='product_coview_updated_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'other'), name='product_coview_pair_uniq')],
+            },
+        ),
+    ]
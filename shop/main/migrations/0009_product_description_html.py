@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+# HTML описів існуючих товарів заповнює `manage.py rerender_markdown`;
+# до того сторінка товару рендерить опис через кеш (main/markdown_cache.py).
+# Міграція не імпортує живий код застосунку, тож не залежить від його змін.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='detailed_description_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='detailed_description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
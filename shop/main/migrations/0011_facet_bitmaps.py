@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+# Множини для існуючих товарів будуються після міграцій (post_migrate
+# у main/signals.py) або командою `manage.py rebuild_facets` — логіка ключів
+# залежить від налаштувань і живого коду, тож у міграцію вона не копіюється.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_image_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetBitmap',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('bits', models.BinaryField(default=b'')),
+            ],
+            options={
+                'verbose_name': 'Множина фасета',
+                'verbose_name_plural': 'Множини фасетів',
+            },
+        ),
+    ]
@@ -1,16 +1,22 @@
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from markdownx.models import MarkdownxField
-from django.db.models import Avg, Count
-from django.core.cache import cache
 from discounts.models import Discount
 
+# Маркер невідомого стану (поля не були завантажені з БД)
+UNKNOWN = object()
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True)
+    # Хеш згенерованих мініатюр (main/thumbnails.py); порожній — їх ще немає
+    image_hash = models.CharField(max_length=12, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
 
     class Meta:
@@ -21,6 +27,19 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.get_image_name()
+        return instance
+
+    def get_loaded_image_name(self):
+        return self.__dict__.get('_loaded_image')
+
+    def get_image_name(self):
+        value = self.__dict__.get('image')
+        return getattr(value, 'name', value) or ''
+
     def get_absolute_url(self):
         return reverse('main:product_list_by_category', args=[self.slug])
 
@@ -33,30 +52,164 @@ class Product(models.Model):
         blank=True,
         help_text=_("Детальний опис товару в форматі Markdown")
     )
+    # HTML детального опису, рендериться при збереженні (main/markdown_cache.py)
+    detailed_description_html = models.TextField(blank=True, editable=False)
+    detailed_description_hash = models.CharField(max_length=64, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Ціна з урахуванням найкращої активної знижки (за 1 шт.).
+    # Підтримується сигналами знижок і планувальником discounts.scheduler.
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_available = models.BooleanField(default=True)
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/%Y/%m/%d')
+    # Хеш згенерованих мініатюр (main/thumbnails.py); порожній — їх ще немає
+    image_hash = models.CharField(max_length=12, blank=True, editable=False)
     views = models.IntegerField(default=0)
+    # Згасаюча популярність у логарифмічній шкалі, див. main/popularity.py
+    popularity = models.FloatField(default=0, editable=False, db_index=True)
     featured = models.BooleanField(default=False)
 
+    # Денормалізована статистика активних відгуків (підтримується reviews.ratings)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False, db_index=True)
+
+    # Лічильники, які змінюються лише через update() з F() (view_counter,
+    # popularity, reviews.ratings); повне save() їх не записує, інакше
+    # збереження з адмінки скасувало б паралельні оновлення
+    COUNTER_FIELDS = frozenset((
+        'views', 'popularity', 'rating_count', 'rating_sum', 'rating_1', 'rating_2',
+        'rating_3', 'rating_4', 'rating_5', 'rating_avg',
+    ))
+
+    class Meta:
+        # Складені індекси (поле сортування, id) для keyset-пагінації каталогу
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['views', 'id'], name='product_views_id_idx'),
+            models.Index(fields=['effective_price', 'id'], name='product_eff_price_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значення на момент завантаження — для інкрементального оновлення
+        # лічильників, фасетів і кешів у сигналах; знімок стану з них
+        # будується лише при збереженні чи видаленні (get_loaded)
+        instance._loaded_values = (db, field_names, values)
+        return instance
+
+    def save(self, *args, **kwargs):
+        if (kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+                and not self._state.adding and self.pk is not None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        # Збережений стан стає новою точкою відліку для сигналів
+        names = [f.attname for f in self._meta.concrete_fields if f.attname in self.__dict__]
+        self._loaded_values = (self._state.db, names, [self.__dict__[name] for name in names])
+        self.__dict__.pop('_loaded', None)
+
+    def get_loaded(self):
+        """
+        Копія товару зі значеннями на момент завантаження з БД або останнього
+        збереження (None — таких значень немає, напр. товар створено в коді)
+        """
+        loaded = self.__dict__.get('_loaded')
+        if loaded is None and '_loaded_values' in self.__dict__:
+            db, names, values = self._loaded_values
+            loaded = self._loaded = super().from_db(db, names, values)
+        return loaded
+
+    def get_loaded_image_name(self):
+        loaded = self.get_loaded()
+        return None if loaded is None else loaded.get_image_name()
+
+    def get_image_name(self):
+        value = self.__dict__.get('image')
+        return getattr(value, 'name', value) or ''
+
+    def get_facet_keys(self):
+        """Ключі фасетних множин товару (UNKNOWN, якщо поля не завантажені)"""
+        from .facets import product_keys
+        return product_keys(self)
+
+    def get_autocomplete_key(self):
+        """Поля, від яких залежить запис в індексі автодоповнення (UNKNOWN, якщо не завантажені)"""
+        fields = ('name', 'slug', 'is_available', 'category_id')
+        if any(name not in self.__dict__ for name in fields):
+            return UNKNOWN
+        return tuple(self.__dict__[name] for name in fields)
+
+    def get_counted_category(self):
+        """
+        Категорія, в якій товар враховується лічильниками (None — недоступний).
+        Якщо потрібні поля не завантажені (.only/.defer), повертає UNKNOWN.
+        """
+        if 'is_available' not in self.__dict__ or 'category_id' not in self.__dict__:
+            return UNKNOWN
+        return self.category_id if self.is_available else None
+
     def get_absolute_url(self):
         return reverse('main:product_detail', args=[self.id, self.slug])
 
+    def get_detailed_description_html(self):
+        """Збережений HTML детального опису (або відрендерений через кеш, якщо застарів)"""
+        from . import markdown_cache
+
+        if markdown_cache.is_current(self):
+            return mark_safe(self.detailed_description_html)
+        return mark_safe(markdown_cache.render_cached(self.detailed_description))
+
     # --- Методи для знижок ---
+    def get_loaded_discounts(self):
+        """
+        Активні знижки товару, завантажені один раз на екземпляр.
+        Екземпляр живе в межах одного запиту, тож усі звернення шаблону
+        (бейдж, відсоток, ціна) обходяться одним SQL-запитом. Якщо знижки
+        вже завантажені через prefetch_related('discounts'), запиту немає взагалі.
+        """
+        discounts = self.__dict__.get('_loaded_discounts')
+        if discounts is None:
+            if 'discounts' in getattr(self, '_prefetched_objects_cache', {}):
+                discounts = [d for d in self.discounts.all() if d.is_active]
+            else:
+                discounts = list(self.discounts.filter(is_active=True))
+            self._loaded_discounts = discounts
+            self._best_discounts = {}
+        return discounts
+
+    def reset_discount_cache(self):
+        """Скидає завантажені знижки (після зміни знижок товару)"""
+        self.__dict__.pop('_loaded_discounts', None)
+        self.__dict__.pop('_best_discounts', None)
+
     def get_active_discount(self, quantity=1):
         """Повертає найкращу активну знижку для товару або None"""
-        discounts = self.discounts.filter(is_active=True)
+        discounts = self.get_loaded_discounts()
+        if quantity in self._best_discounts:
+            return self._best_discounts[quantity]
         valid_discounts = [d for d in discounts if d.is_valid() and quantity >= d.min_quantity]
-        if not valid_discounts:
-            return None
-        # вибираємо максимальну за сумою знижки
-        best = max(valid_discounts, key=lambda d: d.calculate_discount(self.price, quantity))
+        best = None
+        if valid_discounts:
+            # вибираємо максимальну за сумою знижки
+            best = max(valid_discounts, key=lambda d: d.calculate_discount(self.price, quantity))
+        self._best_discounts[quantity] = best
         return best
 
     def get_discounted_price(self, quantity=1):
@@ -65,6 +218,10 @@ class Product(models.Model):
             return discount.get_discounted_price(self.price, quantity)
         return self.price
 
+    def calculate_effective_price(self):
+        """Ціна однієї одиниці з найкращою активною знижкою"""
+        return self.get_discounted_price(quantity=1)
+
     def has_active_discount(self):
         return self.get_active_discount() is not None
 
@@ -80,28 +237,87 @@ class Product(models.Model):
         return 0
 
     # --- Методи для рейтингів та відгуків ---
+    # Значення читаються з денормалізованих полів і не потребують запитів
     def get_average_rating(self):
-        cache_key = f'product_{self.id}_avg_rating'
-        avg = cache.get(cache_key)
-        if avg is None:
-            avg = self.reviews.filter(is_active=True).aggregate(avg=Avg('rating'))['avg'] or 0.0
-            avg = round(avg, 1)
-            cache.set(cache_key, avg, 300)
-        return avg
+        return round(self.rating_avg, 1)
 
     def get_reviews_count(self):
-        return self.reviews.filter(is_active=True).count()
+        return self.rating_count
 
     def get_rating_distribution(self):
-        cache_key = f'product_{self.id}_rating_dist'
-        dist = cache.get(cache_key)
-        if dist is None:
-            reviews = self.reviews.filter(is_active=True)
-            dist = {i: 0 for i in range(1, 6)}
-            dist.update(
-                reviews.values('rating')
-                       .annotate(count=Count('rating'))
-                       .values_list('rating', 'count')
-            )
-            cache.set(cache_key, dist, 300)
-        return dist
+        return {i: getattr(self, f'rating_{i}') for i in range(1, 6)}
+
+
+class ProductCount(models.Model):
+    """
+    Матеріалізована кількість доступних товарів: по категорії
+    (category_id) або в усьому каталозі (category_id = TOTAL).
+    Підтримується інкрементально, див. main/counts.py.
+    """
+    TOTAL = 0
+
+    category_id = models.PositiveBigIntegerField(primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _('Лічильник товарів')
+        verbose_name_plural = _('Лічильники товарів')
+
+    def __str__(self):
+        return f'{self.category_id}: {self.count}'
+
+
+class FacetBitmap(models.Model):
+    """
+    Бітова множина доступних товарів (біт = id) для значення фасета,
+    категорії або всього каталогу. Підтримується інкрементально, див. main/facets.py.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    bits = models.BinaryField(default=b'')
+
+    class Meta:
+        verbose_name = _('Множина фасета')
+        verbose_name_plural = _('Множини фасетів')
+
+    def __str__(self):
+        return self.key
+
+
+class ProductCoView(models.Model):
+    """
+    Скільки разів пару товарів переглядали в одній сесії.
+    Кожна пара зберігається один раз: product_id < other_id.
+    """
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    other = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Спільний перегляд')
+        verbose_name_plural = _('Спільні перегляди')
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='product_coview_pair_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['updated_at'], name='product_coview_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} + {self.other_id}: {self.count}'
+
+
+class ProductRecommendation(models.Model):
+    """Попередньо обчислений список схожих товарів (main/recommendations.py)"""
+    product = models.OneToOneField(
+        Product, primary_key=True, related_name='recommendation', on_delete=models.CASCADE,
+    )
+    related_ids = models.JSONField(default=list)
+    built_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Рекомендації товару')
+        verbose_name_plural = _('Рекомендації товарів')
+
+    def __str__(self):
+        return f'{self.product_id}: {self.related_ids}'
@@ -0,0 +1,243 @@
+"""
+Кеш сторінок каталогу (product_list, product_detail) для анонімних відвідувачів.
+
+Ключ сторінки — шлях, нормалізовані параметри запиту (лише ті, що
+використовує view, відсортовані, без порожніх) і версії її «області»:
+- усі сторінки: версія категорій (навігація) і лічильників товарів;
+- каталог без категорії: версія всього каталогу;
+- категорія: версія цієї категорії;
+- сторінка товару: версія товару.
+
+Під час рендерингу сторінка додатково реєструє залежності (depend_on):
+кожна картка товару — версію свого товару, сторінка товару — категорію
+схожих товарів. Запис з кешу видається, лише якщо всі ці версії не змінились.
+
+Версії збільшуються при зміні Product, Category, Discount і Review
+(сигнали, масові перерахунки цін і рейтингів), див. invalidate_products().
+Записи живуть не довше PAGE_CACHE_TIMEOUT і не довше найближчої межі
+start_date/end_date знижки, тож ціни на сторінках не застарівають.
+Склад блоку «Популярні товари» і лічильник переглядів на сторінці товару
+можуть відставати не більше ніж на PAGE_CACHE_TIMEOUT (сам перегляд
+враховується і при видачі з кешу).
+
+Кешуються лише GET-запити анонімних відвідувачів з порожнім кошиком
+(значок кошика в шапці залежить від сесії). CSRF-токен у формах
+замінюється заповнювачем і підставляється заново для кожного відвідувача.
+
+Версії і сторінки мають бути спільними для всіх воркерів: з LocMemCache
+(окремий у кожному процесі) воркер, що не бачив зміни, віддавав би застарілу
+сторінку, тому з ним кеш сторінок вимкнено (див. також main/checks.py).
+
+Лічильники влучань/промахів: page_cache_stats (JSON, лише для персоналу).
+"""
+import contextvars
+import hashlib
+import math
+import re
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from discounts.scheduler import scheduler
+
+from .cache import bump_versions, get_versions
+
+CATALOG_VERSION = 'catalog'
+COUNTS_VERSION = 'product_counts'
+
+PAGE_KEY = 'page:%s:%s'
+STATS_KEY = 'page_cache:stats:%s:%s'
+STATS_VIEWS_KEY = 'page_cache:stats:views'
+OUTCOMES = ('hit', 'miss', 'bypass')
+
+CSRF_PLACEHOLDER = 'page-cache-csrf-token'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+# Залежності сторінки, що зараз рендериться ({ім'я версії: версія})
+_dependencies = contextvars.ContextVar('page_cache_dependencies', default=None)
+
+
+def product_version(product_id):
+    return f'product:{product_id}'
+
+
+def category_version(category_id):
+    return f'category:{category_id}'
+
+
+def uses_local_cache():
+    """Чи окремий кеш у кожного процесу (версії не спільні для воркерів)"""
+    return isinstance(caches['default'], LocMemCache)
+
+
+def is_enabled():
+    return getattr(settings, 'PAGE_CACHE_ENABLED', True) and not uses_local_cache()
+
+
+def depend_on(names):
+    """Додає версії `names` до залежностей сторінки, що рендериться"""
+    dependencies = _dependencies.get()
+    if dependencies is None:
+        return
+    missing = [name for name in names if name not in dependencies]
+    if missing:
+        dependencies.update(get_versions(missing))
+
+
+def invalidate_products(product_ids, category_ids=()):
+    """Нові версії товарів, їх категорій і всього каталогу"""
+    names = [product_version(i) for i in set(product_ids)]
+    names += [category_version(i) for i in set(category_ids) if i is not None]
+    if names:
+        bump_versions(names + [CATALOG_VERSION])
+
+
+def invalidate_counts():
+    bump_versions([COUNTS_VERSION])
+
+
+def is_cacheable_request(request):
+    return (
+        request.method == 'GET'
+        and not request.user.is_authenticated
+        and not request.session.get(settings.CART_SESSION_ID)
+    )
+
+
+def normalized_query(request, params):
+    items = sorted(
+        (name, value)
+        for name in params
+        for value in request.GET.getlist(name)
+        if value.strip()
+    )
+    return urlencode(items)
+
+
+def page_key(view_name, request, params, versions):
+    raw = '|'.join([
+        request.path,
+        normalized_query(request, params),
+        ','.join(f'{name}={versions[name]}' for name in sorted(versions)),
+    ])
+    return PAGE_KEY % (view_name, hashlib.md5(raw.encode()).hexdigest())
+
+
+def page_expires():
+    """Момент, до якого можна кешувати сторінку (unix-час)"""
+    now = time.time()
+    expires = now + getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+    boundary = scheduler.next_boundary()
+    if boundary is not None:
+        expires = min(expires, boundary.timestamp())
+    return expires
+
+
+def record(view_name, outcome):
+    key = STATS_KEY % (view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+        views = cache.get(STATS_VIEWS_KEY) or []
+        if view_name not in views:
+            cache.set(STATS_VIEWS_KEY, views + [view_name], None)
+
+
+def get_stats():
+    """{view: {'hit': n, 'miss': n, 'bypass': n, 'hit_ratio': x}}"""
+    views = cache.get(STATS_VIEWS_KEY) or []
+    keys = [STATS_KEY % (view, outcome) for view in views for outcome in OUTCOMES]
+    values = cache.get_many(keys)
+    stats = {}
+    for view in views:
+        counters = {outcome: values.get(STATS_KEY % (view, outcome), 0) for outcome in OUTCOMES}
+        lookups = counters['hit'] + counters['miss']
+        counters['hit_ratio'] = round(counters['hit'] / lookups, 4) if lookups else 0.0
+        stats[view] = counters
+    return stats
+
+
+def reset_stats():
+    views = cache.get(STATS_VIEWS_KEY) or []
+    cache.delete_many([STATS_KEY % (view, outcome) for view in views for outcome in OUTCOMES])
+
+
+def _store(key, response, dependencies):
+    expires = page_expires()
+    timeout = math.ceil(expires - time.time())
+    if timeout <= 0:
+        return
+    content = CSRF_INPUT_RE.sub(r'\g<1>%s\g<2>' % CSRF_PLACEHOLDER, response.content.decode(response.charset))
+    cache.set(key, {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'dependencies': dependencies,
+        'expires': expires,
+    }, timeout)
+
+
+def _is_current(entry):
+    if entry['expires'] <= time.time():
+        return False
+    dependencies = entry['dependencies']
+    return not dependencies or get_versions(dependencies) == dependencies
+
+
+def _response(request, entry):
+    content = entry['content']
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content, content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def cache_anonymous_page(scope, params=(), on_hit=None):
+    """
+    Декоратор view. scope(request, *args, **kwargs) повертає імена версій
+    області сторінки (або None — не кешувати); params — параметри запиту,
+    що впливають на сторінку; on_hit — побічні дії view, які треба виконати
+    і при видачі з кешу (наприклад, облік переглядів).
+    """
+    def decorator(view):
+        view_name = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_enabled() or not is_cacheable_request(request):
+                record(view_name, 'bypass')
+                return view(request, *args, **kwargs)
+            names = scope(request, *args, **kwargs)
+            if names is None:
+                record(view_name, 'bypass')
+                return view(request, *args, **kwargs)
+
+            key = page_key(view_name, request, params, get_versions(names))
+            entry = cache.get(key)
+            if entry is not None and _is_current(entry):
+                record(view_name, 'hit')
+                if on_hit is not None:
+                    on_hit(request, *args, **kwargs)
+                return _response(request, entry)
+
+            record(view_name, 'miss')
+            token = _dependencies.set({})
+            try:
+                response = view(request, *args, **kwargs)
+                dependencies = _dependencies.get()
+            finally:
+                _dependencies.reset(token)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                _store(key, response, dependencies)
+            response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,254 @@
+"""
+Пагінація каталогу без SELECT COUNT(*).
+
+- CursorPaginator — keyset-пагінація: замість OFFSET сторінка вибирається
+  умовою WHERE (поле, id) > (значення, id) за індексом, тому глибокі
+  сторінки коштують стільки ж, скільки перша. Курсори непрозорі (base64).
+- NoCountPaginator — звичайні номери сторінок, але без COUNT: вибирається
+  per_page + 1 рядок, щоб дізнатися, чи є наступна сторінка.
+
+Режим обирається налаштуванням CATALOG_PAGINATION ('page', 'fast', 'cursor').
+
+iter_batches() — той самий keyset-підхід для фонових проходів по каталогу
+(перерахунок цін, рейтингів, HTML описів).
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q
+
+PAGINATION_MODES = ('page', 'fast', 'cursor')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def parse_ordering(ordering):
+    """'-created_at' → ('created_at', True)"""
+    if ordering.startswith('-'):
+        return ordering[1:], True
+    return ordering, False
+
+
+class CursorPage:
+    mode = 'cursor'
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class CursorPaginator:
+    """
+    Keyset-пагінація за одним полем сортування з id як тай-брейкером.
+    Queryset не повинен мати власного сортування — його задає пагінатор.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.field_name, self.descending = parse_ordering(ordering)
+        self.field = queryset.model._meta.get_field(self.field_name)
+
+    def encode_cursor(self, obj, direction):
+        payload = [direction, self.field.value_to_string(obj), obj.pk]
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, value, pk = json.loads(raw)
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            return direction, self.field.to_python(value), int(pk)
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _order_by(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return (prefix + self.field_name, prefix + 'id')
+
+    def _seek(self, value, pk, reverse=False):
+        """Умова «після (value, pk)» у напрямку сортування"""
+        descending = self.descending != reverse
+        op = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{self.field_name}__{op}': value}) |
+            Q(**{self.field_name: value, f'id__{op}': pk})
+        )
+
+    def page(self, cursor=None):
+        direction, value, pk = 'next', None, None
+        if cursor:
+            direction, value, pk = self.decode_cursor(cursor)
+        backwards = direction == 'prev'
+
+        queryset = self.queryset.order_by(*self._order_by(reverse=backwards))
+        if pk is not None:
+            queryset = queryset.filter(self._seek(value, pk, reverse=backwards))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, pk is not None
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_previous else None
+        return CursorPage(rows, has_next, has_previous, next_cursor, previous_cursor)
+
+
+class NoCountPage:
+    mode = 'fast'
+
+    def __init__(self, object_list, number, per_page, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.per_page = per_page
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.per_page + 1
+
+    def end_index(self):
+        return (self.number - 1) * self.per_page + len(self.object_list)
+
+
+class NoCountPaginator:
+    """Пагінатор з номерами сторінок, який ніколи не рахує COUNT(*)"""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def page(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = list(self.queryset[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            # Сторінка за межами списку — повертаємо першу
+            return self.page(1)
+        return NoCountPage(rows[:self.per_page], number, self.per_page, len(rows) > self.per_page)
+
+
+def paginate(request, queryset, per_page, ordering=None):
+    """
+    Повертає сторінку в режимі CATALOG_PAGINATION.
+    `ordering` — поле сортування для keyset-режиму ('-created_at');
+    якщо його немає (наприклад, сортування за релевантністю), cursor-режим
+    замінюється на 'fast'.
+    """
+    mode = getattr(settings, 'CATALOG_PAGINATION', 'page')
+    if request.GET.get('cursor'):
+        mode = 'cursor'
+    if mode == 'cursor' and ordering is None:
+        mode = 'fast'
+
+    if mode == 'cursor':
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        try:
+            return paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return paginator.page()
+
+    if ordering is not None:
+        queryset = queryset.order_by(*_with_tiebreaker(ordering))
+
+    if mode == 'fast':
+        return NoCountPaginator(queryset, per_page).page(request.GET.get('page'))
+
+    paginator = Paginator(queryset, per_page)
+    page = request.GET.get('page')
+    try:
+        page = paginator.page(page)
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    page.mode = 'page'
+    return page
+
+
+def iter_batches(queryset, batch_size, ids=None):
+    """
+    Видає об'єкти пачками по batch_size за зростанням id (WHERE id > останній,
+    без OFFSET). Якщо задано ids — лише ці об'єкти, пачками по id__in.
+    """
+    queryset = queryset.order_by('id')
+    if ids is not None:
+        ids = sorted(set(ids))
+        for start in range(0, len(ids), batch_size):
+            yield list(queryset.filter(id__in=ids[start:start + batch_size]))
+        return
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def _with_tiebreaker(ordering):
+    field_name, descending = parse_ordering(ordering)
+    return (ordering, '-id' if descending else 'id')
@@ -0,0 +1,155 @@
+"""
+Популярність товарів з експоненційним згасанням у часі.
+
+Кожен перегляд важить 1 у момент перегляду і вдвічі менше через
+POPULARITY_HALF_LIFE годин. Щоб не переписувати всі оцінки з плином часу,
+Product.popularity зберігається в логарифмічній шкалі відносно фіксованої
+епохи: popularity = ln(Σ exp(λ·(tᵢ − EPOCH))). Порядок товарів за таким
+значенням збігається з порядком за згаслою оцінкою в будь-який момент,
+а новий перегляд лише збільшує значення (logaddexp), тому старі хіти
+поступово опускаються під нові.
+
+Оцінки записуються в БД разом зі скиданням буфера переглядів
+(main/view_counter.py). Поверх них у кеші (спільному для всіх воркерів,
+див. CACHES) тримається обмежений рейтинг top-K, який оновлюється злиттям
+щойно змінених оцінок і не рідше ніж раз на POPULARITY_CACHE_TIMEOUT
+перебудовується з індексу по БД — це ж виправляє злиття, втрачені при
+одночасному записі з кількох воркерів.
+
+Після зміни POPULARITY_HALF_LIFE оцінки слід перерахувати:
+`manage.py rebuild_popularity --reset`.
+"""
+import heapq
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+LEADERBOARD_KEY = 'popularity:top'
+
+
+def half_life():
+    """Період напіврозпаду в секундах"""
+    return getattr(settings, 'POPULARITY_HALF_LIFE', 168) * 3600
+
+
+def decay_rate():
+    return math.log(2) / half_life()
+
+
+def view_score(count, when=None):
+    """Внесок `count` переглядів у момент `when` у логарифмічній шкалі"""
+    when = when or timezone.now()
+    return math.log(count) + decay_rate() * (when - EPOCH).total_seconds()
+
+
+def add_views_expression(count, when=None):
+    """
+    Вираз для UPDATE: popularity ⊕ view_score(count), де
+    a ⊕ b = ln(eᵃ + eᵇ) = max(a, b) + ln(1 + e^−|a−b|).
+    """
+    added = Value(view_score(count, when))
+    return Greatest(F('popularity'), added) + Ln(1 + Exp(-Abs(F('popularity') - added)))
+
+
+def decayed_views(popularity, when=None):
+    """Згасла кількість переглядів на момент `when` (для відображення)"""
+    when = when or timezone.now()
+    return math.exp(popularity - decay_rate() * (when - EPOCH).total_seconds())
+
+
+class Leaderboard:
+    """Обмежений рейтинг top-K у кеші: список пар (оцінка, id) за спаданням"""
+
+    def __init__(self, size=50, timeout=300):
+        self.size = size
+        self.timeout = timeout
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            size=getattr(settings, 'POPULARITY_TOP_K', 50),
+            timeout=getattr(settings, 'POPULARITY_CACHE_TIMEOUT', 300),
+        )
+
+    def get(self):
+        top = cache.get(LEADERBOARD_KEY)
+        if top is None:
+            top = self.rebuild()
+        return top
+
+    def rebuild(self):
+        """Перебудовує рейтинг з БД (за індексом popularity)"""
+        from .models import Product
+
+        top = [
+            (score, product_id)
+            for product_id, score in Product.objects.filter(is_available=True)
+            .order_by('-popularity', '-id')
+            .values_list('id', 'popularity')[:self.size]
+        ]
+        cache.set(LEADERBOARD_KEY, top, self.timeout)
+        return top
+
+    def refresh(self, product_ids):
+        """
+        Зливає поточні оцінки товарів `product_ids` з рейтингом і залишає
+        top-K. Недоступні товари з рейтингу прибираються.
+        """
+        from .models import Product
+
+        top = cache.get(LEADERBOARD_KEY)
+        if top is None or not product_ids:
+            # Рейтинг буде побудовано з БД при наступному читанні
+            return
+        merged = {product_id: score for score, product_id in top}
+        rows = Product.objects.filter(id__in=product_ids).values_list('id', 'popularity', 'is_available')
+        for product_id, score, is_available in rows:
+            if is_available:
+                merged[product_id] = score
+            else:
+                merged.pop(product_id, None)
+        top = heapq.nlargest(self.size, ((score, product_id) for product_id, score in merged.items()))
+        cache.set(LEADERBOARD_KEY, top, self.timeout)
+
+    def product_ids(self):
+        return [product_id for _score, product_id in self.get()]
+
+
+leaderboard = Leaderboard.from_settings()
+
+
+def popular_products(count):
+    """`count` найпопулярніших доступних товарів у порядку рейтингу"""
+    from . import cards
+    from .models import Product
+
+    ids = leaderboard.product_ids()
+    result = []
+    # Зазвичай вистачає першого запиту: у рейтингу лише доступні товари
+    for start in range(0, len(ids), count):
+        chunk = ids[start:start + count]
+        products = cards.card_queryset(Product.objects.filter(id__in=chunk, is_available=True)).in_bulk()
+        result.extend(products[product_id] for product_id in chunk if product_id in products)
+        if len(result) >= count:
+            break
+    return result[:count]
+
+
+def reset_scores(when=None):
+    """
+    Перераховує popularity з накопиченого Product.views так, ніби всі
+    перегляди відбулися в момент `when`. Повертає кількість товарів.
+    """
+    from .models import Product
+
+    when = when or timezone.now()
+    age = Value(decay_rate() * (when - EPOCH).total_seconds())
+    Product.objects.filter(views__lte=0).update(popularity=0)
+    return Product.objects.filter(views__gt=0).update(popularity=Ln(F('views')) + age)
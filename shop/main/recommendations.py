@@ -0,0 +1,318 @@
+"""
+Рекомендації «схожі товари» для сторінки товару.
+
+Для кожного товару заздалегідь обчислюється список сусідів
+(ProductRecommendation.related_ids), тож product_detail вибирає
+схожі товари за первинним ключем замість запиту по категорії.
+
+Сусіди визначаються двома сигналами:
+- спільні перегляди: товари, переглянуті в одній сесії. Останні перегляди
+  зберігаються в підписаному cookie (не в сесії — перегляд не створює
+  запису django_session), пари накопичуються в буфері
+  переглядів і записуються в ProductCoView разом з ним (main/view_counter.py);
+- текстова схожість назви/опису: TF-IDF з косинусною мірою. Вектори
+  обмежені найвагомішими термінами, а схожість рахується через
+  інвертований індекс зі зрізаними списками входжень, тож побудова для
+  всього каталогу лінійна за кількістю товарів.
+
+Оцінка сусіда: (1 − w)·cos + w·(спільні перегляди / максимум для товару),
+де w = RECOMMENDATIONS_COVIEW_WEIGHT.
+
+Побудова: `manage.py build_recommendations` (повна або --stale —
+лише товари, що змінились або отримали нові спільні перегляди).
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .cards import card_queryset
+from .models import Product, ProductCoView, ProductRecommendation
+
+RECENT_VIEWS_COOKIE = 'recently_viewed'
+RECENT_VIEWS_COOKIE_SALT = 'main.recommendations.recent'
+
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+# --- Спільні перегляди ---
+
+def recent_views(request):
+    """Останні переглянуті товари відвідувача (з cookie; новіші спершу)"""
+    if hasattr(request, '_recent_views'):
+        return request._recent_views
+    value = request.get_signed_cookie(RECENT_VIEWS_COOKIE, default='', salt=RECENT_VIEWS_COOKIE_SALT)
+    return [int(i) for i in value.split(',') if i.isdigit()]
+
+
+def remember_view(request, product_id):
+    """
+    Додає товар до останніх переглядів відвідувача. Повертає товари, з якими
+    утворюється нова пара спільного перегляду (порожньо для повторного перегляду).
+    Новий список записується в cookie middleware RecentViewsCookieMiddleware.
+    """
+    recent = recent_views(request)
+    if product_id in recent:
+        if recent[0] != product_id:
+            request._recent_views = [product_id] + [i for i in recent if i != product_id]
+        return []
+    size = get_setting('RECOMMENDATIONS_RECENT_VIEWS', 5)
+    request._recent_views = ([product_id] + recent)[:size]
+    return recent
+
+
+def save_recent_views(request, response):
+    if hasattr(request, '_recent_views'):
+        response.set_signed_cookie(
+            RECENT_VIEWS_COOKIE, ','.join(map(str, request._recent_views)),
+            salt=RECENT_VIEWS_COOKIE_SALT, max_age=settings.SESSION_COOKIE_AGE,
+            httponly=True, samesite='Lax',
+        )
+
+
+def co_view_pair(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def record_co_views(pairs, now=None, batch_size=500):
+    """
+    Записує накопичені пари {(a, b): n} з a < b. Викликається зі скидання
+    буфера переглядів у його транзакції.
+    """
+    now = now or timezone.now()
+    product_ids = {i for pair in pairs for i in pair}
+    existing = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    pairs = {pair: n for pair, n in pairs.items() if pair[0] in existing and pair[1] in existing}
+    if not pairs:
+        return 0
+    ProductCoView.objects.bulk_create(
+        [ProductCoView(product_id=a, other_id=b, count=0, updated_at=now) for a, b in pairs],
+        ignore_conflicts=True, batch_size=batch_size,
+    )
+    # Вибірка пачками за product_id (префікс унікального індексу пари)
+    first_ids = sorted({a for a, _ in pairs})
+    by_delta = defaultdict(list)
+    for start in range(0, len(first_ids), batch_size):
+        rows = ProductCoView.objects.filter(
+            product_id__in=first_ids[start:start + batch_size],
+        ).values_list('id', 'product_id', 'other_id')
+        for row_id, a, b in rows:
+            if (a, b) in pairs:
+                by_delta[pairs[a, b]].append(row_id)
+    for delta, row_ids in by_delta.items():
+        for start in range(0, len(row_ids), batch_size):
+            ProductCoView.objects.filter(id__in=row_ids[start:start + batch_size]).update(
+                count=F('count') + delta, updated_at=now,
+            )
+    return len(pairs)
+
+
+def load_co_views(product_ids=None):
+    """{товар: {сусід: кількість спільних переглядів}}"""
+    rows = ProductCoView.objects.filter(count__gt=0)
+    if product_ids is not None:
+        rows = rows.filter(Q(product_id__in=product_ids) | Q(other_id__in=product_ids))
+    neighbours = defaultdict(dict)
+    for a, b, count in rows.values_list('product_id', 'other_id', 'count').iterator(chunk_size=5000):
+        neighbours[a][b] = count
+        neighbours[b][a] = count
+    return neighbours
+
+
+# --- Текстова схожість ---
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class TfidfIndex:
+    """
+    Розріджені TF-IDF вектори (1 + ln tf)·ln(N/df), нормовані за L2.
+
+    max_terms — скільки найвагоміших термінів лишається у векторі товару;
+    max_postings — скільки найвагоміших товарів лишається в списку терміна;
+    query_terms — скільки термінів товару використовується для пошуку кандидатів;
+    max_df — частка каталогу, вище якої термін вважається стоп-словом.
+    """
+
+    def __init__(self, max_terms=12, max_postings=100, query_terms=6, max_df=0.1):
+        self.max_terms = max_terms
+        self.max_postings = max_postings
+        self.query_terms = query_terms
+        self.max_df = max_df
+        self.vectors = {}
+        self.postings = {}
+
+    def fit(self, documents):
+        """documents — ітерабельна послідовність пар (id, текст)"""
+        counts = {doc_id: Counter(tokenize(text)) for doc_id, text in documents}
+        df = Counter()
+        for terms in counts.values():
+            df.update(terms.keys())
+        total = len(counts)
+        max_df = max(2, int(total * self.max_df))
+        # Терміни з одного товару не дають сусідів, надто часті — шум
+        term_ids = {}
+        idf = []
+        for term, n in df.items():
+            if 1 < n <= max_df:
+                term_ids[term] = len(idf)
+                idf.append(math.log(total / n))
+
+        postings = defaultdict(list)
+        for doc_id, terms in counts.items():
+            weights = [
+                (term_ids[term], (1 + math.log(tf)) * idf[term_ids[term]])
+                for term, tf in terms.items() if term in term_ids
+            ]
+            if not weights:
+                continue
+            weights = heapq.nlargest(self.max_terms, weights, key=itemgetter(1))
+            norm = math.sqrt(sum(w * w for _, w in weights))
+            vector = tuple((term_id, w / norm) for term_id, w in weights)
+            self.vectors[doc_id] = vector
+            for term_id, w in vector:
+                postings[term_id].append((w, doc_id))
+
+        self.postings = {
+            term_id: tuple(
+                (doc_id, w) for w, doc_id in
+                (heapq.nlargest(self.max_postings, docs) if len(docs) > self.max_postings else docs)
+            )
+            for term_id, docs in postings.items()
+        }
+        return self
+
+    def similar(self, doc_id, limit):
+        """[(id, схожість)] — найближчі товари за косинусною мірою"""
+        vector = self.vectors.get(doc_id)
+        if not vector:
+            return []
+        scores = {}
+        get = scores.get
+        for term_id, weight in vector[:self.query_terms]:
+            for other_id, other_weight in self.postings[term_id]:
+                scores[other_id] = get(other_id, 0.0) + weight * other_weight
+        scores.pop(doc_id, None)
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+
+
+def product_text(name, description, category_name):
+    # Назва важливіша за опис — враховується двічі
+    return ' '.join((name, name, description, category_name))
+
+
+def build_text_index(**options):
+    products = (
+        Product.objects.filter(is_available=True)
+        .values_list('id', 'name', 'description', 'category__name')
+        .iterator(chunk_size=5000)
+    )
+    return TfidfIndex(**options).fit(
+        (product_id, product_text(name, description, category_name))
+        for product_id, name, description, category_name in products
+    )
+
+
+# --- Побудова ---
+
+def score_neighbours(product_id, text_index, co_views, size, coview_weight, available):
+    scores = defaultdict(float)
+    for other_id, similarity in text_index.similar(product_id, size * 3):
+        scores[other_id] += (1 - coview_weight) * similarity
+    neighbours = co_views.get(product_id)
+    if neighbours:
+        top = max(neighbours.values())
+        for other_id, count in neighbours.items():
+            if other_id in available:
+                scores[other_id] += coview_weight * count / top
+    scores.pop(product_id, None)
+    return [other_id for other_id, _ in heapq.nlargest(size, scores.items(), key=itemgetter(1))]
+
+
+def build_recommendations(product_ids=None, batch_size=1000, text_index=None):
+    """
+    Обчислює сусідів для товарів (або всього каталогу) і зберігає їх
+    у ProductRecommendation. Повертає кількість оброблених товарів.
+    """
+    size = get_setting('RECOMMENDATIONS_SIZE', 8)
+    coview_weight = get_setting('RECOMMENDATIONS_COVIEW_WEIGHT', 0.6)
+    text_index = text_index or build_text_index()
+    available = set(Product.objects.filter(is_available=True).values_list('id', flat=True))
+    targets = sorted(available if product_ids is None else available & set(product_ids))
+    co_views = load_co_views(None if product_ids is None else targets)
+
+    now = timezone.now()
+    with transaction.atomic():
+        if product_ids is None:
+            ProductRecommendation.objects.all().delete()
+        for start in range(0, len(targets), batch_size):
+            chunk = targets[start:start + batch_size]
+            rows = [
+                ProductRecommendation(
+                    product_id=product_id, built_at=now,
+                    related_ids=score_neighbours(
+                        product_id, text_index, co_views, size, coview_weight, available,
+                    ),
+                )
+                for product_id in chunk
+            ]
+            if product_ids is not None:
+                ProductRecommendation.objects.filter(product_id__in=chunk).delete()
+            ProductRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+    return len(targets)
+
+
+def stale_product_ids():
+    """
+    Доступні товари без рекомендацій, змінені після побудови або з новими
+    спільними переглядами після побудови.
+    """
+    built_at = ProductRecommendation.objects.filter(product=OuterRef('pk')).values('built_at')
+    new_co_views = ProductCoView.objects.filter(updated_at__gt=OuterRef('built_at'))
+    products = Product.objects.filter(is_available=True).annotate(built_at=Subquery(built_at))
+    return list(
+        products.filter(
+            Q(built_at__isnull=True) |
+            Q(updated_at__gt=F('built_at')) |
+            Exists(new_co_views.filter(product=OuterRef('pk'))) |
+            Exists(new_co_views.filter(other=OuterRef('pk')))
+        ).values_list('id', flat=True)
+    )
+
+
+# --- Читання ---
+
+def related_products(product, limit=4):
+    """
+    Схожі товари з попередньо обчисленого списку; якщо його ще немає
+    або в ньому замало доступних товарів — доповнюються товарами категорії.
+    Список варто завантажити разом з товаром: select_related('recommendation').
+    """
+    try:
+        related_ids = product.recommendation.related_ids
+    except ProductRecommendation.DoesNotExist:
+        related_ids = []
+    result = []
+    if related_ids:
+        products = card_queryset(
+            Product.objects.filter(id__in=related_ids[:limit * 2], is_available=True)
+        ).in_bulk()
+        result = [products[i] for i in related_ids if i in products][:limit]
+    if len(result) < limit:
+        exclude = [product.pk] + [p.pk for p in result]
+        result += list(card_queryset(
+            Product.objects.filter(category_id=product.category_id, is_available=True)
+            .exclude(id__in=exclude).order_by('-popularity', '-id')[:limit - len(result)]
+        ))
+    return result
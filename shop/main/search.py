@@ -0,0 +1,190 @@
+"""
+Повнотекстовий пошук товарів на основі SQLite FTS5.
+
+Індекс `main_product_fts` зберігає для кожного товару (rowid = Product.id)
+назву, короткий і детальний опис та назву категорії. Індекс оновлюється
+інкрементально через сигнали (див. main/signals.py) і може бути повністю
+перебудований командою `manage.py rebuild_search_index`.
+
+Якщо база даних не SQLite (або FTS5 недоступний), пошук деградує до
+старого фільтра `icontains`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'main_product_fts'
+
+# Токени запиту: літери/цифри будь-якої абетки
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, detailed_description, category_name, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+# Вага колонок для bm25: назва важливіша за опис
+RANK_SQL = f"bm25({FTS_TABLE}, 10.0, 3.0, 1.0, 5.0)"
+
+
+def is_enabled(using=None):
+    """Чи підтримує поточна БД індекс FTS5"""
+    conn = connection if using is None else using
+    return conn.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Перетворює довільний текст користувача у безпечний FTS5-запит.
+    Кожен токен береться в лапки (щоб не спрацьовував синтаксис FTS5),
+    останній токен шукається за префіксом: "ноут" знайде "ноутбук".
+    """
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return ''
+    parts = ['"%s"' % t for t in tokens[:-1]]
+    parts.append('"%s"*' % tokens[-1])
+    return ' '.join(parts)
+
+
+def _product_row(product):
+    return (
+        product.pk,
+        product.name,
+        product.description,
+        product.detailed_description,
+        product.category.name,
+    )
+
+
+def index_product(product):
+    """Додає або оновлює один товар в індексі"""
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, name, description, detailed_description, category_name) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            _product_row(product),
+        )
+
+
+def remove_product(product_id):
+    """Видаляє товар з індексу"""
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def reindex_category(category):
+    """Оновлює назву категорії у всіх її товарах одним запитом"""
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET category_name = %s "
+            "WHERE rowid IN (SELECT id FROM main_product WHERE category_id = %s)",
+            [category.name, category.pk],
+        )
+
+
+def index_products(product_ids):
+    """Переіндексовує набір товарів (наприклад, після bulk-операцій)"""
+    if not is_enabled():
+        return 0
+    from .models import Product
+
+    product_ids = list(product_ids)
+    count = 0
+    for start in range(0, len(product_ids), 500):
+        chunk = product_ids[start:start + 500]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+        count += _insert_rows([
+            _product_row(p)
+            for p in Product.objects.filter(id__in=chunk).select_related('category')
+        ])
+    return count
+
+
+def rebuild_index(batch_size=2000):
+    """Повністю перебудовує індекс з таблиць Product/Category"""
+    if not is_enabled():
+        return 0
+    from .models import Product
+
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    products = (
+        Product.objects.select_related('category')
+        .only('id', 'name', 'description', 'detailed_description', 'category__name')
+        .order_by('id')
+    )
+    count = 0
+    batch = []
+    for product in products.iterator(chunk_size=batch_size):
+        batch.append(_product_row(product))
+        if len(batch) >= batch_size:
+            count += _insert_rows(batch)
+            batch = []
+    if batch:
+        count += _insert_rows(batch)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def _insert_rows(rows):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, name, description, detailed_description, category_name) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+    return len(rows)
+
+
+def legacy_filter(queryset, text):
+    """Старий пошук через icontains (fallback і база для бенчмарку)"""
+    return queryset.filter(
+        Q(name__icontains=text) |
+        Q(description__icontains=text) |
+        Q(category__name__icontains=text)
+    )
+
+
+def search(queryset, text):
+    """
+    Фільтрує queryset товарів за текстом і додає анотацію `search_rank`
+    (менше значення — релевантніший результат).
+    """
+    if not is_enabled():
+        return legacy_filter(queryset, text)
+    match = build_match_query(text)
+    if not match:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    # JOIN з віртуальною таблицею: MATCH виконується один раз,
+    # а bm25() доступний як звичайна колонка результату
+    return queryset.extra(
+        select={'search_rank': RANK_SQL},
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+        params=[match],
+    )
+
+
+def is_ranked(queryset):
+    """Чи має queryset анотацію релевантності"""
+    return 'search_rank' in queryset.query.extra
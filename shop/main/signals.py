@@ -0,0 +1,168 @@
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from .models import Product, Category, FacetBitmap, UNKNOWN
+from . import autocomplete, counts, facets, markdown_cache, page_cache, search, thumbnails, view_counter
+from .cache import bump_versions
+from .categories import CATEGORIES_VERSION
+
+
+def loaded_state(product, method):
+    """method() для стану товару на момент завантаження (UNKNOWN — стан невідомий)"""
+    loaded = product.get_loaded()
+    return UNKNOWN if loaded is None else method(loaded)
+
+
+@receiver(pre_save, sender=Product)
+def set_effective_price(sender, instance, raw=False, **kwargs):
+    """Ціна зі знижкою зберігається разом із товаром"""
+    if raw:
+        return
+    if instance.pk is None:
+        instance.effective_price = instance.price
+    else:
+        instance.reset_discount_cache()
+        instance.effective_price = instance.calculate_effective_price()
+
+
+@receiver(pre_save, sender=Product)
+def render_detailed_description(sender, instance, raw=False, **kwargs):
+    """HTML детального опису зберігається разом із товаром"""
+    if raw:
+        return
+    markdown_cache.refresh(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    """Оновлення пошукового індексу при збереженні товару"""
+    if raw:
+        return
+    search.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_counts_on_save(sender, instance, created, raw=False, **kwargs):
+    """Інкрементальне оновлення лічильників товарів"""
+    if raw:
+        return
+    previous = None if created else loaded_state(instance, Product.get_counted_category)
+    counts.product_changed(previous, instance.get_counted_category())
+
+
+@receiver(post_delete, sender=Product)
+def update_counts_on_delete(sender, instance, **kwargs):
+    """Товар більше не враховується лічильниками"""
+    counts.product_changed(loaded_state(instance, Product.get_counted_category), None)
+
+
+@receiver(post_save, sender=Product)
+def update_facets_on_save(sender, instance, created, raw=False, **kwargs):
+    """Інкрементальне оновлення фасетних множин"""
+    if raw:
+        return
+    previous = frozenset() if created else loaded_state(instance, Product.get_facet_keys)
+    facets.product_changed(instance.pk, previous, instance.get_facet_keys())
+
+
+@receiver(post_save, sender=Product)
+def invalidate_autocomplete_on_save(sender, instance, created, raw=False, **kwargs):
+    """Індекс автодоповнення залежить лише від назви, slug, доступності і категорії"""
+    if raw:
+        return
+    current = instance.get_autocomplete_key()
+    if created or current is UNKNOWN or current != loaded_state(instance, Product.get_autocomplete_key):
+        autocomplete.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_autocomplete_on_delete(sender, instance, **kwargs):
+    """Видалений товар зникає з підказок"""
+    autocomplete.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def update_facets_on_delete(sender, instance, **kwargs):
+    """Видалений товар прибирається з усіх фасетних множин"""
+    previous = loaded_state(instance, Product.get_facet_keys)
+    if previous is UNKNOWN:
+        facets.update_products([instance.pk])
+    else:
+        facets.apply_changes({instance.pk: (previous, frozenset())})
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, raw=False, **kwargs):
+    """Нові версії кешу сторінок товару, його категорій і каталогу"""
+    if raw:
+        return
+    loaded = instance.get_loaded()
+    category_ids = [instance.category_id, loaded and loaded.__dict__.get('category_id')]
+    page_cache.invalidate_products([instance.pk], category_ids)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    """Видалення товару з пошукового індексу"""
+    search.remove_product(instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Category)
+def reset_image_hash(sender, instance, raw=False, **kwargs):
+    """Мініатюри старого зображення не підходять до нового"""
+    if raw or 'image' not in instance.__dict__:
+        return
+    if instance.get_image_name() != instance.get_loaded_image_name():
+        instance.image_hash = ''
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    """Генерація мініатюр у пулі процесів після коміту транзакції"""
+    if raw or 'image' not in instance.__dict__:
+        return
+    name = instance.get_image_name()
+    instance._loaded_image = name
+    if name and not thumbnails.is_current(instance.image_hash):
+        pk = instance.pk
+        transaction.on_commit(lambda: thumbnails.schedule(sender, pk, name))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_on_save(sender, instance, created, raw=False, **kwargs):
+    """Оновлення назви категорії в індексі товарів"""
+    if raw or created:
+        return
+    search.reindex_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_counter(sender, instance, **kwargs):
+    """Лічильник видаленої категорії більше не потрібен"""
+    counts.remove_category(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories_cache(sender, instance, raw=False, **kwargs):
+    """Нова версія кешу категорій і фрагментів навігації"""
+    bump_versions([CATEGORIES_VERSION])
+
+
+@receiver(request_finished)
+def flush_view_counter(sender, **kwargs):
+    """Буфер переглядів скидається після відповіді, якщо настав час (див. view_counter)"""
+    view_counter.flush_if_due()
+
+
+@receiver(post_migrate)
+def build_missing_facets(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Множини фасетів для каталогу, що існував до їх появи (міграція 0011)"""
+    if sender.name != 'main' or using != DEFAULT_DB_ALIAS:
+        return
+    if not FacetBitmap.objects.exists() and Product.objects.filter(is_available=True).exists():
+        facets.rebuild()
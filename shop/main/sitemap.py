@@ -0,0 +1,228 @@
+"""
+Sitemap каталогу, згенерований у файли (`manage.py generate_sitemaps`).
+
+    sitemap.xml                  — індекс (sitemapindex)
+    sitemap-categories.xml       — головна і сторінки категорій
+    sitemap-products-<N>.xml     — товари з id у [N·SHARD, (N+1)·SHARD)
+
+Товари розбиваються на частини за діапазоном id, тож кожна частина
+містить не більше SITEMAP_SHARD_SIZE URL (ліміт протоколу — 50 000),
+а зміна товару зачіпає лише його частину. Для кожної частини один
+GROUP BY-запит дає відбиток (кількість, сума id, найпізніший updated_at);
+у manifest.json зберігаються відбитки записаних файлів, і команда
+переписує лише частини, відбиток яких змінився (або --force).
+
+XML формується генераторами і пишеться у файл порціями (тимчасовий
+файл + os.replace), тож пам'ять не залежить від розміру каталогу.
+URL товарів будуються тим самим шаблоном, що й get_absolute_url()
+(cards.product_url_builder), категорій — get_absolute_url().
+Файли віддаються переглядом sitemap_file або вебсервером.
+"""
+import hashlib
+import json
+import os
+from datetime import timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Sum
+from django.urls import reverse
+
+from .cards import product_url_builder
+from .models import Category, Product
+
+INDEX_NAME = 'sitemap.xml'
+CATEGORIES_NAME = 'sitemap-categories.xml'
+MANIFEST_NAME = 'manifest.json'
+SHARD_NAME = 'sitemap-products-%d.xml'
+# Змінюється разом з форматом файлів — усі частини переписуються
+FORMAT_VERSION = 1
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def get_root():
+    return str(getattr(settings, 'SITEMAP_ROOT', settings.BASE_DIR / 'sitemaps'))
+
+
+def get_base_url():
+    return getattr(settings, 'SITEMAP_BASE_URL', 'http://localhost:8000').rstrip('/')
+
+
+def get_shard_size():
+    return min(getattr(settings, 'SITEMAP_SHARD_SIZE', 50_000), 50_000)
+
+
+def w3c_datetime(value):
+    return value.astimezone(dt_timezone.utc).isoformat(timespec='seconds') if value else None
+
+
+# --- XML ---
+
+def _url(loc, lastmod=None):
+    lastmod = f'<lastmod>{lastmod}</lastmod>' if lastmod else ''
+    return f'<url><loc>{escape(loc)}</loc>{lastmod}</url>\n'
+
+
+def iter_urlset(entries):
+    """(абсолютний URL, lastmod) → рядки XML urlset"""
+    yield XML_HEADER + URLSET_OPEN
+    for loc, lastmod in entries:
+        yield _url(loc, lastmod)
+    yield '</urlset>\n'
+
+
+def iter_index(entries):
+    """(абсолютний URL файлу, lastmod) → рядки XML sitemapindex"""
+    yield XML_HEADER + INDEX_OPEN
+    for loc, lastmod in entries:
+        lastmod = f'<lastmod>{lastmod}</lastmod>' if lastmod else ''
+        yield f'<sitemap><loc>{escape(loc)}</loc>{lastmod}</sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def write_file(path, chunks, buffer_size=64 * 1024):
+    """Пише рядки у файл порціями; файл замінюється атомарно"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        parts, size = [], 0
+        for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= buffer_size:
+                f.write(''.join(parts))
+                parts, size = [], 0
+        f.write(''.join(parts))
+    os.replace(tmp, path)
+
+
+# --- Дані ---
+
+def product_queryset():
+    return Product.objects.filter(is_available=True)
+
+
+def shard_fingerprints(shard_size):
+    """{номер частини: (відбиток, lastmod)} одним GROUP BY-запитом"""
+    rows = (
+        product_queryset()
+        .annotate(shard=F('id') / shard_size)
+        .order_by()
+        .values('shard')
+        .annotate(count=Count('id'), id_sum=Sum('id'), last=Max('updated_at'))
+        .values_list('shard', 'count', 'id_sum', 'last')
+    )
+    return {
+        # Відбиток — з мікросекундами: зміна в ту ж секунду теж помітна
+        shard: (f'{count}:{id_sum}:{last.isoformat() if last else None}', w3c_datetime(last))
+        for shard, count, id_sum, last in rows
+    }
+
+
+def iter_product_entries(shard, shard_size, base_url, chunk_size=5000):
+    build_url = product_url_builder()
+    rows = (
+        product_queryset()
+        .filter(id__gte=shard * shard_size, id__lt=(shard + 1) * shard_size)
+        .order_by('id')
+        .values_list('id', 'slug', 'updated_at')
+        .iterator(chunk_size=chunk_size)
+    )
+    for product_id, slug, updated_at in rows:
+        yield base_url + build_url(product_id, slug), w3c_datetime(updated_at)
+
+
+def category_entries(base_url):
+    """Головна і активні категорії; lastmod — найпізніша зміна їх товарів"""
+    last = dict(
+        product_queryset().order_by().values('category_id')
+        .annotate(last=Max('updated_at')).values_list('category_id', 'last')
+    )
+    categories = Category.objects.filter(is_active=True).order_by('id').only('id', 'slug')
+    entries = [(base_url + reverse('main:product_list'), w3c_datetime(max(last.values(), default=None)))]
+    entries += [
+        (base_url + category.get_absolute_url(), w3c_datetime(last.get(category.id)))
+        for category in categories
+    ]
+    return entries
+
+
+# --- Генерація ---
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def generate(force=False):
+    """
+    Оновлює файли sitemap. Повертає {'written': [...], 'unchanged': N, 'removed': [...]}.
+    """
+    root = get_root()
+    os.makedirs(root, exist_ok=True)
+    base_url = get_base_url()
+    shard_size = get_shard_size()
+    signature = repr((FORMAT_VERSION, base_url, shard_size))
+
+    manifest = load_manifest(root)
+    if manifest.get('signature') != signature:
+        force = True
+    previous = {} if force else manifest.get('files', {})
+    files = {}
+    result = {'written': [], 'unchanged': 0, 'removed': []}
+
+    def update(name, fingerprint, chunks):
+        files[name] = fingerprint
+        if previous.get(name) == fingerprint and os.path.exists(os.path.join(root, name)):
+            result['unchanged'] += 1
+            return
+        write_file(os.path.join(root, name), chunks())
+        result['written'].append(name)
+
+    categories = category_entries(base_url)
+    update(
+        CATEGORIES_NAME,
+        hashlib.sha1(repr(categories).encode()).hexdigest(),
+        lambda: iter_urlset(categories),
+    )
+    index = [(f'{base_url}/{CATEGORIES_NAME}', max((m for _, m in categories if m), default=None))]
+
+    for shard, (fingerprint, lastmod) in sorted(shard_fingerprints(shard_size).items()):
+        name = SHARD_NAME % shard
+        update(name, fingerprint, lambda: iter_urlset(iter_product_entries(shard, shard_size, base_url)))
+        index.append((f'{base_url}/{name}', lastmod))
+
+    # Частини, в яких не лишилось товарів
+    for name in manifest.get('files', {}).keys() - files.keys():
+        try:
+            os.remove(os.path.join(root, name))
+        except FileNotFoundError:
+            pass
+        result['removed'].append(name)
+
+    if result['written'] or result['removed'] or not os.path.exists(os.path.join(root, INDEX_NAME)):
+        write_file(os.path.join(root, INDEX_NAME), iter_index(index))
+    write_file(
+        os.path.join(root, MANIFEST_NAME),
+        iter([json.dumps({'signature': signature, 'files': files}, indent=1)]),
+    )
+    return result
+
+
+def file_path(name):
+    """Шлях до файлу sitemap за ім'ям або None (лише файли, створені generate())"""
+    if name != INDEX_NAME and name != CATEGORIES_NAME and not _is_shard_name(name):
+        return None
+    path = os.path.join(get_root(), name)
+    return path if os.path.exists(path) else None
+
+
+def _is_shard_name(name):
+    prefix, suffix = SHARD_NAME.split('%d')
+    number = name[len(prefix):-len(suffix)] if name.startswith(prefix) and name.endswith(suffix) else ''
+    return number.isdigit()
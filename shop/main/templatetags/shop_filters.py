@@ -1,6 +1,6 @@
 from django import template
 from django.utils import timezone
-from markdownx.utils import markdownify
+from main import markdown_cache
 from django.utils.safestring import mark_safe
 register = template.Library()
 
@@ -64,10 +64,10 @@ def time_ago(date):
     
 @register.filter(name='markdown')
 def markdown_format(text):
-    """Конвертує Markdown текст у HTML"""
+    """Конвертує Markdown текст у HTML (кешується за хешем вмісту)"""
     if not text:
         return ""
-    return mark_safe(markdownify(text))
+    return mark_safe(markdown_cache.render_cached(text))
 
 
 @register.filter
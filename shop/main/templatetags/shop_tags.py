@@ -1,14 +1,13 @@
 from django import template
+from main import cards, counts, popularity, thumbnails
 from main.models import Product
 
 register = template.Library()
 
 @register.simple_tag
 def get_products_count(category=None):
-    """Повертає кількість товарів у категорії"""
-    if category:
-        return Product.objects.filter(category=category, is_available=True).count()
-    return Product.objects.filter(is_available=True).count()
+    """Повертає кількість товарів у категорії (з матеріалізованих лічильників)"""
+    return counts.get_count(category or None)
 
 @register.simple_tag
 def calculate_total(price, quantity):
@@ -18,6 +17,11 @@ def calculate_total(price, quantity):
     except (ValueError, TypeError):
         return 0
 
+@register.simple_tag
+def responsive_image(obj, preset, **attrs):
+    """Зображення obj зі зменшеними копіями (WebP + srcset) розміру preset, див. main/thumbnails.py"""
+    return thumbnails.responsive_image(obj, preset, **attrs)
+
 @register.simple_tag(takes_context=True)
 def user_greeting(context):
     """Повертає привітання на основі контексту"""
@@ -30,16 +34,17 @@ def user_greeting(context):
 
 @register.inclusion_tag('main/components/product_card.html')
 def show_product_card(product):
-    """Відображає картку товару (без знижок)"""
+    """Відображає картку товару (ProductCard з main.cards або Product)"""
+    if isinstance(product, Product):
+        product = cards.load_cards([product])[0]
     return {
         'product': product,
     }
 
 @register.inclusion_tag('main/components/popular_products.html')
 def show_popular_products(count=4):
-    """Відображає список популярних товарів"""
-    products = Product.objects.filter(is_available=True).order_by('-views')[:count]
-    return {'popular_products': products}
+    """Відображає список популярних товарів (з рейтингу top-K)"""
+    return {'popular_products': cards.load_cards(popularity.popular_products(count))}
 
 
 @register.inclusion_tag('main/components/star_rating_widget.html')
@@ -1,3 +1,1354 @@
-from django.test import TestCase
+import csv
+import gzip
+import heapq
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import QuerySet
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from discounts.models import Discount
+from discounts.scheduler import scheduler
+from reviews.models import Review
+
+from . import (
+    autocomplete, catalog_export, catalog_import, checks, counts, facets, markdown_cache, page_cache,
+    popularity, recommendations, search, sitemap, thumbnails, view_counter,
+)
+from .cards import load_cards
+from .categories import get_active_categories
+from .models import Category, FacetBitmap, Product, ProductCount, ProductCoView, ProductRecommendation
+from .cache import get_version
+from .signals import build_missing_facets
+from .pagination import CursorPaginator
+from .view_counter import ViewCountBuffer
+
+
+class IsolatedViewCounterMixin:
+    """Перегляди з тестових запитів не скидаються в БД посеред тесту (view_counter.isolated)"""
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(view_counter.isolated())
+
+
+class TestCacheIsolationTests(SimpleTestCase):
+    def test_tests_do_not_touch_the_shared_cache(self):
+        location = os.path.realpath(settings.CACHES['default']['LOCATION'])
+        self.assertNotEqual(location, os.path.realpath(settings.BASE_DIR / 'cache'))
+        self.assertTrue(location.startswith(os.path.realpath(tempfile.gettempdir())))
+
+
+class ViewCountBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Тест', slug='test')
+        cls.products = [
+            Product.objects.create(
+                name=f'Товар {i}', slug=f'product-{i}', description='опис',
+                price=100, category=cls.category, image='products/test.png',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.buffer = ViewCountBuffer(flush_interval=3600, max_pending=100)
+        # Без рейтингу в кеші скидання не читає оцінки популярності
+        cache.delete(popularity.LEADERBOARD_KEY)
+
+    def views(self, product):
+        product.refresh_from_db(fields=['views'])
+        return product.views
+
+    def test_record_is_buffered_until_flush(self):
+        product = self.products[0]
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.buffer.record(product.id)
+        self.assertEqual(self.buffer.pending(product.id), 5)
+        self.assertEqual(self.views(product), 0)
+
+        self.buffer.flush()
+        self.assertEqual(self.views(product), 5)
+        self.assertEqual(self.buffer.pending(product.id), 0)
+
+    def test_flush_issues_one_update_per_distinct_delta(self):
+        a, b, c = self.products
+        self.buffer.record(a.id, 2)
+        self.buffer.record(b.id, 2)
+        self.buffer.record(c.id, 7)
+        with self.assertNumQueries(4):  # SAVEPOINT, 2 × UPDATE, RELEASE
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual([self.views(p) for p in self.products], [2, 2, 7])
+
+    def test_max_pending_triggers_flush(self):
+        buffer = ViewCountBuffer(flush_interval=3600, max_pending=2)
+        buffer.record(self.products[0].id)
+        self.assertEqual(buffer.flush_if_due(), 0)
+        buffer.record(self.products[1].id)
+        self.assertEqual(self.views(self.products[0]), 0)
+        self.assertEqual(buffer.flush_if_due(), 2)
+        self.assertEqual(self.views(self.products[0]), 1)
+        self.assertEqual(buffer.pending(self.products[0].id), 0)
+
+    def test_buffer_is_flushed_after_response(self):
+        product = self.products[0]
+        with mock.patch.object(view_counter, 'buffer', ViewCountBuffer(flush_interval=0)):
+            self.client.get(product.get_absolute_url())
+        self.assertEqual(self.views(product), 1)
+
+    def test_isolated_buffer_is_discarded(self):
+        product = self.products[0]
+        with view_counter.isolated():
+            self.client.get(product.get_absolute_url())
+            self.assertEqual(view_counter.pending_views(product.id), 1)
+        self.assertEqual(view_counter.pending_views(product.id), 0)
+        self.assertEqual(self.views(product), 0)
+
+    def test_failed_flush_keeps_deltas(self):
+        product = self.products[0]
+        self.buffer.record(product.id, 3)
+        with mock.patch.object(QuerySet, 'update', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError), self.assertLogs('main.view_counter', 'ERROR'):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending(product.id), 3)
+        self.assertEqual(self.views(product), 0)
+
+        self.buffer.record(product.id)
+        self.buffer.flush()
+        self.assertEqual(self.views(product), 4)
+
+    def test_concurrent_records_are_not_lost(self):
+        product = self.products[0]
+
+        def worker():
+            for _ in range(500):
+                self.buffer.record(product.id)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.buffer.flush()
+        self.assertEqual(self.views(product), 4000)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_detail_page_shows_pending_views(self):
+        product = self.products[0]
+        Product.objects.filter(id=product.id).update(views=10)
+        with mock.patch.object(view_counter, 'buffer', self.buffer):
+            self.client.get(product.get_absolute_url())
+            response = self.client.get(product.get_absolute_url())
+        self.assertEqual(response.context['product'].views, 12)
+        self.assertEqual(self.views(product), 10)
+
+
+class DiscountResolverTests(IsolatedViewCounterMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Тест', slug='test')
+        cls.product = Product.objects.create(
+            name='Товар', slug='product', description='опис',
+            price=Decimal('200.00'), category=category, image='products/test.png',
+        )
+        now = timezone.now()
+        Discount.objects.create(
+            product=cls.product, discount_type='percentage', value=10,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        Discount.objects.create(
+            product=cls.product, discount_type='fixed', value=50, min_quantity=3,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        Discount.objects.create(
+            product=cls.product, discount_type='percentage', value=90, is_active=False,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+
+    def discount_queries(self, queries):
+        return [q for q in queries if 'discounts_discount' in q['sql']]
+
+    def test_accessors_share_one_query(self):
+        product = Product.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(product.has_active_discount())
+            self.assertEqual(product.get_discount_percentage(), Decimal('10'))
+            self.assertEqual(product.get_active_discount().discount_type, 'percentage')
+            self.assertEqual(product.get_discounted_price(), Decimal('180.00'))
+            self.assertEqual(product.get_active_discount(quantity=3).discount_type, 'fixed')
+            self.assertEqual(product.get_discounted_price(quantity=3), Decimal('450.00'))
+
+    def test_prefetched_discounts_are_reused(self):
+        product = Product.objects.prefetch_related('discounts').get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(product.get_discounted_price(), Decimal('180.00'))
+            render_to_string('discounts/discount_badge.html', {'product': product})
+
+    def test_detail_page_issues_one_discount_query(self):
+        scheduler.run_due()  # часова шкала знижок завантажується раз на вікно
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.product.get_absolute_url())
+        self.assertContains(response, '180.00')
+        self.assertEqual(len(self.discount_queries(ctx.captured_queries)), 1)
+
+
+class ProductCardLoaderTests(IsolatedViewCounterMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Тест', slug='test')
+        cls.other_category = Category.objects.create(name='Інша', slug='other')
+        now = timezone.now()
+        cls.products = []
+        for i in range(12):
+            product = Product.objects.create(
+                name=f'Товар {i}', slug=f'product-{i}', description='опис',
+                price=Decimal('100.00'), image='products/test.png',
+                category=cls.category if i % 2 else cls.other_category,
+            )
+            Discount.objects.create(
+                product=product, discount_type='percentage', value=10,
+                start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+            )
+            cls.products.append(product)
+
+    def setUp(self):
+        super().setUp()
+        # Кешовані категорії, лічильники, шкала знижок і фасетні множини не залежать від розміру сторінки
+        get_active_categories()
+        counts.get_counts()
+        scheduler.run_due()
+        facets.get_index()
+
+    def test_cards_are_loaded_in_one_query(self):
+        products = list(Product.objects.all())
+        with self.assertNumQueries(1):
+            cards = load_cards(products)
+        card = cards[0]
+        self.assertEqual(card.url, products[0].get_absolute_url())
+        self.assertEqual(card.category_name, products[0].category.name)
+        self.assertEqual(card.get_discount_label(), '-10%')
+        self.assertEqual(card.effective_price, Decimal('90.00'))
+
+    def test_product_list_queries_do_not_grow_with_page_size(self):
+        def count_queries(query, expected):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/', {'q': query})
+            self.assertEqual(len(response.context['products']), expected)
+            return len(ctx.captured_queries)
+
+        # «Товар 1» знаходить 1, 10, 11; «Товар» — повну сторінку з 6 карток
+        self.assertEqual(count_queries('Товар 1', 3), count_queries('Товар', 6))
+
+    def test_popular_products_tag(self):
+        popularity.leaderboard.rebuild()
+        template = Template('{% load shop_tags %}{% show_popular_products 8 %}')
+        with self.assertNumQueries(2):  # товари + знижки
+            html = template.render(Context())
+        self.assertEqual(html.count('-10%'), 8)
+
+    def test_detail_related_products(self):
+        product = self.products[1]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(product.get_absolute_url())
+        related = response.context['related_products']
+        self.assertEqual(len(related), 4)
+        self.assertTrue(all(card.category_name == 'Тест' for card in related))
+        # Схожі товари: товари категорії + одна вибірка знижок для всіх карток
+        related_queries = [
+            q for q in ctx.captured_queries
+            if 'discounts_discount' in q['sql'] and 'IN (' in q['sql']
+        ]
+        self.assertEqual(len(related_queries), 1)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Електроніка', slug='electronics')
+        cls.laptop = Product.objects.create(
+            name='Ноутбук Lenovo', slug='laptop', description='потужний',
+            price=100, category=cls.category, image='products/test.png',
+        )
+        cls.mouse = Product.objects.create(
+            name='Миша', slug='mouse', description='для ноутбука',
+            price=100, category=cls.category, image='products/test.png',
+        )
+        cls.kettle = Product.objects.create(
+            name='Чайник', slug='kettle', description='кухня',
+            price=100, category=cls.category, image='products/test.png',
+        )
+
+    def ids(self, text):
+        return [p.id for p in search.search(Product.objects.all(), text).order_by('search_rank')]
+
+    def test_prefix_match_ranks_name_above_description(self):
+        self.assertEqual(self.ids('ноут'), [self.laptop.id, self.mouse.id])
+
+    def test_index_follows_category_rename_and_delete(self):
+        self.assertEqual(len(self.ids('електрон')), 3)
+        self.category.name = 'Кухня'
+        self.category.save()
+        self.assertEqual(self.ids('електрон'), [])
+        self.kettle.delete()
+        self.assertEqual(len(self.ids('кухня')), 2)
+        self.assertEqual(search.rebuild_index(), 2)
+
+    def test_fts_syntax_in_query_is_escaped(self):
+        self.assertEqual(search.build_match_query('"(* ноут'), '"ноут"*')
+        response = self.client.get('/', {'q': '"(*'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_list_orders_by_relevance(self):
+        response = self.client.get('/', {'q': 'ноут'})
+        self.assertEqual([p.id for p in response.context['products']], [self.laptop.id, self.mouse.id])
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Тест', slug='test')
+        for i in range(20):
+            # Повтори цін, назв і переглядів перевіряють тайбрейкер за id
+            Product.objects.create(
+                name=f'Товар {i % 5}', slug=f'product-{i}', description='опис',
+                price=i % 7, views=i % 3, category=category, image='products/test.png',
+            )
+
+    def test_cursor_walks_every_ordering_both_ways(self):
+        for ordering in ('-created_at', 'created_at', '-views', 'price', '-price', 'name'):
+            direction = '-' if ordering.startswith('-') else ''
+            expected = list(Product.objects.order_by(ordering, f'{direction}id'))
+            paginator = CursorPaginator(Product.objects.all(), 6, ordering)
+            page = paginator.page()
+            seen = list(page)
+            while page.has_next():
+                page = paginator.page(page.next_cursor)
+                seen += list(page)
+            self.assertEqual(seen, expected, ordering)
+
+            back = list(page)
+            while page.has_previous():
+                page = paginator.page(page.previous_cursor)
+                back = list(page) + back
+            self.assertEqual(back, expected, ordering)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, sum('COUNT(' in q['sql'] for q in ctx.captured_queries)
+
+    def test_fast_and_cursor_modes_skip_count(self):
+        _, page_counts = self.count_queries('/?sort=price_low&page=2')
+        with override_settings(CATALOG_PAGINATION='fast'):
+            response, fast_counts = self.count_queries('/?sort=price_low&page=4')
+        self.assertEqual(fast_counts, page_counts - 1)
+        self.assertEqual(response.context['products'].number, 4)
+        self.assertFalse(response.context['products'].has_next())
+        with override_settings(CATALOG_PAGINATION='cursor'):
+            response, cursor_counts = self.count_queries('/?sort=price_low')
+        self.assertEqual(cursor_counts, fast_counts)
+        self.assertEqual(response.context['pagination_mode'], 'cursor')
+
+    def test_cursor_links_and_invalid_cursor(self):
+        with override_settings(CATALOG_PAGINATION='cursor'):
+            response = self.client.get('/', {'sort': 'price_low'})
+            page = response.context['products']
+            response = self.client.get('/', {'sort': 'price_low', 'cursor': page.next_cursor})
+            self.assertTrue(response.context['products'].has_previous())
+            self.assertEqual(self.client.get('/', {'cursor': 'garbage'}).status_code, 200)
+        with override_settings(CATALOG_PAGINATION='fast'):
+            response = self.client.get('/', {'page': 99})
+            self.assertEqual(response.context['products'].number, 1)
+
+
+class CategoryCacheTests(IsolatedViewCounterMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.category = Category.objects.create(name='Кат1', slug='k1')
+
+    def category_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        return response, [q['sql'] for q in ctx.captured_queries if 'main_category' in q['sql']]
+
+    def test_warm_page_runs_no_category_queries(self):
+        response, _ = self.category_queries('/login/')
+        self.assertContains(response, 'Кат1')
+        response, queries = self.category_queries('/login/')
+        self.assertContains(response, 'Кат1')
+        self.assertEqual(queries, [])
+
+    def test_category_change_bumps_version(self):
+        self.client.get('/login/')
+        self.category.name = 'Кат2'
+        self.category.save()
+        response = self.client.get('/login/')
+        self.assertContains(response, 'Кат2')
+        self.assertNotContains(response, 'Кат1')
+
+        Category.objects.get(pk=self.category.pk).delete()
+        self.assertEqual(get_active_categories(), [])
+
+    def test_current_category_is_highlighted(self):
+        response = self.client.get('/category/k1/')
+        self.assertContains(response, 'bg-blue-100 text-blue-800')
+
+
+class ProductCountTests(IsolatedViewCounterMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.a = Category.objects.create(name='A', slug='a')
+        self.b = Category.objects.create(name='B', slug='b')
+
+    def counts(self):
+        return counts.get_count(), counts.get_count(self.a), counts.get_count(self.b.pk)
+
+    def test_counts_follow_product_changes(self):
+        product = Product.objects.create(name='x', slug='x', category=self.a, price=Decimal('10'))
+        hidden = Product.objects.create(
+            name='y', slug='y', category=self.a, price=Decimal('10'), is_available=False,
+        )
+        self.assertEqual(self.counts(), (1, 1, 0))
+        product.category = self.b
+        product.save()
+        self.assertEqual(self.counts(), (1, 0, 1))
+        hidden.is_available = True
+        hidden.save()
+        self.assertEqual(self.counts(), (2, 1, 1))
+        # Стан товару невідомий (поле не завантажене) — лічильники перераховуються
+        partial = Product.objects.only('id', 'name').get(pk=hidden.pk)
+        partial.name = 'z'
+        partial.save()
+        self.assertEqual(self.counts(), (2, 1, 1))
+        Product.objects.get(pk=hidden.pk).delete()
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+        b_id = self.b.pk
+        self.b.delete()
+        self.assertFalse(ProductCount.objects.filter(pk=b_id).exists())
+        self.assertEqual(counts.get_count(), 0)
+        counts.rebuild_counts()
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_counts_are_read_in_one_query(self):
+        Product.objects.create(name='x', slug='x', category=self.a, price=Decimal('10'))
+        counts.rebuild_counts()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.counts(), (1, 1, 0))
+        with self.assertNumQueries(0):
+            self.counts()
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='A', slug='a')
+        self.products = [
+            Product.objects.create(name=f'x{i}', slug=f'x{i}', category=category, price=1)
+            for i in range(4)
+        ]
+        self.buffer = ViewCountBuffer(flush_interval=3600)
+        self.now = timezone.now()
+
+    def view(self, product, count=1, days_ago=0):
+        when = self.now - timedelta(days=days_ago)
+        with mock.patch('main.view_counter.timezone.now', return_value=when):
+            self.buffer.record(product.id, count)
+            self.buffer.flush()
+
+    def popular_ids(self, count):
+        return [p.id for p in popularity.popular_products(count)]
+
+    def test_views_decay_with_half_life(self):
+        a, b = self.products[:2]
+        self.view(a, 4, days_ago=popularity.half_life() / 86400)
+        self.view(b, 1)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertAlmostEqual(popularity.decayed_views(a.popularity, self.now), 2, places=3)
+        self.assertAlmostEqual(popularity.decayed_views(b.popularity, self.now), 1, places=3)
+        # Старий хіт поступово опускається під нові перегляди
+        self.view(b, 2)
+        b.refresh_from_db()
+        self.assertGreater(b.popularity, a.popularity)
+
+    def test_leaderboard_merges_flushed_scores(self):
+        a, b, c, d = self.products
+        with mock.patch.object(popularity, 'leaderboard', popularity.Leaderboard(size=2)):
+            self.view(a, 100, days_ago=60)
+            self.assertEqual(self.popular_ids(1), [a.id])
+            self.view(b, 5)
+            self.view(c, 1)
+            # Рейтинг у кеші оновлено злиттям, без перебудови з БД
+            self.assertEqual([i for _s, i in cache.get(popularity.LEADERBOARD_KEY)], [b.id, c.id])
+            self.assertEqual(self.popular_ids(3), [b.id, c.id])
+
+            b.is_available = False
+            b.save()
+            self.view(b)
+            self.view(d, 1, days_ago=1)
+            self.assertEqual(self.popular_ids(2), [c.id, d.id])
+            with self.assertNumQueries(1):
+                popularity.popular_products(2)
+
+            popularity.leaderboard.rebuild()
+            self.assertEqual(self.popular_ids(2), [c.id, d.id])
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class RecommendationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='A', slug='a')
+        items = [
+            ('червоний чайник', 'сталь'), ('червоний чайник скло', 'скло'),
+            ('синя лампа', 'дерево'), ('лампа настільна', 'дерево'), ('рюкзак', 'шкіра'),
+        ]
+        items += [(f'інше{i} штука', 'щось') for i in range(35)]
+        self.products = [
+            Product.objects.create(
+                name=name, slug=f's{i}', description=description, category=category, price=1, image='x.png',
+            )
+            for i, (name, description) in enumerate(items)
+        ]
+        self.buffer = ViewCountBuffer(flush_interval=3600)
+        self.enterContext(mock.patch.object(view_counter, 'buffer', self.buffer))
+
+    def test_co_views_and_text_similarity(self):
+        kettle, glass_kettle, lamp, desk_lamp, backpack = self.products[:5]
+        # Останні перегляди з cookie дають пару спільного перегляду
+        for product in (kettle, backpack, kettle):
+            self.client.get(product.get_absolute_url())
+        self.buffer.flush()
+        self.assertEqual(
+            list(ProductCoView.objects.values_list('product_id', 'other_id', 'count')),
+            [(kettle.id, backpack.id, 1)],
+        )
+        self.assertEqual(len(recommendations.stale_product_ids()), len(self.products))
+
+        recommendations.build_recommendations()
+        self.assertEqual(recommendations.stale_product_ids(), [])
+        related = ProductRecommendation.objects.get(pk=kettle.pk).related_ids
+        self.assertEqual(set(related[:2]), {backpack.id, glass_kettle.id})
+
+        response = self.client.get(kettle.get_absolute_url())
+        self.assertEqual([card.id for card in response.context['related_products']][:2], related[:2])
+
+        self.buffer.record(lamp.id, co_viewed=[desk_lamp.id])
+        self.buffer.flush()
+        self.assertEqual(sorted(recommendations.stale_product_ids()), [lamp.id, desk_lamp.id])
+
+
+class MarkdownCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='A', slug='a')
+        self.product = Product.objects.create(
+            name='x', slug='x', category=category, price=1, detailed_description='**жирний**',
+        )
+
+    def test_html_is_rendered_on_save(self):
+        self.assertIn('<strong>жирний</strong>', self.product.detailed_description_html)
+        with mock.patch.object(markdown_cache, 'markdownify') as markdownify:
+            html = self.product.get_detailed_description_html()
+        markdownify.assert_not_called()
+        self.assertIn('<strong>жирний</strong>', html)
+
+    def test_stale_html_is_rendered_once_through_cache(self):
+        Product.objects.filter(pk=self.product.pk).update(detailed_description='*курсив*')
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertIn('<em>курсив</em>', product.get_detailed_description_html())
+        with mock.patch.object(markdown_cache, 'markdownify') as markdownify:
+            product.get_detailed_description_html()
+        markdownify.assert_not_called()
+
+        self.assertEqual(markdown_cache.rerender_all(), 1)
+        product.refresh_from_db()
+        self.assertTrue(markdown_cache.is_current(product))
+        self.assertEqual(markdown_cache.rerender_all(), 0)
+        self.assertEqual(markdown_cache.rerender_all(force=True), 1)
+
+    def test_renderer_settings_change_hash(self):
+        with override_settings(MARKDOWNX_MARKDOWN_EXTENSIONS=['markdown.extensions.extra']):
+            self.assertFalse(markdown_cache.is_current(self.product))
+        self.assertTrue(markdown_cache.is_current(self.product))
+
+
+class PostMigrateTests(TestCase):
+    def test_missing_facets_are_built(self):
+        category = Category.objects.create(name='A', slug='a')
+        Product.objects.create(name='x', slug='x', category=category, price=1)
+        FacetBitmap.objects.all().delete()
+        build_missing_facets(sender=apps.get_app_config('main'))
+        self.assertTrue(FacetBitmap.objects.filter(key=facets.ALL).exists())
+
+
+class PageCacheTests(IsolatedViewCounterMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        category = Category.objects.create(name='Кат', slug='kat')
+        self.product = Product.objects.create(
+            name='Товар', slug='t', description='d', price=Decimal('100'), category=category, image='x.png',
+        )
+        self.other = Product.objects.create(
+            name='Інший', slug='i', description='d', price=Decimal('50'), category=category, image='x.png',
+        )
+
+    def outcome(self, url):
+        return self.client.get(url).get('X-Page-Cache')
+
+    def test_list_is_invalidated_by_product_and_discount_changes(self):
+        first = self.client.get('/')
+        second = self.client.get('/')
+        self.assertEqual((first['X-Page-Cache'], second['X-Page-Cache']), ('miss', 'hit'))
+        self.assertEqual(first.content, second.content)
+        # Порожні параметри не створюють окремого ключа
+        self.assertEqual(self.outcome('/?page=&sort='), 'hit')
+
+        self.other.name = 'Змінений'
+        self.other.save()
+        response = self.client.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Змінений')
+        self.assertEqual(self.outcome('/'), 'hit')
+
+        now = timezone.now()
+        Discount.objects.create(
+            product=self.product, discount_type='percentage', value=10,
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(days=1),
+        )
+        self.assertEqual(self.outcome('/'), 'miss')
+        self.assertGreater(page_cache.get_stats()['product_list']['hit'], 0)
+
+    def test_detail_is_invalidated_by_review(self):
+        url = self.product.get_absolute_url()
+        self.assertEqual(self.outcome(url), 'miss')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        # Перегляд враховується і при видачі з кешу, CSRF-токен підставляється заново
+        self.assertEqual(view_counter.buffer.pending(self.product.id), 2)
+        self.assertNotContains(response, page_cache.CSRF_PLACEHOLDER)
+
+        user = User.objects.create_user('u', password='x')
+        Review.objects.create(product=self.product, author=user, rating=5, title='t', content='ok')
+        self.assertEqual(self.outcome(url), 'miss')
+
+    def test_signed_in_users_bypass_cache(self):
+        User.objects.create_user('u', password='x')
+        self.client.login(username='u', password='x')
+        self.client.get('/')
+        self.assertIsNone(self.outcome('/'))
+
+    def test_entry_expires_at_discount_boundary(self):
+        now = timezone.now()
+        Discount.objects.create(
+            product=self.product, discount_type='percentage', value=10,
+            start_date=now + timedelta(seconds=30), end_date=now + timedelta(days=1),
+        )
+        self.assertLess(page_cache.page_expires() - now.timestamp(), 60)
+
+    def test_stats_for_staff(self):
+        User.objects.create_user('s', password='x', is_staff=True)
+        self.client.get('/')
+        self.client.login(username='s', password='x')
+        response = self.client.get('/page-cache/stats/')
+        self.assertEqual(response.json()['views']['product_list']['miss'], 1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_memory_cache_is_refused(self):
+        self.assertFalse(page_cache.is_enabled())
+        self.assertIsNone(self.outcome('/'))
+        self.assertEqual([w.id for w in checks.check_shared_cache(None)], ['main.W001'])
+
+
+def png_bytes(size=(40, 30)):
+    from io import BytesIO
+
+    from PIL import Image
+
+    output = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(output, 'PNG')
+    return output.getvalue()
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root, THUMBNAIL_ASYNC=False, THUMBNAIL_SIZES={'card': 16, 'detail': 32},
+        ))
+        self.category = Category.objects.create(name='A', slug='a')
+
+    def create_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name='x', slug='x', category=self.category, price=1,
+                image=SimpleUploadedFile('photo.png', png_bytes()),
+            )
+
+    def test_variants_are_generated_after_save(self):
+        product = self.create_product()
+        product.refresh_from_db()
+        self.assertTrue(thumbnails.is_current(product.image_hash))
+        html = thumbnails.responsive_image(product, 'card')
+        self.assertIn('type="image/webp"', html)
+        for size in (16, 32):
+            name = thumbnails.variant_name(product.image.name, product.image_hash, size, 'webp')
+            self.assertIn(name, html)
+            self.assertTrue(default_storage.exists(name))
+
+    def test_size_change_falls_back_to_original_until_backfill(self):
+        product = self.create_product()
+        product.refresh_from_db()
+        old_hash = product.image_hash
+        with override_settings(THUMBNAIL_SIZES={'card': 20, 'detail': 32}):
+            self.assertFalse(thumbnails.is_current(old_hash))
+            html = thumbnails.responsive_image(product, 'card')
+            self.assertNotIn('<picture>', html)
+            self.assertIn(product.image.url, html)
+
+            self.assertEqual(thumbnails.backfill(workers=1), (1, 0))
+            product.refresh_from_db()
+            self.assertNotEqual(product.image_hash, old_hash)
+            html = thumbnails.responsive_image(product, 'card')
+            name = thumbnails.variant_name(product.image.name, product.image_hash, 40, 'png')
+            self.assertIn(name, html)
+            self.assertTrue(default_storage.exists(name))
+            self.assertEqual(thumbnails.backfill(workers=1), (0, 0))
+
+
+class FacetTests(IsolatedViewCounterMixin, TestCase):
+    def snapshot(self):
+        return {
+            row.key: facets.from_bytes(row.bits)
+            for row in FacetBitmap.objects.all() if facets.from_bytes(row.bits)
+        }
+
+    def assertConsistent(self):
+        live = self.snapshot()
+        facets.rebuild()
+        self.assertEqual(live, self.snapshot())
+
+    def create_catalog(self):
+        rnd = random.Random(1)
+        self.categories = [Category.objects.create(name=f'C{i}', slug=f'c{i}') for i in range(3)]
+        return [
+            Product.objects.create(
+                name=f'P{i}', slug=f'p{i}', description='d', price=Decimal(rnd.choice([100, 700, 3000, 50000])),
+                category=rnd.choice(self.categories), image='x.png', featured=rnd.random() < .3,
+                is_available=rnd.random() < .8,
+            )
+            for i in range(40)
+        ]
+
+    def test_incremental_updates_match_rebuild(self):
+        products = self.create_catalog()
+        self.assertConsistent()
+        products[0].price = Decimal('800')
+        products[0].save()
+        products[1].category = self.categories[2]
+        products[1].save()
+        products[2].is_available = not products[2].is_available
+        products[2].save()
+        products[3].delete()
+        partial = Product.objects.only('id', 'name').get(pk=products[4].pk)
+        partial.name = 'x'
+        partial.save()
+        Product.objects.get(pk=products[5].pk).delete()
+        self.assertConsistent()
+
+        now = timezone.now()
+        Discount.objects.create(
+            product=products[6], discount_type='percentage', value=50,
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(days=1),
+        )
+        user = User.objects.create_user('u')
+        Review.objects.create(product=products[7], author=user, rating=5, title='t', content='c')
+        self.assertConsistent()
+
+        index = facets.get_index()
+        selections = [{}, {'featured': '1'}, {'price': '500-1000', 'rating': '4'}, {'discount': '1'}]
+        for category in [None] + self.categories:
+            queryset = Product.objects.filter(is_available=True)
+            if category is not None:
+                queryset = queryset.filter(category=category)
+            for selected in selections:
+                counts = index.counts(index.base(category), selected)
+                for facet in facets.get_facets():
+                    others = {name: key for name, key in selected.items() if name != facet.name}
+                    for value in facet.values:
+                        expected = facets.filter_queryset(queryset, others).filter(value.q).count()
+                        self.assertEqual(counts[facet.name][value.key], expected)
+
+    def test_unchanged_membership_does_not_bump_version(self):
+        category = Category.objects.create(name='C', slug='c')
+        product = Product.objects.create(name='P', slug='p', price=100, category=category)
+        users = [User.objects.create_user(f'u{i}') for i in range(2)]
+        Review.objects.create(product=product, author=users[0], rating=5, title='t', content='c')
+        version = get_version(facets.FACETS_VERSION)
+        # Середній рейтинг 4.5 лишається вище порогу 4
+        Review.objects.create(product=product, author=users[1], rating=4, title='t', content='c')
+        facets.apply_changes({product.pk: (frozenset(), frozenset([facets.ALL]))})
+        self.assertEqual(get_version(facets.FACETS_VERSION), version)
+
+    def test_hinted_update_reads_only_relevant_rows(self):
+        self.create_catalog()
+        product = Product.objects.filter(is_available=True).first()
+        with CaptureQueriesContext(connection) as ctx:
+            facets.update_products([product.pk], facet_names=('rating',))
+        reads = [q['sql'] for q in ctx.captured_queries if 'main_facetbitmap' in q['sql']]
+        self.assertEqual(len(reads), 1)
+        self.assertIn('IN (', reads[0])
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_catalog_facets(self):
+        category = Category.objects.create(name='C', slug='c')
+        for i, price in enumerate([100, 700, 800, 3000]):
+            Product.objects.create(
+                name=f'Ноутбук {i}', slug=f'p{i}', description='d', price=Decimal(price),
+                category=category, image='x.png', featured=i == 1,
+            )
+        response = self.client.get('/', {'price': '500-1000'})
+        self.assertEqual(len(response.context['products']), 2)
+        price, _rating, _discount, featured = response.context['facets']
+        self.assertEqual([v['count'] for v in price['values']], [1, 2, 1, 0, 0])
+        self.assertEqual(featured['values'][0]['count'], 1)
+
+        response = self.client.get('/category/c/', {'q': 'ноутбук', 'max_price': '750', 'featured': '1'})
+        self.assertEqual(len(response.context['products']), 1)
+        self.assertEqual([v['count'] for v in response.context['facets'][0]['values']], [0, 1, 0, 0, 0])
+        response = self.client.get('/', {'price': 'bogus'})
+        self.assertEqual(len(response.context['products']), 4)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_search_bitmap_is_cached_per_catalog_version(self):
+        category = Category.objects.create(name='C', slug='c')
+        products = [
+            Product.objects.create(
+                name=f'Ноутбук {i}', slug=f'p{i}', description='d', price=Decimal(100 * (i + 1)),
+                category=category, image='x.png',
+            )
+            for i in range(3)
+        ]
+        params = {'q': 'ноутбук', 'max_price': '250'}
+        with mock.patch.object(facets, 'bits_from_ids', wraps=facets.bits_from_ids) as build:
+            self.client.get('/', params)
+            self.client.get('/', dict(params, sort='name', featured='1'))
+            self.assertEqual(build.call_count, 1)
+            products[2].price = Decimal('200')
+            products[2].save()
+            response = self.client.get('/', params)
+            self.assertEqual(build.call_count, 2)
+        self.assertEqual(len(response.context['products']), 3)
+
+    def test_loading_products_defers_state_snapshots(self):
+        products = self.create_catalog()
+        with mock.patch.object(facets, 'product_keys', wraps=facets.product_keys) as keys:
+            loaded = list(Product.objects.all())
+            load_cards(Product.objects.all()[:10])
+            self.assertEqual(keys.call_count, 0)
+            loaded[0].price = Decimal('800')
+            loaded[0].save()
+            # Старий стан і новий — по одному обчисленню
+            self.assertEqual(keys.call_count, 2)
+        self.assertConsistent()
+        self.assertEqual(len(loaded), len(products))
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def test_search_matches_brute_force(self):
+        rnd = random.Random(3)
+        words = ['ab', 'abc', 'abd', 'b', 'ba', 'чай', 'чайник', 'lenovo', 'леново', 'gugo']
+        entries = [
+            ('product', ' '.join(rnd.choice(words) for _ in range(rnd.randint(1, 3))), '', rnd.random())
+            for _ in range(3000)
+        ]
+        index = autocomplete.PrefixIndex(entries, limit=7, heavy=16)
+        for query in ['a', 'ab', 'abc', 'ab a', 'b', 'ba', 'ch', 'chai', 'chain', 'lenovo', 'len', 'huh', 'zz']:
+            prefix = autocomplete.normalize(query)
+            matches = [
+                i for i, entry in enumerate(entries)
+                if any(key.startswith(prefix) for key in autocomplete.word_suffixes(autocomplete.normalize(entry[1])))
+            ]
+            expected = heapq.nlargest(7, matches, key=lambda i: entries[i][3])
+            self.assertEqual(index.search(query), [entries[i] for i in expected], query)
+
+    def test_normalize(self):
+        self.assertEqual(autocomplete.normalize('  Ноутбук-LENOVO!  '), autocomplete.normalize('noutbuk lenovo'))
+        self.assertEqual(autocomplete.normalize('Самсунг'), autocomplete.normalize('samsung'))
+        self.assertEqual(autocomplete.normalize('Café'), 'cafe')
+
+
+@override_settings(AUTOCOMPLETE_ASYNC=False, AUTOCOMPLETE_REBUILD_INTERVAL=0)
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.dict(
+            autocomplete._state, index=None, versions=None, built_at=0.0, attempted_at=0.0, building=False,
+        ))
+        self.category = Category.objects.create(name='Ноутбуки', slug='nb')
+        self.product = Product.objects.create(
+            name='Ноутбук Lenovo', slug='a', description='d', price=Decimal(1), category=self.category,
+        )
+        Product.objects.create(
+            name='Noutbuk Asus', slug='b', description='d', price=Decimal(1), category=self.category,
+            is_available=False,
+        )
+
+    def suggest(self, query, **params):
+        return self.client.get('/search/autocomplete/', {'q': query, **params}).json()['results']
+
+    def wait_for_build(self):
+        for _ in range(500):
+            if not autocomplete._state['building']:
+                break
+            time.sleep(0.01)
+
+    def test_endpoint(self):
+        results = self.suggest('nout')
+        self.assertEqual([r['name'] for r in results], ['Ноутбуки', 'Ноутбук Lenovo'])
+        self.assertEqual(results[1]['url'], self.product.get_absolute_url())
+        self.assertEqual(self.suggest('леново', limit='x')[0]['type'], 'product')
+        self.assertEqual(self.client.get('/search/autocomplete/').json()['results'], [])
+
+    def test_only_listed_fields_invalidate_index(self):
+        version = get_version(autocomplete.AUTOCOMPLETE_VERSION)
+        self.product.price = Decimal(2)
+        self.product.views = 5
+        self.product.save()
+        self.assertEqual(get_version(autocomplete.AUTOCOMPLETE_VERSION), version)
+
+        self.product.name = 'Ноутбук Dell'
+        self.product.save()
+        self.assertNotEqual(get_version(autocomplete.AUTOCOMPLETE_VERSION), version)
+        self.assertEqual([r['name'] for r in self.suggest('ноутбук d')], ['Ноутбук Dell'])
+
+    @override_settings(AUTOCOMPLETE_ASYNC=True)
+    def test_index_is_built_in_background(self):
+        entries = [('product', 'Чайник', '/p/1/', 1.0)]
+        started = threading.Event()
+        release = threading.Event()
+
+        def load_entries():
+            started.set()
+            release.wait(5)
+            return entries
+
+        with mock.patch.object(autocomplete, 'load_entries', load_entries):
+            # Холодний старт: запит не чекає на побудову
+            self.assertIs(autocomplete.get_index(), autocomplete.EMPTY_INDEX)
+            self.assertTrue(started.wait(5))
+            self.assertIs(autocomplete.get_index(), autocomplete.EMPTY_INDEX)
+            release.set()
+            self.wait_for_build()
+        self.assertEqual(autocomplete.suggest('chai'), [{'type': 'product', 'name': 'Чайник', 'url': '/p/1/'}])
+
+    @override_settings(AUTOCOMPLETE_ASYNC=True, AUTOCOMPLETE_REBUILD_INTERVAL=60)
+    def test_failed_build_is_retried_after_interval(self):
+        load_entries = mock.Mock(side_effect=RuntimeError)
+        with mock.patch.object(autocomplete, 'load_entries', load_entries), \
+                self.assertLogs('main.autocomplete', 'WARNING'):
+            for _ in range(5):
+                self.assertIs(autocomplete.get_index(), autocomplete.EMPTY_INDEX)
+                self.wait_for_build()
+            self.assertEqual(load_entries.call_count, 1)
+
+            load_entries.side_effect = None
+            load_entries.return_value = []
+            autocomplete._state['attempted_at'] -= 61
+            autocomplete.get_index()
+            self.wait_for_build()
+        self.assertEqual(load_entries.call_count, 2)
+        self.assertIsNotNone(autocomplete._state['index'])
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class CatalogImportTests(IsolatedViewCounterMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=os.path.join(self.tmp, 'media')))
+
+    def write_csv(self, rows):
+        path = os.path.join(self.tmp, 'in.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=sorted({key for row in rows for key in row}))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command('import_catalog', *args, '--report-every', '0', stdout=out)
+        return out.getvalue()
+
+    def test_import_and_reimport_by_name(self):
+        with open(os.path.join(self.tmp, 'pic.png'), 'wb') as f:
+            f.write(png_bytes())
+        laptops = Category.objects.create(name='Ноутбуки', slug='laptops')
+        clash = Product.objects.create(
+            name='Інше', slug='noutbuk-lenovo', description='d', price=1, category=laptops,
+        )
+        path = self.write_csv([
+            dict(name='Ноутбук Lenovo', category='ноутбуки', price='25999,50', featured='так',
+                 detailed_description='# Опис'),
+            dict(name='Чайник Tefal', category='Нова категорія', price='1200', image='pic.png'),
+            dict(name='Bad', category='X', price='abc'),
+            dict(slug='missing'),
+            dict(name='No cat', price='1'),
+        ])
+        out = self.run_import(path, '--batch-size', '2')
+        self.assertIn('рядок 4', out)
+        self.assertIn('помилок 3', out)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+        laptop = Product.objects.get(name='Ноутбук Lenovo')
+        self.assertEqual(laptop.slug, 'noutbuk-lenovo-2')
+        self.assertEqual((laptop.price, laptop.effective_price), (Decimal('25999.50'), Decimal('25999.50')))
+        self.assertTrue(laptop.featured)
+        self.assertIn('<h1>', laptop.detailed_description_html)
+        self.assertEqual(laptop.category, laptops)
+        kettle = Product.objects.get(name='Чайник Tefal')
+        self.assertTrue(kettle.image.name.startswith('products/import/'))
+        self.assertTrue(kettle.image_hash)
+        self.assertEqual(kettle.category.slug, 'nova-katehoriia')
+        self.assertEqual(counts.get_count(laptops), 2)
+        self.assertEqual(list(search.search(Product.objects.all(), 'tefal').values_list('id', flat=True)), [kettle.id])
+        self.assertTrue(facets.get_index().get('featured:1') >> laptop.id & 1)
+
+        # Повторний імпорт з --match-by-name оновлює ті самі товари
+        now = timezone.now()
+        Discount.objects.create(
+            product=laptop, discount_type='percentage', value=10,
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(days=1),
+        )
+        path = self.write_csv([
+            dict(name='Ноутбук Lenovo', price='26999'),
+            dict(name='Ноутбук Lenovo', price='24999'),
+            dict(name='Чайник Tefal', price='1100'),
+        ])
+        out = self.run_import(path, '--match-by-name')
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertIn('оновлено 2', out)
+        self.assertEqual(Product.objects.get(pk=clash.pk).name, 'Інше')
+        self.assertEqual(Product.objects.get(pk=laptop.pk).effective_price, Decimal('22499.10'))
+
+    def test_derived_slugs_never_collide_without_match_by_name(self):
+        category = Category.objects.create(name='C', slug='c')
+        Product.objects.create(name='Чайник', slug='chainyk', price=1, category=category)
+        path = self.write_csv([
+            dict(slug='chainyk-2', name='Інший', category_slug='c', price='1'),
+            dict(name='Чайник', category_slug='c', price='2'),
+            dict(name='Чайник', category_slug='c', price='3'),
+        ])
+        self.run_import(path)
+        self.assertEqual(
+            list(Product.objects.order_by('slug').values_list('slug', 'name', 'price')),
+            [
+                ('chainyk', 'Чайник', Decimal('1')),
+                ('chainyk-2', 'Інший', Decimal('1')),
+                ('chainyk-3', 'Чайник', Decimal('2')),
+                ('chainyk-4', 'Чайник', Decimal('3')),
+            ],
+        )
+
+    def test_unexpected_image_error_skips_only_image(self):
+        Category.objects.create(name='C', slug='c')
+        path = self.write_csv([
+            dict(slug='a', name='A', category_slug='c', price='1', image='https://example.com/a.png'),
+            dict(slug='b', name='B', category_slug='c', price='1'),
+        ])
+        with mock.patch.object(catalog_import, 'fetch_image', side_effect=RuntimeError('boom')):
+            out = self.run_import(path)
+        self.assertIn('boom', out)
+        self.assertEqual(sorted(Product.objects.values_list('slug', flat=True)), ['a', 'b'])
+        self.assertEqual(Product.objects.get(slug='a').image.name, '')
+
+    def test_jsonl_resume(self):
+        Category.objects.create(name='C', slug='c')
+        path = os.path.join(self.tmp, 'in.jsonl')
+        with open(path, 'w') as f:
+            for i in range(25):
+                f.write(json.dumps({'slug': f's{i}', 'name': f'N{i}', 'category_slug': 'c', 'price': i}) + '\n')
+            f.write('{bad\n')
+        checkpoint = catalog_import.Checkpoint(path + '.checkpoint', path)
+        checkpoint.save(20, {'rows': 20, 'created': 20, 'updated': 0, 'errors': 0, 'images': 0})
+        out = self.run_import(path, '--resume', '--batch-size', '3')
+        self.assertIn('Продовження з запису 21', out)
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)), sorted(f's{i}' for i in range(20, 25)),
+        )
+        self.assertIn('Записів: 26', out)
+        self.assertIn('некоректний JSON', out)
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        first = Category.objects.create(name='Кат', slug='kat')
+        second = Category.objects.create(name='Інша', slug='insha')
+        now = timezone.now()
+        self.products = [
+            Product.objects.create(
+                name=f'Т{i}', slug=f't{i}', description='опис, "лапки"\nрядок', price=Decimal(100 + i),
+                category=first if i % 2 else second, is_available=i != 3,
+            )
+            for i in range(7)
+        ]
+        for product, kind, value, start, min_quantity in [
+            (self.products[1], 'percentage', 10, -1, 1),
+            (self.products[1], 'fixed', 50, -1, 1),
+            (self.products[2], 'fixed', 5, -1, 3),
+            (self.products[4], 'fixed', 5, 1, 1),
+        ]:
+            Discount.objects.create(
+                product=product, discount_type=kind, value=value, min_quantity=min_quantity,
+                start_date=now + timedelta(days=start), end_date=now + timedelta(days=start + 2),
+            )
+        User.objects.create_user('s', password='p', is_staff=True)
+
+    def test_discounts_match_model(self):
+        rows = list(catalog_export.iter_rows(catalog_export.export_queryset(), chunk_size=3))
+        self.assertEqual(len(rows), 7)
+        for row in rows:
+            discount = Product.objects.get(pk=row['id']).get_active_discount()
+            self.assertEqual(row['discount_type'], discount.discount_type if discount else '')
+        self.assertEqual(rows[1]['discount_type'], 'fixed')
+
+    def test_view_streams_csv_and_gzipped_jsonl(self):
+        url = reverse('main:export_catalog')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.login(username='s', password='p')
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]['description'], 'опис, "лапки"\nрядок')
+
+        response = self.client.get(url, {'format': 'jsonl', 'gzip': '1', 'category': 'kat', 'available': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.jsonl.gz"'))
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(line)['slug'] for line in lines], ['t1', 't5'])
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'category': 'nope'}).status_code, 404)
+
+    def test_formula_cells_are_escaped(self):
+        Product.objects.filter(pk=self.products[0].pk).update(
+            name='=HYPERLINK("http://evil")', description='-1+2', detailed_description='@SUM(A1)',
+        )
+        rows = list(catalog_export.iter_rows(catalog_export.export_queryset().filter(pk=self.products[0].pk)))
+        body = ''.join(catalog_export.csv_lines(rows)).lstrip('\ufeff')
+        row = next(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(row['name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(row['description'], "'-1+2")
+        self.assertEqual(row['detailed_description'], "'@SUM(A1)")
+        self.assertEqual(row['price'], '100.00')
+
+    def test_export_imports_back(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path = os.path.join(tmp, 'catalog.csv')
+        Product.objects.filter(pk=self.products[6].pk).update(name='=1+1')
+        call_command('export_catalog', '-o', path, stdout=io.StringIO())
+        Product.objects.filter(pk=self.products[0].pk).update(name='змінено')
+        out = io.StringIO()
+        call_command('import_catalog', path, '--no-thumbnails', stdout=out)
+        self.assertIn('оновлено 7', out.getvalue())
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).name, 'Т0')
+        self.assertEqual(Product.objects.get(pk=self.products[6].pk).name, '=1+1')
+        self.assertFalse(Product.objects.get(pk=self.products[3].pk).is_available)
+
+
+class ProductApiTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Кат', slug='kat')
+        self.products = [
+            Product.objects.create(
+                name=f'Товар {i}', slug=f't{i}', description='d', price=Decimal(100 + i),
+                category=category, image='x.png',
+            )
+            for i in range(5)
+        ]
+        self.list_url = reverse('main:api_product_list')
+        self.detail_url = reverse('main:api_product_detail', args=[self.products[0].id])
+
+    def test_list_answers_conditional_requests(self):
+        params = {'sort': 'price_low', 'limit': 2}
+        response = self.client.get(self.list_url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([p['slug'] for p in data['results']], ['t0', 't1'])
+        self.assertIn('page=2', data['next'])
+        self.assertIn('Товар', response.content.decode())
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.list_url, params, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Знижка змінює ETag
+        now = timezone.now()
+        Discount.objects.create(
+            product=self.products[1], discount_type='percentage', value=50,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        response = self.client.get(self.list_url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        first = response.json()['results'][0]
+        self.assertEqual((first['slug'], first['discount']['type']), ('t1', 'percentage'))
+
+    def test_fields_and_errors(self):
+        response = self.client.get(self.list_url, {'fields': 'id,name'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'name'})
+        self.assertEqual(self.client.get(self.list_url, {'fields': 'id,bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.list_url, {'category': 'nope'}).status_code, 404)
+        self.assertEqual(self.client.get(self.list_url, {'category': 'kat'}).status_code, 200)
+        self.assertEqual(self.client.post(self.list_url).status_code, 405)
+
+        response = self.client.get(self.detail_url, {'fields': 'name,rating_distribution'})
+        self.assertEqual(response.json(), {
+            'name': 'Товар 0', 'rating_distribution': {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0},
+        })
+        missing = reverse('main:api_product_detail', args=[999])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_missing_product_never_answers_not_modified(self):
+        response = self.client.get(self.detail_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.products[0].delete()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 404)
+        missing = reverse('main:api_product_detail', args=[999])
+        self.assertNotIn('ETag', self.client.get(missing))
+        self.assertEqual(self.client.get(missing, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_detail_etag_follows_reviews_and_edits(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('detailed_description_html', response.json())
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        user = User.objects.create_user('u', password='p')
+        Review.objects.create(product=self.products[0], author=user, rating=5, title='t', content='c')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rating_count'], 1)
+
+        etag = response['ETag']
+        product = self.products[0]
+        product.name = 'Нова'
+        product.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['name'], 'Нова')
+
+    @override_settings(CATALOG_PAGINATION='cursor')
+    def test_cursor_links(self):
+        response = self.client.get(self.list_url, {'limit': 2, 'sort': 'name'})
+        next_url = response.json()['next']
+        self.assertIn('cursor=', next_url)
+        data = self.client.get(next_url).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertIn('cursor=', data['previous'])
+
+
+class SitemapTests(TestCase):
+    namespace = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.enterContext(override_settings(
+            SITEMAP_ROOT=self.root, SITEMAP_SHARD_SIZE=3, SITEMAP_BASE_URL='https://ex.com/',
+        ))
+        category = Category.objects.create(name='К', slug='k')
+        Category.objects.create(name='Off', slug='off', is_active=False)
+        self.products = [
+            Product.objects.create(
+                name=f'P{i}', slug=f'p{i}', description='d', price=1, category=category,
+                image='x.png', is_available=i != 4,
+            )
+            for i in range(8)
+        ]
+
+    def locs(self, name):
+        tree = ElementTree.parse(os.path.join(self.root, name))
+        return [element.text for element in tree.iter(self.namespace + 'loc')]
+
+    def test_generate_rewrites_only_changed_shards(self):
+        hidden = self.products[4]
+        shards = sorted({p.id // 3 for p in self.products if p != hidden})
+        result = sitemap.generate()
+        self.assertEqual(len(result['written']), 1 + len(shards))
+        self.assertEqual(self.locs('sitemap.xml')[0], 'https://ex.com/sitemap-categories.xml')
+        self.assertEqual(
+            self.locs('sitemap-categories.xml'), ['https://ex.com/', 'https://ex.com/category/k/'],
+        )
+        urls = [url for shard in shards for url in self.locs(f'sitemap-products-{shard}.xml')]
+        self.assertEqual(len(urls), 7)
+        self.assertIn(f'https://ex.com{self.products[0].get_absolute_url()}', urls)
+        self.assertNotIn(f'https://ex.com{hidden.get_absolute_url()}', urls)
+
+        self.assertEqual(sitemap.generate()['written'], [])
+        product = self.products[0]
+        product.slug = 'renamed'
+        product.save()
+        name = f'sitemap-products-{product.id // 3}.xml'
+        self.assertIn(name, sitemap.generate()['written'])
+        self.assertIn(f'https://ex.com/product/{product.id}/renamed/', self.locs(name))
+
+        # Частина без жодного товару видаляється з диска й індексу
+        last = self.products[-1].id // 3
+        name = f'sitemap-products-{last}.xml'
+        Product.objects.filter(id__gte=last * 3).delete()
+        self.assertIn(name, sitemap.generate()['removed'])
+        self.assertFalse(os.path.exists(os.path.join(self.root, name)))
+        self.assertNotIn(f'https://ex.com/{name}', self.locs('sitemap.xml'))
+
+    def test_views_serve_generated_files(self):
+        sitemap.generate()
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertEqual(self.client.get('/sitemap-categories.xml').status_code, 200)
+        self.assertEqual(self.client.get('/sitemap-nope.xml').status_code, 404)
+        self.assertEqual(self.client.get('/sitemap-products-999.xml').status_code, 404)
@@ -0,0 +1,239 @@
+"""
+Зменшені копії зображень товарів і категорій (мініатюри + WebP).
+
+Для кожного зображення генеруються квадрати THUMBNAIL_SIZES (розміри
+в CSS-пікселях) для кожної щільності THUMBNAIL_DENSITIES у WebP і
+у «запасному» форматі (PNG для .png, інакше JPEG). Імена файлів містять
+хеш вмісту оригіналу й налаштувань генерації:
+
+    thumbs/products/2025/10/27/photo.<hash>.448.webp
+
+тож вони незмінні і можуть віддаватися з довгим Cache-Control.
+Хеш зберігається в полі image_hash моделі; поки його немає (копії ще
+генеруються або оригінал недоступний), показується оригінал. Останні
+символи хешу — відбиток налаштувань (imaging.signature_tag): після зміни
+THUMBNAIL_SIZES і т. п. старі хеші вважаються застарілими, показується
+оригінал, а `manage.py generate_thumbnails` генерує копії заново.
+
+Генерація виконується в пулі процесів поза запитом: після збереження
+моделі з новим зображенням (сигнали main/signals.py, після коміту
+транзакції). Для наявних файлів — `manage.py generate_thumbnails`.
+Підтримується лише файлове сховище (storage.path()).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils.html import format_html, format_html_join
+
+from . import imaging
+
+logger = logging.getLogger(__name__)
+
+THUMBS_DIR = 'thumbs'
+SIGNATURE_VERSION = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_sizes():
+    return getattr(settings, 'THUMBNAIL_SIZES', {'admin': 50, 'cart': 64, 'card': 224, 'detail': 500})
+
+
+def get_densities():
+    return getattr(settings, 'THUMBNAIL_DENSITIES', (1, 2))
+
+
+def pixel_sizes():
+    """Усі розміри файлів у пікселях"""
+    return sorted({size * density for size in get_sizes().values() for density in get_densities()})
+
+
+def get_quality():
+    return getattr(settings, 'THUMBNAIL_QUALITY', 82)
+
+
+def signature():
+    """Рядок, що змінюється разом з налаштуваннями генерації"""
+    return repr((SIGNATURE_VERSION, pixel_sizes(), get_quality()))
+
+
+def is_current(image_hash):
+    """Чи згенеровані копії з хешем image_hash за поточними налаштуваннями"""
+    return bool(image_hash) and image_hash.endswith(imaging.signature_tag(signature()))
+
+
+def fallback_ext(name):
+    return 'png' if name.lower().endswith('.png') else 'jpg'
+
+
+def formats_for(name):
+    return ('webp', fallback_ext(name))
+
+
+def variant_name(name, image_hash, size, ext):
+    stem = os.path.splitext(name)[0]
+    return f'{THUMBS_DIR}/{stem}.{image_hash}.{size}.{ext}'
+
+
+def _dest_template(name):
+    stem = os.path.splitext(name)[0].replace('{', '{{').replace('}', '}}')
+    return default_storage.path(f'{THUMBS_DIR}/{stem}') + '.{hash}.{size}.{ext}'
+
+
+# --- Генерація ---
+
+def job_args(name):
+    """Аргументи imaging.generate_variants для файлу сховища name"""
+    return (
+        default_storage.path(name), _dest_template(name),
+        pixel_sizes(), formats_for(name), signature(), get_quality(),
+    )
+
+
+def generate(name):
+    """Синхронно генерує копії файлу name. Повертає хеш."""
+    return imaging.generate_variants(*job_args(name))
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: дочірні процеси не успадковують з'єднання з БД і потоки сервера
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def store_hash(model, pk, name, image_hash):
+    """Записує хеш, якщо зображення об'єкта за цей час не змінилось"""
+    updated = model.objects.filter(pk=pk, image=name).update(image_hash=image_hash)
+    if updated:
+        _invalidate(model, pk)
+    return updated
+
+
+def _invalidate(model, pk):
+    from . import page_cache
+    from .cache import bump_versions
+    from .categories import CATEGORIES_VERSION
+    from .models import Product
+
+    if model is Product:
+        page_cache.invalidate_products([pk])
+    else:
+        bump_versions([CATEGORIES_VERSION])
+
+
+def schedule(model, pk, name):
+    """Ставить генерацію копій у пул процесів (або виконує одразу, якщо THUMBNAIL_ASYNC = False)"""
+    if not getattr(settings, 'THUMBNAIL_ASYNC', True):
+        try:
+            store_hash(model, pk, name, generate(name))
+        except (OSError, ValueError, NotImplementedError):
+            logger.warning('Не вдалося згенерувати мініатюри для %s', name, exc_info=True)
+        return
+    try:
+        future = get_executor().submit(imaging.generate_variants, *job_args(name))
+    except NotImplementedError:
+        logger.warning('Сховище без локальних шляхів: мініатюри для %s не генеруються', name)
+        return
+    future.add_done_callback(lambda f: _on_done(f, model, pk, name))
+
+
+def _on_done(future, model, pk, name):
+    # Виконується в службовому потоці пулу: окреме з'єднання з БД
+    try:
+        store_hash(model, pk, name, future.result())
+    except Exception:
+        logger.warning('Не вдалося згенерувати мініатюри для %s', name, exc_info=True)
+    finally:
+        connection.close()
+
+
+def backfill(force=False, workers=None, window=200):
+    """
+    Генерує копії для всіх товарів і категорій без хешу або з хешем за
+    старими налаштуваннями (або для всіх, якщо force). Повертає (оновлено, помилок).
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    from .models import Category, Product
+
+    updated = failed = 0
+    pool = ProcessPoolExecutor(
+        max_workers=workers or getattr(settings, 'THUMBNAIL_WORKERS', 2),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+    with pool:
+        pending = {}
+
+        def collect(done):
+            nonlocal updated, failed
+            for future in done:
+                model, pk, name = pending.pop(future)
+                try:
+                    updated += store_hash(model, pk, name, future.result())
+                except Exception:
+                    failed += 1
+                    logger.warning('Не вдалося згенерувати мініатюри для %s', name, exc_info=True)
+
+        for model in (Category, Product):
+            rows = model.objects.exclude(image='').order_by('pk')
+            if not force:
+                rows = rows.exclude(image_hash__endswith=imaging.signature_tag(signature()))
+            for pk, name in rows.values_list('pk', 'image').iterator(chunk_size=1000):
+                # Не більше window задач у черзі пулу
+                if len(pending) >= window:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                future = pool.submit(imaging.generate_variants, *job_args(name))
+                pending[future] = (model, pk, name)
+        collect(wait(pending).done)
+    return updated, failed
+
+
+# --- Відображення ---
+
+def srcset(name, image_hash, preset, ext):
+    size = get_sizes()[preset]
+    return ', '.join(
+        f'{default_storage.url(variant_name(name, image_hash, size * d, ext))} {d}x'
+        for d in get_densities()
+    )
+
+
+def responsive_image(obj, preset, **attrs):
+    """
+    <picture> з WebP і запасним форматом для зображення obj.image у розмірі
+    preset (ключ THUMBNAIL_SIZES). Без згенерованих копій — <img> з оригіналом.
+    """
+    image = obj.image
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    image_hash = getattr(obj, 'image_hash', '')
+    if not is_current(image_hash):
+        return format_html('<img src="{}"{}>', image.url, _attrs(attrs))
+    name = image.name
+    ext = fallback_ext(name)
+    size = get_sizes()[preset]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}"><img src="{}" srcset="{}"{}></picture>',
+        srcset(name, image_hash, preset, 'webp'),
+        default_storage.url(variant_name(name, image_hash, size, ext)),
+        srcset(name, image_hash, preset, ext),
+        _attrs(attrs),
+    )
+
+
+def _attrs(attrs):
+    return format_html_join('', ' {}="{}"', ((key.rstrip('_').replace('_', '-'), value) for key, value in attrs.items()))
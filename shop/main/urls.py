@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import api, views
 
 app_name = 'main'
 
@@ -7,4 +7,11 @@ urlpatterns = [
     path('', views.product_list, name='product_list'),
     path('category/<slug:category_slug>/', views.product_list, name='product_list_by_category'),
     path('product/<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
+    path('page-cache/stats/', views.page_cache_stats, name='page_cache_stats'),
+    path('export/catalog/', views.export_catalog, name='export_catalog'),
+    path('api/products/', api.product_list, name='api_product_list'),
+    path('api/products/<int:id>/', api.product_detail, name='api_product_detail'),
+    path('sitemap.xml', views.sitemap_file, name='sitemap'),
+    re_path(r'^(?P<name>sitemap-[a-z0-9-]+\.xml)$', views.sitemap_file, name='sitemap_file'),
 ]
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+Буферизований (write-behind) лічильник переглядів товарів.
+
+Замість UPDATE на кожен перегляд product_detail інкременти накопичуються
+в пам'яті процесу і періодично записуються в Product.views пачками:
+один запит `UPDATE ... SET views = views + N WHERE id IN (...)` на кожне
+різне значення N. Тим самим запитом оновлюється згасаюча популярність
+(Product.popularity, див. main/popularity.py), а після запису — рейтинг
+популярних товарів у кеші. Пари товарів, переглянутих в одній сесії,
+накопичуються тут же і записуються в ProductCoView (main/recommendations.py).
+
+Скидання буфера відбувається:
+- після відповіді на запит (сигнал request_finished, main/signals.py),
+  якщо з моменту попереднього скидання минуло VIEW_COUNTER_FLUSH_INTERVAL
+  секунд або в буфері накопичилось VIEW_COUNTER_MAX_PENDING товарів;
+- у фоновому потоці, якщо VIEW_COUNTER_BACKGROUND = True.
+Скидання при завершенні процесу (atexit) немає: на виході БД за
+замовчуванням може бути вже не та, куди писались перегляди (наприклад,
+після тестів). isolated() перенаправляє перегляди в окремий буфер, який
+потім відкидається, — для тестів і бенчмарків.
+
+Гарантії збереження даних:
+- F()-вирази виконуються в БД, тому паралельні процеси не перезаписують
+  інкременти один одного;
+- буфер забирається під блокуванням до запису в БД, тож кожен інкремент
+  застосовується не більше одного разу;
+- якщо запис у БД завершився помилкою, транзакція відкочується, а дельти
+  повертаються в буфер і будуть записані при наступному скиданні;
+- при завершенні процесу втрачаються лише ще не скинуті інкременти:
+  не більше ніж за
+  VIEW_COUNTER_FLUSH_INTERVAL секунд або VIEW_COUNTER_MAX_PENDING товарів.
+  Лічильник переглядів — некритична статистика, тому ця межа прийнятна.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import popularity, recommendations
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    def __init__(self, flush_interval=10, max_pending=1000, background=False):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.background = background
+        self._pending = Counter()
+        self._co_views = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            flush_interval=getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 10),
+            max_pending=getattr(settings, 'VIEW_COUNTER_MAX_PENDING', 1000),
+            background=getattr(settings, 'VIEW_COUNTER_BACKGROUND', False),
+        )
+
+    def record(self, product_id, count=1, co_viewed=()):
+        """
+        Додає перегляд до буфера; co_viewed — товари, переглянуті в тій самій
+        сесії раніше. У БД перегляди записує flush_if_due() після відповіді.
+        """
+        with self._lock:
+            self._pending[product_id] += count
+            for other_id in co_viewed:
+                self._co_views[recommendations.co_view_pair(product_id, other_id)] += 1
+        if self.background:
+            self._ensure_thread()
+
+    def is_due(self):
+        with self._lock:
+            size = len(self._pending) + len(self._co_views)
+            return size > 0 and (
+                size >= self.max_pending or
+                time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+    def flush_if_due(self):
+        """Скидає буфер, якщо настав час; помилка лише логується (дельти лишаються в буфері)"""
+        if self.background or not self.is_due():
+            return 0
+        try:
+            return self.flush()
+        except Exception:
+            return 0
+
+    def discard(self):
+        """Відкидає не записані перегляди"""
+        self._take()
+
+    def pending(self, product_id):
+        """Кількість ще не записаних переглядів товару"""
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def _take(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            co_views, self._co_views = self._co_views, Counter()
+            self._last_flush = time.monotonic()
+        return pending, co_views
+
+    def _restore(self, pending, co_views):
+        with self._lock:
+            self._pending.update(pending)
+            self._co_views.update(co_views)
+
+    def flush(self):
+        """Записує накопичені перегляди в БД. Повертає кількість товарів."""
+        from .models import Product
+
+        with self._flush_lock:
+            pending, co_views = self._take()
+            if not pending and not co_views:
+                return 0
+            by_delta = defaultdict(list)
+            for product_id, delta in pending.items():
+                by_delta[delta].append(product_id)
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    for delta, product_ids in by_delta.items():
+                        Product.objects.filter(id__in=product_ids).update(
+                            views=F('views') + delta,
+                            popularity=popularity.add_views_expression(delta, now),
+                        )
+                    if co_views:
+                        recommendations.record_co_views(co_views, now)
+            except Exception:
+                self._restore(pending, co_views)
+                logger.exception('Не вдалося записати %s лічильників переглядів', len(pending))
+                raise
+            try:
+                popularity.leaderboard.refresh(list(pending))
+            except Exception:
+                # Перегляди вже записані; рейтинг перебудується з БД
+                logger.exception('Не вдалося оновити рейтинг популярних товарів')
+            return len(pending)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='view-counter-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass  # дельти повернуто в буфер, спробуємо наступного разу
+            finally:
+                connection.close()
+
+
+buffer = ViewCountBuffer.from_settings()
+
+
+def record_view(product_id, co_viewed=()):
+    buffer.record(product_id, co_viewed=co_viewed)
+
+
+def pending_views(product_id):
+    return buffer.pending(product_id)
+
+
+def flush():
+    return buffer.flush()
+
+
+def flush_if_due():
+    return buffer.flush_if_due()
+
+
+@contextmanager
+def isolated():
+    """Перегляди всередині блоку потрапляють в окремий буфер і не записуються в БД"""
+    global buffer
+    previous = buffer
+    buffer = ViewCountBuffer(flush_interval=float('inf'), max_pending=float('inf'))
+    try:
+        yield buffer
+    finally:
+        buffer = previous
@@ -1,49 +1,131 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
-from .models import Product, Category
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
+from .models import Category, Product
 from cart.forms import CartAddProductForm 
+from . import autocomplete, cards, catalog_export, facets, page_cache, recommendations, search, sitemap, view_counter
+from .cache import get_version
+from .categories import CATEGORIES_VERSION, get_active_categories
+from .pagination import paginate
 
+
+def parse_price(value):
+    """Перетворює параметр запиту на Decimal або None"""
+    try:
+        price = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+# Сортування каталогу: параметр sort → поле (спільне для HTML і API)
+SORT_MAPPING = {
+    'new': '-created_at',
+    'old': 'created_at',
+    'popular': '-views',
+    'price_low': 'effective_price',
+    'price_high': '-effective_price',
+    'name': 'name',
+}
+
+
+def filter_catalog(request, products):
+    """Фільтр ціни і пошук з параметрів запиту: (queryset, запит, min_price, max_price)"""
+    # 💰 Фільтр за ціною (ціна зі знижкою, індексована колонка)
+    min_price = parse_price(request.GET.get('min_price'))
+    max_price = parse_price(request.GET.get('max_price'))
+    if min_price is not None:
+        products = products.filter(effective_price__gte=min_price)
+    if max_price is not None:
+        products = products.filter(effective_price__lte=max_price)
+
+    # 🔍 Пошук
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        products = search.search(products, search_query)
+    return products, search_query, min_price, max_price
+
+
+def sort_catalog(request, products):
+    """
+    Сортування з параметра sort: (queryset, sort, поле для пагінації).
+    Для пошуку за замовчуванням — за релевантністю (поле — None).
+    """
+    default_sort = 'relevance' if search.is_ranked(products) else 'new'
+    sort = request.GET.get('sort', default_sort)
+    if sort == 'relevance' and search.is_ranked(products):
+        return products.order_by('search_rank', '-created_at'), sort, None
+    return products, sort, SORT_MAPPING.get(sort, '-created_at')
+
+
+MATCHES_KEY = 'catalog:matches:%s:%s'
+
+
+def matching_bits(products, *params):
+    """
+    Бітова множина товарів, що відповідають пошуку і діапазону ціни
+    (params — параметри фільтра), для перетину з фасетами. Кешується під
+    версією каталогу, тож сторінки, сортування і вибір фасетів того самого
+    пошуку не вибирають усі id знову.
+    """
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()
+    key = MATCHES_KEY % (get_version(page_cache.CATALOG_VERSION), digest)
+    data = cache.get(key)
+    if data is None:
+        data = facets.to_bytes(facets.bits_from_ids(products.order_by().values_list('id', flat=True)))
+        cache.set(key, data, getattr(settings, 'CATEGORY_CACHE_TIMEOUT', 86400))
+    return facets.from_bytes(data)
+
+
+def product_list_scope(request, category_slug=None):
+    """Версії, від яких залежить сторінка каталогу (None — не кешувати)"""
+    names = [CATEGORIES_VERSION, page_cache.COUNTS_VERSION, facets.FACETS_VERSION]
+    if category_slug is None:
+        return names + [page_cache.CATALOG_VERSION]
+    category = next((c for c in get_active_categories() if c.slug == category_slug), None)
+    if category is None:
+        return None
+    return names + [page_cache.category_version(category.id)]
+
+
+@page_cache.cache_anonymous_page(
+    product_list_scope,
+    params=('q', 'sort', 'page', 'cursor', 'min_price', 'max_price', 'price', 'rating', 'discount', 'featured'),
+)
 def product_list(request, category_slug=None):
-    categories = Category.objects.filter(is_active=True)
-    products = Product.objects.filter(is_available=True)
+    categories = get_active_categories()
+    products = cards.card_queryset(Product.objects.filter(is_available=True))
 
     category = None
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug, is_active=True)
+        # Категорія береться з кешованого списку активних категорій
+        category = next((c for c in categories if c.slug == category_slug), None)
+        if category is None:
+            raise Http404('Категорію не знайдено')
         products = products.filter(category=category)
 
-    # 🔍 Пошук
-    search_query = request.GET.get('q', '').strip()
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
-
-    # 📊 Сортування
-    sort = request.GET.get('sort', 'new')
-    sort_mapping = {
-        'new': '-created_at',
-        'old': 'created_at',
-        'popular': '-views',
-        'price_low': 'price',
-        'price_high': '-price',
-        'name': 'name',
-    }
-    products = products.order_by(sort_mapping.get(sort, '-created_at'))
+    products, search_query, min_price, max_price = filter_catalog(request, products)
 
-    # 📄 Пагінація (6 товарів на сторінку)
-    paginator = Paginator(products, 6)
-    page = request.GET.get('page')
+    # 🧩 Фасети: кількості рахуються перетином бітових множин (див. facets)
+    index = facets.get_index()
+    base = index.base(category)
+    if search_query or min_price is not None or max_price is not None:
+        # Множина товарів, що відповідають пошуку і діапазону ціни
+        base &= matching_bits(products, category and category.id, search_query, min_price, max_price)
+    selected_facets = facets.parse_selected(request.GET)
+    facet_counts = index.counts(base, selected_facets)
+    products = facets.filter_queryset(products, selected_facets)
 
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    # 📊 Сортування (для пошуку за замовчуванням — за релевантністю)
+    products, sort, ordering = sort_catalog(request, products)
+
+    # 📄 Пагінація (6 товарів на сторінку)
+    products = paginate(request, products, 6, ordering)
+    products.object_list = cards.load_cards(products.object_list)
 
     context = {
         'products': products,
@@ -51,22 +133,39 @@ def product_list(request, category_slug=None):
         'category': category,
         'current_sort': sort,
         'search_query': search_query,
+        'min_price': min_price,
+        'max_price': max_price,
+        'facets': facets.facet_choices(request.GET, facet_counts, selected_facets),
+        'selected_facets': selected_facets,
+        'pagination_mode': products.mode,
     }
     return render(request, 'main/product_list.html', context)
 
 
+def product_detail_scope(request, id, slug):
+    return [CATEGORIES_VERSION, page_cache.product_version(id)]
+
+
+def record_product_view(request, id, slug=None):
+    """Перегляд потрапляє в буфер і записується в БД пачкою (див. view_counter)"""
+    co_viewed = recommendations.remember_view(request, id)
+    view_counter.record_view(id, co_viewed=co_viewed)
+
+
+@page_cache.cache_anonymous_page(product_detail_scope, on_hit=record_product_view)
 def product_detail(request, id, slug):
-    product = get_object_or_404(Product, id=id, slug=slug, is_available=True)
-    product.views += 1
-    product.save(update_fields=['views'])
+    product = get_object_or_404(
+        Product.objects.select_related('recommendation'), id=id, slug=slug, is_available=True,
+    )
+    record_product_view(request, product.id)
+    product.views += view_counter.pending_views(product.id)
     
     cart_product_form = CartAddProductForm()
 
-    # Схожі товари
-    related_products = Product.objects.filter(
-        category=product.category,
-        is_available=True
-    ).exclude(id=product.id)[:4]
+    # Схожі товари (попередньо обчислені, див. recommendations);
+    # при нестачі доповнюються товарами категорії
+    page_cache.depend_on([page_cache.category_version(product.category_id)])
+    related_products = cards.load_cards(recommendations.related_products(product, limit=4))
 
     # --- Новий блок: відгуки ---
     reviews = product.reviews.filter(is_active=True)
@@ -84,4 +183,54 @@ def product_detail(request, id, slug):
         'rating_distribution': product.get_rating_distribution(),
         'user_review': user_review,
     }
-    return render(request, 'main/product_detail.html', context)
\ No newline at end of file
+    return render(request, 'main/product_detail.html', context)
+
+
+def search_autocomplete(request):
+    """Підказки для рядка пошуку (JSON): категорії і товари за префіксом назви"""
+    query = request.GET.get('q', '').strip()[:100]
+    try:
+        limit = int(request.GET.get('limit', ''))
+    except ValueError:
+        limit = None
+    return JsonResponse({'query': query, 'results': autocomplete.suggest(query, limit)})
+
+
+@staff_member_required
+def page_cache_stats(request):
+    """Лічильники влучань і промахів кешу сторінок (для моніторингу)"""
+    if request.method == 'POST' and request.POST.get('reset'):
+        page_cache.reset_stats()
+    return JsonResponse({'views': page_cache.get_stats()})
+
+
+@staff_member_required
+def export_catalog(request):
+    """
+    Вивантаження каталогу потоком: ?format=csv|jsonl, &gzip=1,
+    &category=<slug>, &available=1
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in catalog_export.FORMATS:
+        raise Http404
+    compress = request.GET.get('gzip') == '1'
+    category = None
+    if request.GET.get('category'):
+        category = get_object_or_404(Category, slug=request.GET['category'])
+    queryset = catalog_export.export_queryset(category, request.GET.get('available') == '1')
+    response = StreamingHttpResponse(
+        catalog_export.export_chunks(fmt, queryset, compress),
+        content_type='application/gzip' if compress else catalog_export.FORMATS[fmt][1],
+    )
+    filename = catalog_export.export_filename(fmt, compress, category)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def sitemap_file(request, name='sitemap.xml'):
+    """Файли sitemap, згенеровані `manage.py generate_sitemaps`"""
+    path = sitemap.file_path(name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), content_type='application/xml')
@@ -1,7 +1,10 @@
 
 from django.contrib import admin
 from django.utils.html import format_html, escape
+from django.db import transaction
 from .models import Review
+from .ratings import recompute_rating_stats
+from main import page_cache
 
 
 @admin.register(Review)
@@ -52,10 +55,19 @@ class ReviewAdmin(admin.ModelAdmin):
 
     @admin.action(description="Активувати вибрані відгуки")
     def activate_reviews(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = self._set_active(queryset, True)
         self.message_user(request, f'Активовано {updated} відгук(ів).')
 
     @admin.action(description="Деактивувати вибрані відгуки")
     def deactivate_reviews(self, request, queryset):
-        updated = queryset.update(is_active=False)
-        self.message_user(request, f'Деактивовано {updated} відгук(ів).')
\ No newline at end of file
+        updated = self._set_active(queryset, False)
+        self.message_user(request, f'Деактивовано {updated} відгук(ів).')
+
+    def _set_active(self, queryset, is_active):
+        # update() не викликає save(), тому статистику товарів перераховуємо явно
+        with transaction.atomic():
+            product_ids = list(queryset.values_list('product_id', flat=True).distinct())
+            updated = queryset.update(is_active=is_active)
+            recompute_rating_stats(product_ids)
+        page_cache.invalidate_products(product_ids)
+        return updated
\ No newline at end of file
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
-    verbose_name = 'Відгуки'
\ No newline at end of file
+    verbose_name = 'Відгуки'
+
+    def ready(self):
+        # Імпорт для реєстрації сигналів
+        import reviews.signals  # noqa: F401
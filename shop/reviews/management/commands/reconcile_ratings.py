@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reviews.ratings import recompute_rating_stats
+
+
+class Command(BaseCommand):
+    help = 'Перераховує денормалізовану статистику відгуків для всіх товарів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = recompute_rating_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Виправлено статистику для {changed} товарів'))
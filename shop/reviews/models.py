@@ -1,8 +1,9 @@
 # Create your models here.
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from main.models import Product
+from . import ratings
 
 
 class Review(models.Model):
@@ -72,6 +73,26 @@ class Review(models.Model):
     def __str__(self):
         return f'{self.title} — {self.author.username}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rating_state = instance.get_rating_state()
+        return instance
+
+    def get_rating_state(self):
+        """(товар, оцінка) — внесок відгуку в статистику товару"""
+        return (self.__dict__.get('product_id'),
+                self.__dict__.get('rating') if self.__dict__.get('is_active') else None)
+
+    def save(self, *args, **kwargs):
+        # Відгук і статистика товару змінюються в одній транзакції
+        previous = getattr(self, '_rating_state', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current = self.get_rating_state()
+            ratings.review_changed(previous, current)
+        self._rating_state = current
+
     def get_rating_display_stars(self):
         """Повертає HTML-рядок з зірками (наприклад, ★★★★☆)"""
         full = '★' * self.rating
@@ -0,0 +1,126 @@
+"""
+Денормалізована статистика відгуків на Product:
+rating_count, rating_sum, rating_1..rating_5 та rating_avg.
+
+Зміни застосовуються інкрементально одним UPDATE з F()-виразами в тій
+самій транзакції, що і запис відгуку (Review.save / post_delete).
+Масові зміни (admin-дії, reconcile_ratings) перераховують статистику
+агрегатом для набору товарів.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from main import facets, page_cache
+from main.models import Product
+from main.pagination import iter_batches
+
+STARS = range(1, 6)
+
+
+def apply_rating_delta(product_id, removed=None, added=None):
+    """
+    Прибирає внесок оцінки `removed` і додає `added` (оцінки 1..5 або None)
+    у статистику товару одним UPDATE.
+    """
+    if removed == added:
+        return
+    star_delta = defaultdict(int)
+    count_delta = sum_delta = 0
+    if removed is not None:
+        star_delta[removed] -= 1
+        count_delta -= 1
+        sum_delta -= removed
+    if added is not None:
+        star_delta[added] += 1
+        count_delta += 1
+        sum_delta += added
+
+    updates = {
+        f'rating_{star}': F(f'rating_{star}') + delta
+        for star, delta in star_delta.items() if delta
+    }
+    if count_delta or sum_delta:
+        new_count = F('rating_count') + count_delta
+        new_sum = F('rating_sum') + sum_delta
+        updates['rating_count'] = new_count
+        updates['rating_sum'] = new_sum
+        # У SET праворуч використовуються старі значення колонок
+        updates['rating_avg'] = Case(
+            When(rating_count__gt=-count_delta,
+                 then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    Product.objects.filter(id=product_id).update(**updates)
+    # Середній рейтинг міг перетнути поріг фасета «Рейтинг»
+    facets.update_products([product_id], facet_names=('rating',))
+
+
+def review_changed(previous, current):
+    """
+    previous/current — пари (product_id, оцінка або None для неактивного
+    відгуку) до і після зміни; None — відгуку не існувало.
+    """
+    if previous == current:
+        return
+    old_product, old_rating = previous or (None, None)
+    new_product, new_rating = current or (None, None)
+    if old_product == new_product:
+        apply_rating_delta(new_product, removed=old_rating, added=new_rating)
+        return
+    if old_product is not None:
+        apply_rating_delta(old_product, removed=old_rating)
+    if new_product is not None:
+        apply_rating_delta(new_product, added=new_rating)
+
+
+def recompute_rating_stats(product_ids=None, batch_size=1000):
+    """
+    Повністю перераховує статистику для товарів (або всього каталогу).
+    Використовується масовими admin-діями та командою reconcile_ratings.
+    Повертає кількість товарів, у яких статистика змінилась.
+    """
+    from .models import Review
+
+    fields = ['rating_count', 'rating_sum', 'rating_avg'] + [f'rating_{s}' for s in STARS]
+    products = Product.objects.only('id', *fields)
+
+    changed = 0
+    for batch in iter_batches(products, batch_size, ids=product_ids):
+        histograms = defaultdict(dict)
+        rows = (
+            Review.objects.filter(is_active=True, product__in=batch)
+            .values_list('product_id', 'rating')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        for product_id, rating, n in rows:
+            histograms[product_id][rating] = n
+
+        to_update = []
+        with transaction.atomic():
+            for product in batch:
+                stats = stats_from_histogram(histograms.get(product.id, {}))
+                if any(getattr(product, name) != value for name, value in stats.items()):
+                    for name, value in stats.items():
+                        setattr(product, name, value)
+                    to_update.append(product)
+            if to_update:
+                Product.objects.bulk_update(to_update, fields)
+        facets.update_products([p.id for p in to_update], facet_names=('rating',))
+        page_cache.invalidate_products([p.id for p in to_update])
+        changed += len(to_update)
+    return changed
+
+
+def stats_from_histogram(histogram):
+    count = sum(histogram.values())
+    total = sum(star * n for star, n in histogram.items())
+    stats = {f'rating_{star}': histogram.get(star, 0) for star in STARS}
+    stats['rating_count'] = count
+    stats['rating_sum'] = total
+    stats['rating_avg'] = total / count if count else 0.0
+    return stats
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Review
+from . import ratings
+from main import page_cache
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_stats(sender, instance, **kwargs):
+    """Видалення відгуку (у т.ч. каскадне) виконується в транзакції колектора"""
+    previous = getattr(instance, '_rating_state', None) or instance.get_rating_state()
+    ratings.review_changed(previous, None)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_product_page(sender, instance, raw=False, **kwargs):
+    """Відгуки і рейтинг показуються на сторінці товару"""
+    if raw:
+        return
+    page_cache.invalidate_products([instance.product_id])
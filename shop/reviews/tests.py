@@ -1,3 +1,100 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main import view_counter
+from main.models import Category, Product
+
+from .admin import ReviewAdmin
+from .models import Review
+from .ratings import recompute_rating_stats
+
+
+class RatingStatsTests(TestCase):
+    def setUp(self):
+        self.enterContext(view_counter.isolated())
+        category = Category.objects.create(name='C', slug='c')
+        self.a = Product.objects.create(
+            name='A', slug='a', description='d', price=100, category=category, image='x.png',
+        )
+        self.b = Product.objects.create(
+            name='B', slug='b', description='d', price=100, category=category, image='x.png',
+        )
+        self.users = [User.objects.create_user(f'u{i}', password='x') for i in range(3)]
+
+    def review(self, product, user, rating):
+        return Review.objects.create(product=product, author=user, rating=rating, title='t', content='c')
+
+    def stats(self, product):
+        product.refresh_from_db()
+        return product.rating_count, product.rating_sum, product.rating_avg
+
+    def test_save_and_delete_keep_stats_in_sync(self):
+        first = self.review(self.a, self.users[0], 5)
+        second = self.review(self.a, self.users[1], 3)
+        self.assertEqual(self.stats(self.a), (2, 8, 4.0))
+        self.assertEqual((self.a.rating_5, self.a.rating_3), (1, 1))
+
+        second.rating = 1
+        second.save()
+        self.assertEqual(self.stats(self.a), (2, 6, 3.0))
+        self.assertEqual((self.a.rating_3, self.a.rating_1), (0, 1))
+
+        second.is_active = False
+        second.save()
+        self.assertEqual(self.stats(self.a), (1, 5, 5.0))
+
+        first.product = self.b
+        first.save()
+        self.assertEqual(self.stats(self.a), (0, 0, 0.0))
+        self.assertEqual(self.stats(self.b), (1, 5, 5.0))
+
+        first.delete()
+        self.assertEqual(self.stats(self.b), (0, 0, 0.0))
+
+    def test_bulk_changes_recompute_stats(self):
+        self.review(self.a, self.users[0], 1)
+        inactive = self.review(self.a, self.users[1], 4)
+        Review.objects.filter(pk=inactive.pk).update(is_active=False)
+        model_admin = ReviewAdmin(Review, admin.site)
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.activate_reviews(None, Review.objects.all())
+        self.assertEqual(self.stats(self.a), (2, 5, 2.5))
+
+        # Видалення автора каскадно видаляє відгук
+        self.users[1].delete()
+        self.assertEqual(self.stats(self.a), (1, 1, 1.0))
+
+        Product.objects.filter(pk=self.a.pk).update(rating_count=99)
+        self.assertEqual(recompute_rating_stats(), 1)
+        self.assertEqual(self.stats(self.a), (1, 1, 1.0))
+        self.assertEqual(self.a.get_rating_distribution(), {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_full_product_save_keeps_concurrent_stats(self):
+        stale = Product.objects.get(pk=self.a.pk)
+        self.review(self.a, self.users[0], 4)
+        Product.objects.filter(pk=self.a.pk).update(views=7)
+        stale.name = 'A2'
+        stale.save()
+        self.assertEqual(self.stats(self.a), (1, 4, 4.0))
+        self.assertEqual((self.a.name, self.a.views, self.a.rating_4), ('A2', 7, 1))
+
+        # Явно передані поля записуються як звичайно
+        stale.views = 0
+        stale.save(update_fields=['views'])
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.views, 0)
 
-# Create your tests here.
+    def test_detail_page_does_not_aggregate_reviews(self):
+        self.review(self.a, self.users[0], 4)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.a.get_absolute_url())
+        aggregates = [
+            q['sql'] for q in ctx.captured_queries
+            if 'reviews_review' in q['sql'] and ('AVG(' in q['sql'] or 'COUNT(' in q['sql'])
+        ]
+        self.assertEqual(aggregates, [])
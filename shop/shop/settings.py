@@ -62,12 +62,15 @@ NPM_BIN_PATH = "C:/Programing/nodejs/npm.cmd"
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'cart.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'accounts.middleware.AdminAccessRedirectMiddleware',
+    'discounts.middleware.DiscountBoundaryMiddleware',
+    'main.middleware.RecentViewsCookieMiddleware',
 ]
 if DEBUG:
     # Add django_browser_reload middleware only in DEBUG mode
@@ -88,6 +91,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'main.context_processors.categories',
+                'cart.context_processors.cart',
             ],
         },
     },
@@ -106,6 +110,23 @@ DATABASES = {
     }
 }
 
+# Cache
+# Версії ключів, кеш сторінок і рейтинг популярних товарів мають бути спільними
+# для всіх воркерів, тому не LocMemCache (він окремий у кожному процесі).
+# Файловий кеш спільний у межах одного сервера; для кількох серверів —
+# 'django.core.cache.backends.redis.RedisCache' з LOCATION 'redis://...'.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 50_000},
+    }
+}
+
+# Тести працюють з окремим кешем у тимчасовому каталозі (shop/test_runner.py)
+TEST_RUNNER = 'shop.test_runner.IsolatedCacheRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -165,4 +186,62 @@ CART_SESSION_ID = 'cart'
 
 
 SESSION_COOKIE_AGE = 86400
-SESSION_SAVE_EVERY_REQUEST = True  
+# Сесія записується лише при зміні; строк дії продовжується
+# не частіше ніж раз на SESSION_REFRESH_INTERVAL секунд (cart/middleware.py)
+SESSION_REFRESH_INTERVAL = 3600
+
+# Режим пагінації каталогу: 'page' (номери сторінок + COUNT),
+# 'fast' (номери сторінок без COUNT) або 'cursor' (keyset-курсори)
+CATALOG_PAGINATION = 'page'
+
+# Буферизований лічильник переглядів (main/view_counter.py)
+VIEW_COUNTER_FLUSH_INTERVAL = 10  # секунд між записами в БД
+VIEW_COUNTER_MAX_PENDING = 1000  # товарів у буфері до примусового запису
+VIEW_COUNTER_BACKGROUND = False  # скидати буфер у фоновому потоці
+
+# Популярні товари (main/popularity.py)
+POPULARITY_HALF_LIFE = 168  # годин, за які вага перегляду зменшується вдвічі
+POPULARITY_TOP_K = 50  # розмір рейтингу в кеші
+POPULARITY_CACHE_TIMEOUT = 300  # секунд до перебудови рейтингу з БД
+
+# Схожі товари (main/recommendations.py)
+RECOMMENDATIONS_SIZE = 8  # сусідів, що зберігаються для товару
+RECOMMENDATIONS_COVIEW_WEIGHT = 0.6  # вага спільних переглядів проти текстової схожості
+RECOMMENDATIONS_RECENT_VIEWS = 5  # останніх переглядів відвідувача (cookie) для пар спільних переглядів
+
+# Вікно (секунд), на яке планувальник знижок завантажує межі start/end_date
+DISCOUNT_SCHEDULER_WINDOW = 60
+
+# Час життя кешу категорій, фрагментів навігації і лічильників товарів
+# (інвалідовується версією)
+CATEGORY_CACHE_TIMEOUT = 86400
+
+# Кеш сторінок каталогу для анонімних відвідувачів (main/page_cache.py)
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 300  # секунд; також не довше найближчої межі знижки
+
+# Мініатюри зображень (main/thumbnails.py): розміри в CSS-пікселях,
+# для кожного генеруються копії 1x/2x у WebP і JPEG/PNG
+THUMBNAIL_SIZES = {'admin': 50, 'cart': 64, 'card': 224, 'detail': 500}
+THUMBNAIL_DENSITIES = (1, 2)
+THUMBNAIL_QUALITY = 82
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_ASYNC = True  # False — генерувати одразу в запиті (для налагодження)
+
+# Фасетні фільтри каталогу (main/facets.py): межі діапазонів ціни (грн)
+# і пороги середнього рейтингу; після зміни — manage.py rebuild_facets
+FACET_PRICE_BANDS = (500, 1000, 5000, 20000)
+FACET_RATING_THRESHOLDS = (4, 3)
+
+# Автодоповнення пошуку (main/autocomplete.py): максимум підказок і мінімальний
+# інтервал між перебудовами індексу після змін каталогу (секунд)
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REBUILD_INTERVAL = 60
+AUTOCOMPLETE_MAX_AGE = 3600  # секунд; оновлення порядку за популярністю
+AUTOCOMPLETE_ASYNC = True  # False — будувати індекс одразу в запиті
+
+# Sitemap (main/sitemap.py): каталог файлів, адреса сайту для абсолютних URL
+# і кількість товарів в одному файлі (не більше 50 000)
+SITEMAP_ROOT = BASE_DIR / 'sitemaps'
+SITEMAP_BASE_URL = 'http://localhost:8000'
+SITEMAP_SHARD_SIZE = 50_000
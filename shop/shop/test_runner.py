@@ -0,0 +1,31 @@
+"""
+Запуск тестів з окремим кешем.
+
+Тести очищують і змінюють кеш (версії ключів, сторінки, watermark
+знижок), а CACHES у налаштуваннях — спільний файловий кеш сервера.
+На час запуску він замінюється таким самим FileBasedCache у тимчасовому
+каталозі, який видаляється після тестів.
+"""
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='shop-test-cache-')
+        self.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            },
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)